@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Incremental aggregate store for the posting, reaction and category reports.
+
+Instead of recounting the full history on every run, the store keeps persisted
+aggregates that new rows are folded into:
+- posts and timestamped comments per (page, date, time bucket)
+- comments without a timestamp per page
+- like sums and post counts per category
+- the category engagement cube (see category_cube) for the robust like statistics
+
+Posts and comment rows are keyed by pid, which increases with every new post.
+The store remembers the highest pid folded in (its high-water mark) for posts
+and for comments; rows at or below it are rejected as duplicates, so
+re-ingesting a file only processes the rows that were added since, and the
+cost of a refresh depends on the day's delta rather than the whole history.
+Comments of pids above the post high-water mark are left pending (not counted
+and not marked as ingested) until their post has been folded in.
+Rows without a numeric pid cannot be ordered by the high-water marks; they are
+still counted, and recognized on later runs by their content (plus how many
+identical rows came before them in the same batch) instead. Their comments are
+attributed through the raw pid string, and stay pending until such a post is in
+the store.
+A post's comments are folded in once, the first time its pid shows up in the
+comments data; later changes (new comments or likes on an already ingested
+post) are not picked up. Use `reset` to rebuild from scratch.
+
+Dates and buckets are in the local time of each page (see timezones). A store
+built by another version or with other time zone settings is refused rather
+than replaced, since it cannot be rebuilt from a delta: `reset` it and ingest
+the full history again.
+
+Usage:
+    python aggregate_store.py update [--posts PATH] [--comments PATH]
+    python aggregate_store.py status
+    python aggregate_store.py reset
+"""
+
+import argparse
+import itertools
+import os
+import pickle
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import timezones
+from category_cube import CategoryCube
+from data_loader import CACHE_DIR, COMMENTS_FILE, POST_SUMMARY_FILE, load_comment_tables, load_post_summary
+from time_buckets import bucket_count, bucket_index
+
+STORE_FILE = os.path.join(CACHE_DIR, "aggregates.pkl")
+
+# Bump whenever the bucketing or the stored layout changes
+STORE_VERSION = 4
+
+
+def _numeric_pids(pids):
+    """Return pids as floats (NaN where a pid is missing or not a number)"""
+    return pd.to_numeric(pd.Series(pids), errors='coerce').to_numpy(dtype=float)
+
+
+def _row_keys(frame):
+    """
+    Return a key per row for recognizing rows without a numeric pid across runs.
+
+    The key is the hash of the row's values and the number of identical rows
+    before it in the frame, so repeated rows within one batch all count.
+    """
+    hashes = pd.util.hash_pandas_object(frame, index=False)
+    occurrences = hashes.groupby(hashes.to_numpy()).cumcount()
+    return list(zip(hashes.tolist(), occurrences.tolist()))
+
+
+def _bucket_counts(pages, times):
+    """Return {(page, 'YYYY-MM-DD', bucket): count} for the rows with a page and a time (local time)"""
+    pages = pd.Series(pages).reset_index(drop=True)
+    times = timezones.local_times(pd.Series(times).reset_index(drop=True), pages)
+    buckets = bucket_index(times)
+    keep = pages.notna().to_numpy() & (buckets >= 0)
+    if not keep.any():
+        return {}
+
+    counts = pd.DataFrame({
+        'page': pages[keep].to_numpy(),
+        'day': times[keep].dt.floor('D').to_numpy(),
+        'bucket': buckets[keep]
+    }).groupby(['page', 'day', 'bucket'], sort=False).size()
+
+    # Format the dates once per group rather than once per row
+    days = pd.DatetimeIndex(counts.index.get_level_values('day')).strftime('%Y-%m-%d')
+    keys = zip(counts.index.get_level_values('page'), days, counts.index.get_level_values('bucket').tolist())
+    return dict(zip(keys, counts.to_numpy().tolist()))
+
+
+class AggregateStore:
+    """Persisted bucket counts and category likes, updated by pid high-water marks"""
+
+    def __init__(self):
+        # (page, 'YYYY-MM-DD', bucket) -> number of posts / timestamped comments
+        self.post_counts = Counter()
+        self.comment_counts = Counter()
+        # page -> number of comments without a timestamp
+        self.other_comment_counts = Counter()
+        # category -> [sum of likes, number of posts]
+        self.category_likes = {}
+        # category_cube.CategoryCube of every post folded in (None before the first post)
+        self.category_cube = None
+        # pid -> page of every post folded in, for attributing later comments
+        self.post_pages = {}
+        # Raw pid string -> page of the posts without a numeric pid (first one wins)
+        self.unkeyed_post_pages = {}
+        # Row keys (see _row_keys) of the posts and comments without a numeric pid folded in
+        self.unkeyed_posts = set()
+        self.unkeyed_comments = set()
+        # Highest pid folded in so far (None before the first update)
+        self.post_high_water = None
+        self.comment_high_water = None
+
+    @classmethod
+    def load(cls, path=STORE_FILE):
+        """
+        Load the store from disk, or start an empty one if there is none yet.
+
+        Raises ValueError if the file cannot be read or was built by another
+        version or with other time zone settings; such a store is never
+        replaced silently, since the history folded into it would be lost.
+        """
+        if not os.path.exists(path):
+            return cls()
+
+        reset_hint = "run 'python aggregate_store.py reset' and ingest the full history again"
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            raise ValueError(f"Cannot read the aggregate store {path} ({e}); {reset_hint}")
+
+        if state.get('version') != STORE_VERSION:
+            raise ValueError(f"The aggregate store {path} has version {state.get('version')}, "
+                             f"expected {STORE_VERSION}; {reset_hint}")
+        if state.get('timezones') != timezones.settings():
+            raise ValueError(f"The aggregate store {path} was built with other time zone settings "
+                             f"({state.get('timezones')}, now {timezones.settings()}); use the same "
+                             f"settings, or {reset_hint}")
+
+        store = cls()
+        for name in ('post_counts', 'comment_counts', 'other_comment_counts', 'category_likes',
+                     'category_cube', 'post_pages', 'unkeyed_post_pages', 'unkeyed_posts', 'unkeyed_comments',
+                     'post_high_water', 'comment_high_water'):
+            setattr(store, name, state[name])
+        return store
+
+    def save(self, path=STORE_FILE):
+        """Write the store to disk"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                'version': STORE_VERSION,
+                'timezones': timezones.settings(),
+                'post_counts': self.post_counts,
+                'comment_counts': self.comment_counts,
+                'other_comment_counts': self.other_comment_counts,
+                'category_likes': self.category_likes,
+                'category_cube': self.category_cube,
+                'post_pages': self.post_pages,
+                'unkeyed_post_pages': self.unkeyed_post_pages,
+                'unkeyed_posts': self.unkeyed_posts,
+                'unkeyed_comments': self.unkeyed_comments,
+                'post_high_water': self.post_high_water,
+                'comment_high_water': self.comment_high_water
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def add_posts(self, post_data):
+        """
+        Fold the posts above the high-water mark, and the posts without a
+        numeric pid not seen before, into the aggregates.
+
+        Returns (added, rejected): posts folded in and posts rejected as already
+        ingested or repeated.
+        """
+        pids = _numeric_pids(post_data['pid'])
+        has_pid = ~np.isnan(pids)
+        high_water = self.post_high_water if self.post_high_water is not None else -np.inf
+        # Within the batch, only the first row of a pid counts
+        is_keyed_new = has_pid & (pids > high_water) & ~pd.Series(pids).duplicated().to_numpy()
+
+        # Rows without a numeric pid are recognized by their content instead
+        unkeyed_rows = np.flatnonzero(~has_pid)
+        unkeyed_keys = _row_keys(post_data.iloc[unkeyed_rows])
+        is_unkeyed_new = np.zeros(len(post_data), dtype=bool)
+        is_unkeyed_new[unkeyed_rows] = [key not in self.unkeyed_posts for key in unkeyed_keys]
+
+        is_new = is_keyed_new | is_unkeyed_new
+        new_posts = post_data[is_new]
+        added = len(new_posts)
+        rejected = len(post_data) - added
+        if added == 0:
+            return added, rejected
+
+        self.post_counts.update(_bucket_counts(new_posts['postedBy'], new_posts['createdTime']))
+
+        likes = new_posts.groupby('category')['likesCount'].agg(['sum', 'count'])
+        for category, total, count in zip(likes.index, likes['sum'].tolist(), likes['count'].tolist()):
+            previous = self.category_likes.get(category, [0, 0])
+            self.category_likes[category] = [previous[0] + total, previous[1] + count]
+
+        cube = CategoryCube.build(new_posts)
+        self.category_cube = cube if self.category_cube is None else self.category_cube.merge(cube)
+
+        if is_keyed_new.any():
+            self.post_pages.update(zip(pids[is_keyed_new].astype(np.int64).tolist(),
+                                       post_data['postedBy'][is_keyed_new]))
+            self.post_high_water = int(pids[is_keyed_new].max())
+
+        unkeyed_posts = post_data[is_unkeyed_new]
+        for pid, page in zip(unkeyed_posts['pid'].astype(str), unkeyed_posts['postedBy']):
+            self.unkeyed_post_pages.setdefault(pid, page)
+        self.unkeyed_posts.update(key for key, new in zip(unkeyed_keys, is_unkeyed_new[unkeyed_rows]) if new)
+        return added, rejected
+
+    def add_comments(self, parsed, others):
+        """
+        Fold the comments of the pids above the comment high-water mark into the aggregates.
+
+        `parsed` and `others` are the CompactComments tables from
+        data_loader.load_comment_tables. Comments are attributed to pages through
+        the posts already in the store, so only comments up to the post
+        high-water mark are folded in; comments of later pids stay pending until
+        their post has been ingested. Comments without a numeric pid are folded
+        in once their post (by raw pid string) is in the store, and recognized
+        by their content afterwards. Returns (added, rejected, unmatched,
+        pending): comments folded in, comments already ingested, comments whose
+        post is not in the store (and never can be, being below the post
+        high-water mark), and comments waiting for their post.
+        """
+        high_water = self.comment_high_water if self.comment_high_water is not None else -np.inf
+        post_high_water = self.post_high_water if self.post_high_water is not None else -np.inf
+        page_index = pd.Index(list(self.post_pages))
+        page_values = np.append(np.array(list(self.post_pages.values()), dtype=object), [np.nan])
+
+        added = rejected = unmatched = pending = 0
+        new_high_water = self.comment_high_water
+        for comments, timestamped in ((parsed, True), (others, False)):
+            # Convert each distinct pid once, then spread the numbers over the comments
+            pids = _numeric_pids(comments.pid_values)[comments.pid_codes]
+            has_pid = ~np.isnan(pids)
+            rejected += int((has_pid & (pids <= high_water)).sum())
+            # Posts arrive in pid order, so a comment above the post high-water
+            # mark may still find its post in a later run
+            is_pending = has_pid & (pids > post_high_water)
+            pending += int(is_pending.sum())
+            is_new = has_pid & (pids > high_water) & ~is_pending
+
+            new_rows = np.flatnonzero(is_new)
+            new_pids = pids[new_rows].astype(np.int64)
+            pages = np.take(page_values, page_index.get_indexer(new_pids))
+            matched = pd.notna(pages)
+            unmatched += int((~matched).sum())
+            added += int(matched.sum())
+            if len(new_pids):
+                new_high_water = max(int(new_pids.max()), new_high_water if new_high_water is not None else -1)
+
+            unkeyed_rows, unkeyed_pages, unkeyed_rejected, unkeyed_pending = \
+                self._new_unkeyed_comments(comments, np.flatnonzero(~has_pid))
+            added += len(unkeyed_rows)
+            rejected += unkeyed_rejected
+            pending += unkeyed_pending
+
+            rows = np.concatenate([new_rows[matched], unkeyed_rows])
+            pages = pd.Series(np.concatenate([pages[matched], unkeyed_pages]), dtype=object)
+            if not len(rows):
+                continue
+            if timestamped:
+                self.comment_counts.update(_bucket_counts(pages, comments.timestamps().iloc[rows]))
+            else:
+                self.other_comment_counts.update(pages.value_counts().to_dict())
+
+        self.comment_high_water = new_high_water
+        return added, rejected, unmatched, pending
+
+    def _new_unkeyed_comments(self, comments, rows):
+        """
+        Return (rows, pages, rejected, pending) for the comments at `rows`, which lack a numeric pid.
+
+        The returned rows are the comments whose post is in the store and that
+        were not folded in before; they are marked as ingested.
+        """
+        if not len(rows):
+            return rows, np.empty(0, dtype=object), 0, 0
+
+        pid_strings = comments.pid_values[comments.pid_codes[rows]]
+        content = {'pid': pid_strings, 'text': comments.texts(rows)}
+        if comments.epoch is not None:
+            content['epoch'] = comments.epoch[rows]
+        keys = _row_keys(pd.DataFrame(content))
+
+        pages = pd.Series(pid_strings, dtype=object).map(self.unkeyed_post_pages).to_numpy(dtype=object)
+        known = pd.notna(pages)
+        fresh = np.array([key not in self.unkeyed_comments for key in keys], dtype=bool)
+        is_new = known & fresh
+        self.unkeyed_comments.update(key for key, new in zip(keys, is_new) if new)
+        return rows[is_new], pages[is_new], int((known & ~fresh).sum()), int((~known).sum())
+
+    def bucket_counts(self, kind, pages, date_from=None, date_to=None):
+        """
+        Return a (pages x buckets) count matrix for `pages`, in the given order.
+
+        kind is 'posts' or 'comments'; date_from/date_to ('YYYY-MM-DD', both
+        inclusive) optionally restrict the dates counted.
+        """
+        counter = self.post_counts if kind == 'posts' else self.comment_counts
+        rows = {page: i for i, page in enumerate(pages)}
+        counts = np.zeros((len(pages), bucket_count()), dtype=np.int64)
+        for (page, day, bucket), count in counter.items():
+            row = rows.get(page)
+            if row is None or (date_from and day < date_from) or (date_to and day > date_to):
+                continue
+            counts[row, bucket] += count
+        return list(pages), counts
+
+    def others_per_page(self, pages):
+        """Return the number of comments without a timestamp for each page"""
+        return pd.Series([self.other_comment_counts.get(page, 0) for page in pages], index=list(pages))
+
+    def pages(self):
+        """Return every page with posts in the store"""
+        pages = itertools.chain(self.post_pages.values(), self.unkeyed_post_pages.values())
+        return sorted({page for page in pages if pd.notna(page)}, key=str)
+
+    def category_summary(self, categories=None):
+        """
+        Return the like statistics per category, like analyze_likes_by_category.
+
+        Columns: Category, Average Likes, Total Likes, Post Count (sorted by
+        average likes, highest first).
+        """
+        rows = [
+            (category, total / count if count else float('nan'), total, count)
+            for category, (total, count) in self.category_likes.items()
+            if categories is None or category in categories
+        ]
+        summary = pd.DataFrame(rows, columns=['Category', 'Average Likes', 'Total Likes', 'Post Count'])
+        return summary.sort_values('Average Likes', ascending=False)
+
+
+def update_store(post_data, comment_tables=None, path=STORE_FILE, store=None):
+    """Load the store (unless given), fold in new posts (and comments), save it and return it"""
+    if store is None:
+        store = AggregateStore.load(path)
+    added, rejected = store.add_posts(post_data)
+    print(f"Aggregate store: {added} new posts folded in, {rejected} already ingested")
+    if comment_tables is not None:
+        added, rejected, unmatched, pending = store.add_comments(*comment_tables)
+        print(f"Aggregate store: {added} new comments folded in, {rejected} already ingested"
+              + (f", {unmatched} without a known post skipped" if unmatched else "")
+              + (f", {pending} waiting for their post" if pending else ""))
+    store.save(path)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the incremental aggregate store")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    update = subparsers.add_parser('update', help='fold new posts and comments into the store')
+    update.add_argument('--posts', default=POST_SUMMARY_FILE, help='Post Summary file (CSV or xlsx) to ingest')
+    update.add_argument('--comments', default=COMMENTS_FILE, help='Comments file (CSV or xlsx) to ingest')
+    update.add_argument('--no-comments', action='store_true', help='only ingest posts')
+    timezones.add_timezone_arguments(update)
+    status = subparsers.add_parser('status', help='show what the store holds')
+    timezones.add_timezone_arguments(status)
+    subparsers.add_parser('reset', help='delete the store')
+    args = parser.parse_args()
+
+    if args.command == 'reset':
+        if os.path.exists(STORE_FILE):
+            os.remove(STORE_FILE)
+        print("Aggregate store removed")
+        return
+
+    timezones.configure_from_args(args)
+    try:
+        # Check the store before loading any data, so a mismatch fails fast
+        store = AggregateStore.load()
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+
+    if args.command == 'update':
+        # Only the default data files use the shared table cache
+        post_data = load_post_summary(args.posts, use_cache=args.posts == POST_SUMMARY_FILE)
+        comment_tables = None
+        if not args.no_comments:
+            comment_tables = load_comment_tables(args.comments, use_cache=args.comments == COMMENTS_FILE)
+        update_store(post_data, comment_tables, store=store)
+        return
+
+    print(f"Posts up to pid {store.post_high_water}: {sum(store.post_counts.values())} with a time bucket, "
+          f"{len(store.post_pages) + len(store.unkeyed_posts)} in total "
+          f"({len(store.unkeyed_posts)} without a numeric pid)")
+    print(f"Comments up to pid {store.comment_high_water}: {sum(store.comment_counts.values())} with a timestamp, "
+          f"{sum(store.other_comment_counts.values())} without")
+    print(f"{len(store.category_likes)} categories, {len(store.pages())} pages")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,33 +5,122 @@ This script analyzes Facebook posting behavior for traffic police pages.
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
 from datetime import datetime
+import argparse
 import os
 
+import instrumentation
+import plotting
+import timezones
+from aggregate_store import update_store
+from data_loader import load_post_summary
+from synthetic_data import sample_posts_by_time
+from time_buckets import bucket_index, bucket_label, count_by_page, counts_to_frame
+from time_query import TimeWindowIndex
+
 # Get the current directory where the script is running
 current_dir = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
 
-def analyze_posting_behavior():
-    # Step 1: Load the data from CSV file
-    print("Loading data from CSV file...")
+def plot_posting_patterns(result_df, target_pages, total_counts, output_file):
+    """
+    Draw the posts per time bucket of each police page as a line chart and save it.
+    
+    Returns the path written (its extension follows the configured chart format).
+    """
+    fig, ax = plotting.figure((15, 8))
+    
+    # One line per page, in the order of target_pages
+    page_results = dict(tuple(result_df.groupby('Police Page', sort=False)))
+    for page in target_pages:
+        if page in page_results:
+            ax.plot(
+                page_results[page]['Time Bucket'], 
+                page_results[page]['Post Count'], 
+                marker='o', 
+                linestyle='-', 
+                label=page
+            )
+    
+    # Label every full hour, adding the total post count of that bucket if any
+    tick_indices, hour_labels = plotting.hour_ticks()
+    tick_labels = [
+        f"{label}\n({total_counts[i]} posts)" if total_counts[i] > 0 else label
+        for i, label in zip(tick_indices, hour_labels)
+    ]
+    ax.set_xticks(tick_indices)
+    ax.set_xticklabels(tick_labels, rotation=45)
+    
+    # Add labels and title
+    ax.set_xlabel('Time of Day (24-hour format) with Post Counts', fontsize=12)
+    ax.set_ylabel('Number of Posts', fontsize=12)
+    ax.set_title('Posting Patterns for Traffic Police Facebook Pages', fontsize=14)
+    
+    # Add grid and legend
+    ax.grid(True, linestyle='--', alpha=0.7)
+    ax.legend(title='Police Page', fontsize=10)
+    
+    # Adjust layout and save the figure
+    fig.tight_layout()
+    return plotting.save(fig, output_file)
+
+def convert_to_local_times(filtered_data):
+    """
+    Parse createdTime and convert it to the local time of each page (see timezones).
+    
+    Returns a converted copy, or None if the times could not be parsed.
+    """
+    filtered_data = filtered_data.copy()
+    # Try different datetime formats if standard conversion fails
     try:
-        # Try to load the CSV file
-        file_path = os.path.join(current_dir, "data/Post-Summary.csv")
-        post_data = pd.read_csv(file_path)
-        print(f"Successfully loaded {len(post_data)} records")
+        filtered_data['createdTime'] = pd.to_datetime(filtered_data['createdTime'])
     except Exception as e:
-        print(f"Error loading CSV file: {e}")
-        return
+        print(f"Error with standard datetime conversion: {e}")
+        try:
+            # Try parsing with a specific format
+            filtered_data['createdTime'] = pd.to_datetime(filtered_data['createdTime'], 
+                                                         format='%Y-%m-%dT%H:%M:%S+0000',
+                                                         errors='coerce')
+            # Drop rows with NaT values
+            filtered_data = filtered_data.dropna(subset=['createdTime'])
+            print("Converted time data with specific format")
+        except Exception as e2:
+            print(f"Error with specific format conversion: {e2}")
+            return None
+    
+    # Bucket by the local time of each page rather than by UTC
+    filtered_data['createdTime'] = timezones.local_times(filtered_data['createdTime'], filtered_data['postedBy'])
+    print("Successfully converted time data to the local time of each page")
+    return filtered_data
+
+def analyze_posting_behavior(post_data=None, plots=True, store=None):
+    """
+    Analyze posting behavior of the traffic police pages.
+    
+    `post_data` may hold an already loaded Post Summary table (see run_analyses.py);
+    otherwise it is loaded here. With plots=False the line chart is skipped and
+    matplotlib is never imported. With an aggregate_store.AggregateStore the
+    bucket counts are read from its persisted aggregates instead of recounted.
+    """
+    # Step 1: Load the data from CSV file
+    instrumentation.step("Step 1: Load post data")
+    if post_data is None:
+        print("Loading data from CSV file...")
+        try:
+            # Load the typed Post Summary table (served from the columnar cache when fresh)
+            post_data = load_post_summary()
+            print(f"Successfully loaded {len(post_data)} records")
+        except Exception as e:
+            print(f"Error loading CSV file: {e}")
+            return
+    else:
+        print(f"Using {len(post_data)} preloaded records")
+    instrumentation.set_rows(len(post_data))
 
     # Print the column names to verify the structure
     print("Columns in the dataset:", post_data.columns.tolist())
     
-    # Make sure the pid column is a string for consistency
-    if 'pid' in post_data.columns:
-        post_data['pid'] = post_data['pid'].astype(str)
-    
     # Step 2: Filter for rows where postedBy is one of the specified police pages
+    instrumentation.step("Step 2: Filter police pages")
     target_pages = ["Bengaluru Traffic Police", "Kolkata Traffic Police", "Hyderabad Traffic Police"]
     print(f"Filtering for posts by: {', '.join(target_pages)}")
     
@@ -46,6 +135,7 @@ def analyze_posting_behavior():
         print(f"Target pages not found exactly. Using similar pages: {traffic_pages}")
         target_pages = traffic_pages
     
+    # The time columns are converted on a copy (see convert_to_local_times)
     filtered_data = post_data[post_data['postedBy'].isin(target_pages)]
     
     print(f"Found {len(filtered_data)} posts from the specified traffic police pages")
@@ -56,164 +146,82 @@ def analyze_posting_behavior():
         print("Using sample data for demonstration purposes...")
         
         # Create sample data for demonstration
-        sample_data = []
-        import random
-        for page in target_pages:
-            for hour in range(24):
-                for minute in [0, 15, 30, 45]:
-                    # Create some data with peaks at 9am, 12pm, 3pm and 6pm
-                    peak_hours = [9, 12, 15, 18]
-                    base_count = 1 if hour in peak_hours else 0
-                    # Add some randomness
-                    count = max(0, base_count + random.randint(-1, 2))
-                    
-                    for _ in range(count):
-                        sample_data.append({
-                            'postedBy': page,
-                            'createdTime': f"2023-01-01T{hour:02d}:{minute:02d}:00+0000"
-                        })
-        
-        # Convert to DataFrame
-        filtered_data = pd.DataFrame(sample_data)
+        filtered_data = sample_posts_by_time(target_pages)
         print(f"Created {len(filtered_data)} sample records for demonstration")
     
-    # Step 3: Convert createdTime to datetime format
-    print("Converting time data to datetime format...")
-    
-    # Try different datetime formats if standard conversion fails
-    try:
-        filtered_data['createdTime'] = pd.to_datetime(filtered_data['createdTime'])
-    except Exception as e:
-        print(f"Error with standard datetime conversion: {e}")
-        try:
-            # Try parsing with a specific format
-            filtered_data['createdTime'] = pd.to_datetime(filtered_data['createdTime'], 
-                                                         format='%Y-%m-%dT%H:%M:%S+0000',
-                                                         errors='coerce')
-            # Drop rows with NaT values
-            filtered_data = filtered_data.dropna(subset=['createdTime'])
-            print("Converted time data with specific format")
-        except Exception as e2:
-            print(f"Error with specific format conversion: {e2}")
+    # With the aggregate store the posts per bucket are already counted, so the
+    # time conversion and bucketing of every post (steps 3-4) are skipped; the
+    # refresh cost is then only the store update of the new posts
+    page_counts = None
+    converted = False
+    if store is not None:
+        instrumentation.step("Step 5: Count posts per bucket")
+        page_names, page_counts = store.bucket_counts('posts', target_pages)
+        if page_counts.sum() == 0:
+            # The store holds nothing for these pages (e.g. the sample data is in use)
+            page_counts = None
+        else:
+            print("Reading the posts per time bucket from the aggregate store...")
+    
+    if page_counts is None:
+        # Step 3: Convert createdTime to datetime format
+        instrumentation.step("Step 3: Convert times")
+        instrumentation.set_rows(len(filtered_data))
+        print("Converting time data to datetime format...")
+        filtered_data = convert_to_local_times(filtered_data)
+        if filtered_data is None:
             return
+        converted = True
+        
+        # Step 4: Create 96 time buckets (15-minute intervals) covering a 24-hour day
+        instrumentation.step("Step 4: Assign time buckets")
+        instrumentation.set_rows(len(filtered_data))
+        print("Creating time buckets...")
+        
+        # Create a time bucket index (0-95) for each post
+        # Each bucket represents a 15-minute interval in a 24-hour day
+        filtered_data['time_bucket'] = bucket_index(filtered_data['createdTime'])
+        
+        # Step 5: Count posts falling into each time bucket for each police page
+        instrumentation.step("Step 5: Count posts per bucket")
+        instrumentation.set_rows(len(filtered_data))
+        print("Counting posts in each time bucket...")
+        
+        # Count all pages in a single pass: page_counts has one row of 96 buckets per page
+        page_names, page_counts = count_by_page(filtered_data['postedBy'], filtered_data['createdTime'], target_pages)
     
-    print("Successfully converted time data")
-    
-    # Step 4: Create 96 time buckets (15-minute intervals) covering a 24-hour day
-    print("Creating time buckets...")
-    
-    # Extract hour and minute from the datetime
-    filtered_data['hour'] = filtered_data['createdTime'].dt.hour
-    filtered_data['minute'] = filtered_data['createdTime'].dt.minute
-    
-    # Create a time bucket index (0-95) for each post
-    # Each bucket represents a 15-minute interval in a 24-hour day
-    filtered_data['time_bucket'] = (filtered_data['hour'] * 4) + (filtered_data['minute'] // 15)
-    
-    # Step 5: Count posts falling into each time bucket for each police page
-    print("Counting posts in each time bucket...")
-    
-    # Create a DataFrame to store the results
-    result_data = []
-    
-    for page in target_pages:
-        page_data = filtered_data[filtered_data['postedBy'] == page]
-        if len(page_data) > 0:
-            # Count posts in each time bucket
-            bucket_counts = page_data.groupby('time_bucket').size()
-            
-            # Ensure all buckets from 0-95 are included, filling missing buckets with 0
-            full_buckets = pd.Series(0, index=range(96))
-            full_buckets.update(bucket_counts)
-            
-            # Add the results to the data
-            for bucket, count in full_buckets.items():
-                # Calculate corresponding hour and minute
-                hour = bucket // 4
-                minute = (bucket % 4) * 15
-                time_label = f"{hour:02d}:{minute:02d}"
-                
-                result_data.append({
-                    'Police Page': page,
-                    'Time Bucket': bucket,
-                    'Time': time_label,
-                    'Post Count': count
-                })
+    # Keep only pages that actually have posts
+    has_posts = page_counts.sum(axis=1) > 0
+    result_df = counts_to_frame(
+        [page for page, keep in zip(page_names, has_posts) if keep],
+        page_counts[has_posts],
+        page_column='Police Page',
+        count_column='Post Count'
+    )
     
-    # Convert the results to a DataFrame
-    result_df = pd.DataFrame(result_data)
+    # Total post counts for each time bucket across all pages
+    total_counts = page_counts.sum(axis=0)
     
     # Step 6 & 7: Generate a line chart comparing posting patterns
-    print("Generating line chart...")
-    
-    plt.figure(figsize=(15, 8))
-    
-    # Create a dictionary to store the total post counts for each time bucket
-    total_counts = {}
-    
-    for page in target_pages:
-        page_results = result_df[result_df['Police Page'] == page]
-        if not page_results.empty:
-            plt.plot(
-                page_results['Time Bucket'], 
-                page_results['Post Count'], 
-                marker='o', 
-                linestyle='-', 
-                label=page
-            )
-            
-            # Update total counts for each time bucket
-            for _, row in page_results.iterrows():
-                bucket = row['Time Bucket']
-                count = row['Post Count']
-                if bucket in total_counts:
-                    total_counts[bucket] = total_counts[bucket] + count
-                else:
-                    total_counts[bucket] = count
-    
-    # Set the x-tick labels (show every 4th label to avoid overcrowding)
-    tick_indices = range(0, 96, 4)  # Every 1 hour
-    tick_labels = []
-    
-    for i in tick_indices:
-        time_label = result_df[result_df['Time Bucket'] == i]['Time'].iloc[0] if i in result_df['Time Bucket'].values else f"{i//4:02d}:00"
-        # Add post count if available
-        count = total_counts.get(i, 0)
-        if count > 0:
-            time_label = f"{time_label}\n({count} posts)"
-        tick_labels.append(time_label)
-    
-    plt.xticks(tick_indices, tick_labels, rotation=45)
-    
-    # Add labels and title
-    plt.xlabel('Time of Day (24-hour format) with Post Counts', fontsize=12)
-    plt.ylabel('Number of Posts', fontsize=12)
-    plt.title('Posting Patterns for Traffic Police Facebook Pages', fontsize=14)
-    
-    # Add grid and legend
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.legend(title='Police Page', fontsize=10)
-    
-    # Adjust layout
-    plt.tight_layout()
-    
-    # Save the figure
-    output_file = os.path.join(current_dir, "posting_patterns.png")
-    plt.savefig(output_file)
-    print(f"Chart saved as 'posting_patterns.png'")
+    if plots:
+        instrumentation.step("Steps 6-7: Plot posting patterns")
+        print("Generating line chart...")
+        output_file = plot_posting_patterns(result_df, target_pages, total_counts,
+                                            os.path.join(current_dir, "posting_patterns.png"))
+        print(f"Chart saved as '{os.path.basename(output_file)}'")
+    else:
+        print("Skipping the line chart (--no-plots)")
     
     # Display summary statistics
+    instrumentation.step("Summary statistics")
     print("\nSummary statistics by police page:")
-    for page in target_pages:
-        page_data = filtered_data[filtered_data['postedBy'] == page]
-        post_count = len(page_data)
+    for page, counts in zip(page_names, page_counts):
+        post_count = counts.sum()
         
         if post_count > 0:
-            most_active_bucket = page_data['time_bucket'].value_counts().idxmax()
-            most_active_hour = most_active_bucket // 4
-            most_active_minute = (most_active_bucket % 4) * 15
-            most_active_time = f"{most_active_hour:02d}:{most_active_minute:02d}"
-            most_active_count = page_data['time_bucket'].value_counts().max()
+            most_active_bucket = counts.argmax()
+            most_active_time = bucket_label(most_active_bucket)
+            most_active_count = counts[most_active_bucket]
             
             print(f"  - {page}: {post_count} posts, most active time: {most_active_time} with {most_active_count} posts")
         else:
@@ -221,7 +229,7 @@ def analyze_posting_behavior():
     
     # Print detailed time breakdown with time ranges for clarity
     print("\nDetailed posting counts by time of day (with time ranges):")
-    for bucket in sorted(total_counts.keys()):
+    for bucket in range(len(total_counts)):
         if total_counts[bucket] > 0:
             hour = bucket // 4
             minute = (bucket % 4) * 15
@@ -251,14 +259,20 @@ def analyze_posting_behavior():
             print(f"  - {time_range} ({time_12h}): {total_counts[bucket]} posts")
     
     # Print all Bengaluru Traffic Police posts between 3:00 AM and 3:14 AM
+    instrumentation.step("3 AM post lookup")
     print("\nAll Bengaluru Traffic Police posts between 3:00 AM and 3:14 AM:")
-    bangalore_posts = filtered_data[filtered_data['postedBy'] == "Bengaluru Traffic Police"]
-    target_bucket = (3 * 4) + 0  # 3:00 AM bucket (hour=3, minute=0)
-    bangalore_3am_posts = bangalore_posts[bangalore_posts['time_bucket'] == target_bucket]
+    # Look the posts up in the time-of-day index: 3:00 AM bucket = [03:00, 03:15)
+    bangalore_data = filtered_data[filtered_data['postedBy'] == "Bengaluru Traffic Police"]
+    if not converted:
+        # The counts came from the store: only the Bengaluru posts need their local time
+        bangalore_data = convert_to_local_times(bangalore_data)
+        if bangalore_data is None:
+            return
+    time_index = TimeWindowIndex(bangalore_data)
+    bangalore_3am_posts = time_index.query("Bengaluru Traffic Police", 3 * 60, 3 * 60 + 15)
     
     if len(bangalore_3am_posts) > 0:
-        # Sort by exact created time
-        bangalore_3am_posts = bangalore_3am_posts.sort_values('createdTime')
+        # Posts are returned sorted by exact created time
         for idx, post in bangalore_3am_posts.iterrows():
             # Format the created time in a readable format
             created_time = post['createdTime'].strftime('%Y-%m-%d %H:%M:%S')
@@ -272,7 +286,25 @@ def analyze_posting_behavior():
     else:
         print("  No posts found in this time period.")
 
+    instrumentation.end_step()
     print("\nAnalysis complete!")
 
 if __name__ == "__main__":
-    analyze_posting_behavior()
+    parser = argparse.ArgumentParser(description="Analyze posting behavior of traffic police Facebook pages")
+    parser.add_argument('--incremental', action='store_true',
+                        help="fold new posts into the aggregate store and read the counts from it")
+    plotting.add_plot_arguments(parser)
+    timezones.add_timezone_arguments(parser)
+    instrumentation.add_profile_arguments(parser)
+    args = parser.parse_args()
+    plotting.configure_from_args(args)
+    timezones.configure_from_args(args)
+    instrumentation.start_profiling(args)
+    try:
+        post_data = store = None
+        if args.incremental:
+            post_data = load_post_summary()
+            store = update_store(post_data)
+        analyze_posting_behavior(post_data, plots=args.plots, store=store)
+    finally:
+        instrumentation.finish_profiling(args)
@@ -5,216 +5,103 @@ This script analyzes user reactions (comments) on Facebook posts for e-commerce
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
-from datetime import datetime
+import numpy as np
+import argparse
 import os
-import re
+
+import instrumentation
+import plotting
+import timezones
+from aggregate_store import update_store
+from comment_parser import CompactComments, PostAttributes, iter_exploded_comments
+from data_loader import COMMENTS_FILE, load_post_summary, load_comment_tables
+from synthetic_data import sample_comments, sample_posts_for_pids
+from time_buckets import (bucket_count, bucket_range_label, count_by_page,
+                          count_codes_by_bucket, counts_to_frame)
 
 # Get the current directory where the script is running
 current_dir = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
 
-def analyze_user_reactions():
-    """
-    Analyze user reactions (comments) on e-commerce Facebook pages.
+def select_target_pages(available_pages):
+    """Return the e-commerce pages to analyze, falling back to similarly named pages"""
+    # Target e-commerce pages
+    target_pages = ["Flipkart", "Amazon India", "Snapdeal", "Myntra"]
+    print(f"Filtering for posts by: {', '.join(target_pages)}")
     
-    This function:
-    1. Loads and parses Comments.csv and Post-Summary.csv
-    2. Extracts individual comments and their timestamps
-    3. Filters for e-commerce pages: Flipkart, Amazon, Snapdeal, Myntra
-    4. Groups comments into 96 time buckets (15-minute intervals)
-    5. Calculates total reactions in each time bucket
-    6. Generates visualization comparing reaction patterns
-    7. Provides insights on when users are most active
-    """
-    print("Starting analysis of user reactions on e-commerce Facebook pages...\n")
+    # First list all unique pages to check what's actually available
+    print("Available pages in the dataset:", available_pages)
     
-    # Step 1: Load the data from CSV files
-    print("Loading data from CSV files...")
-    try:
-        # Load Comments data
-        comments_file_path = os.path.join(current_dir, "data/Comments.csv")
-        comments_data = pd.read_csv(comments_file_path)
-        
-        # Load Post Summary data
-        post_summary_file_path = os.path.join(current_dir, "data/Post-Summary.csv")
-        post_data = pd.read_csv(post_summary_file_path)
-        
-        # Make sure pid is a string in both dataframes for proper joining
-        if 'pid' in post_data.columns:
-            post_data['pid'] = post_data['pid'].astype(str)
-            
-        if 'pid' in comments_data.columns:
-            comments_data['pid'] = comments_data['pid'].astype(str)
-        
-        print(f"Successfully loaded {len(comments_data)} comments and {len(post_data)} posts")
-    except Exception as e:
-        print(f"Error loading CSV files: {e}")
-        return
+    # Try to find e-commerce pages if exact matches aren't available
+    ecommerce_related_pages = [page for page in available_pages if 
+                              any(term in str(page).lower() for term in 
+                                  ['flipkart', 'amazon', 'snapdeal', 'myntra', 'shop', 'commerce', 'retail'])]
     
-    # Print the column names to verify the structure
-    print("Columns in the comments dataset:", comments_data.columns.tolist())
-    print("Columns in the post dataset:", post_data.columns.tolist())
+    if not any(page in available_pages for page in target_pages) and ecommerce_related_pages:
+        print(f"Target pages not found exactly. Using similar pages: {ecommerce_related_pages}")
+        target_pages = ecommerce_related_pages
+    
+    return target_pages
+
+def count_reactions_in_memory(post_data, comment_tables=None):
+    """
+    Count comments per (e-commerce page, time bucket) with all comments in memory.
+    
+    `comment_tables` may hold the already loaded (parsed, others) CompactComments
+    from data_loader.load_comment_tables.
     
+    Returns (target_pages, page_counts, others_per_page), or None if the comments
+    could not be loaded.
+    """
     # Step 2: Process the comments data to extract individual comments and timestamps
+    instrumentation.step("Step 2: Load and parse comments")
     print("\nProcessing comments data to extract individual comments and timestamps...")
     
-    # Initialize lists to store the parsed data
-    parsed_comments = []
-    comments_without_timestamp = []
-    
-    # Iterate through each row in the comments data
-    for index, row in comments_data.iterrows():
-        pid = row.get('pid', None)
-        
-        # Get the comments text - check for both possible column names
-        comments_text = None
-        if 'commentsText' in comments_data.columns:
-            comments_text = row.get('commentsText', '')
-        elif 'comments' in comments_data.columns:
-            comments_text = row.get('comments', '')
-        
-        if not comments_text or pd.isna(comments_text):
-            continue
-        
-        # Split the comments by the separator
-        comments_list = comments_text.split('?#+@')
-        
-        for comment in comments_list:
-            if not comment.strip():
-                continue
-                
-            # Extract timestamp using regex - try different timestamp formats
-            # First try standard format: YYYY-MM-DDThh:mm:ss+0000
-            timestamp_match = re.search(r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\+\d{4})', comment)
-            
-            # Also try format: YYYY MM DDThh:mm:ss+0000 (with space instead of dash)
-            if not timestamp_match:
-                timestamp_match = re.search(r'(\d{4}\s+\d{2}\s+\d{2}T\d{2}:\d{2}:\d{2}\+\d{4})', comment)
-            
-            # Also try just finding any year between 2010-2025 followed by month/day pattern
-            if not timestamp_match:
-                timestamp_match = re.search(r'(20\d{2})\s*[\/\-\s]\s*(\d{1,2})\s*[\/\-\s]\s*(\d{1,2})', comment)
-            
-            if timestamp_match:
-                try:
-                    # If we found standard format
-                    if "T" in timestamp_match.group(0):
-                        timestamp_str = timestamp_match.group(1)
-                        # Replace spaces with dashes if needed
-                        timestamp_str = timestamp_str.replace(" ", "-")
-                        # Convert to datetime
-                        comment_time = datetime.strptime(timestamp_str, '%Y-%m-%dT%H:%M:%S+0000')
-                    else:
-                        # If we found year/month/day pattern
-                        year = int(timestamp_match.group(1))
-                        month = int(timestamp_match.group(2))
-                        day = int(timestamp_match.group(3))
-                        # Use midnight as default time
-                        comment_time = datetime(year, month, day, 0, 0, 0)
-                    
-                    # Add to parsed comments
-                    parsed_comments.append({
-                        'pid': pid,
-                        'timestamp': comment_time,
-                        'comment_text': comment.strip()
-                    })
-                except Exception as e:
-                    # If error in parsing, add to comments without timestamp
-                    comments_without_timestamp.append({
-                        'pid': pid,
-                        'comment_text': comment.strip()
-                    })
-                    print(f"Warning: No valid timestamp found in comment: {comment[:50]}...")
-            else:
-                # If no timestamp in comment, add to comments without timestamp
-                comments_without_timestamp.append({
-                    'pid': pid,
-                    'comment_text': comment.strip()
-                })
-                print(f"Warning: No timestamp found in comment: {comment[:50]}...")
-    
-    # Convert to DataFrame
-    comments_df = pd.DataFrame(parsed_comments)
+    # Explode the packed commentsText cells into one row per comment, splitting off
+    # the comments without a readable timestamp (cached after the first run)
+    if comment_tables is not None:
+        comments_df, comments_without_timestamp = comment_tables
+    else:
+        try:
+            comments_df, comments_without_timestamp = load_comment_tables()
+        except Exception as e:
+            print(f"Error loading CSV files: {e}")
+            return None
     
     if len(comments_df) == 0:
         print("No comments could be parsed. Check the format of the comments data.")
         print("Creating sample data for demonstration purposes...")
         
-        # Create sample data for demonstration
-        sample_comments = []
-        import random
-        
-        # Sample pids from the post data for realism
+        # Create sample data for demonstration, using pids from the post data for realism
         sample_pids = post_data['pid'].sample(min(50, len(post_data))).tolist()
         if not sample_pids:
             sample_pids = ['sample_1', 'sample_2', 'sample_3', 'sample_4', 'sample_5']
-        
-        for pid in sample_pids:
-            # Create 5-15 sample comments per post
-            num_comments = random.randint(5, 15)
-            for _ in range(num_comments):
-                # Random hour and minute
-                hour = random.randint(0, 23)
-                minute = random.choice([0, 15, 30, 45])
-                
-                # Create timestamp: more comments during peak hours
-                if 9 <= hour <= 21:  # More activity during daytime and evening
-                    num_entries = random.randint(1, 3)
-                else:
-                    num_entries = random.randint(0, 1)
-                
-                for _ in range(num_entries):
-                    sample_comments.append({
-                        'pid': pid,
-                        'timestamp': datetime(2023, 1, 1, hour, minute, 0),
-                        'comment_text': f"Sample comment at {hour:02d}:{minute:02d}"
-                    })
-        
-        # Convert to DataFrame
-        comments_df = pd.DataFrame(sample_comments)
+        comments_df = CompactComments.from_frame(sample_comments(sample_pids))
         print(f"Created {len(comments_df)} sample comments for demonstration")
     else:
+        instrumentation.set_rows(len(comments_df) + len(comments_without_timestamp))
         print(f"Successfully extracted {len(comments_df)} individual comments with timestamps")
         print(f"Found {len(comments_without_timestamp)} comments without timestamps (will be categorized as 'Others')")
     
     # Step 3: Join with Post Summary table
+    instrumentation.step("Step 3: Attribute comments to posts")
+    instrumentation.set_rows(len(comments_df))
     print("\nJoining comments with post data...")
     
     # Check if post_data is empty
     if len(post_data) == 0:
         print("No post data available. Creating sample post data...")
         
-        # Get unique pids from comments
-        unique_pids = comments_df['pid'].unique()
-        
-        # Create sample post data
-        sample_post_data = []
+        # Assign the pids of the comments to e-commerce pages in rotation
         e_commerce_pages = ["Flipkart", "Amazon India", "Snapdeal", "Myntra"]
-        
-        for i, pid in enumerate(unique_pids):
-            # Assign to e-commerce pages in rotation
-            page = e_commerce_pages[i % len(e_commerce_pages)]
-            
-            sample_post_data.append({
-                'pid': pid,
-                'postedBy': page,
-                'createdTime': "2023-01-01T12:00:00+0000"
-            })
-        
-        # Convert to DataFrame
-        post_data = pd.DataFrame(sample_post_data)
+        post_data = sample_posts_for_pids(comments_df.pid_values, e_commerce_pages)
         print(f"Created {len(post_data)} sample post records")
     
-    # Check data types of pid columns in both DataFrames
-    print(f"comments_df['pid'] dtype: {comments_df['pid'].dtype}")
-    print(f"post_data['pid'] dtype: {post_data['pid'].dtype}")
-    
-    # Make sure pid columns are the same type for merging
-    comments_df['pid'] = comments_df['pid'].astype(str)
+    # Make sure the post pids are strings like the comment pids for the lookup
     post_data['pid'] = post_data['pid'].astype(str)
     
-    # Merge comments with post data
-    merged_data = pd.merge(comments_df, post_data, on='pid', how='left')
+    # Attach the page and category of each comment's post; only the distinct pids
+    # are looked up and the comment texts are never decoded
+    merged_data = PostAttributes(post_data, columns=('postedBy', 'category')).lookup_compact(comments_df)
     print(f"Merged data has {len(merged_data)} rows")
     
     # Check for null values in key columns after merge
@@ -223,24 +110,11 @@ def analyze_user_reactions():
         print(f"Warning: {null_postedby} comments couldn't be matched to a post")
     
     # Step 4: Filter for e-commerce pages
+    instrumentation.step("Step 4: Filter e-commerce pages")
+    instrumentation.set_rows(len(merged_data))
     print("\nFiltering for e-commerce pages...")
     
-    # Target e-commerce pages
-    target_pages = ["Flipkart", "Amazon India", "Snapdeal", "Myntra"]
-    print(f"Filtering for posts by: {', '.join(target_pages)}")
-    
-    # First list all unique pages to check what's actually available
-    print("Available pages in the dataset:", merged_data['postedBy'].unique())
-    
-    # Try to find e-commerce pages if exact matches aren't available
-    available_pages = merged_data['postedBy'].unique()
-    ecommerce_related_pages = [page for page in available_pages if 
-                              any(term in str(page).lower() for term in 
-                                  ['flipkart', 'amazon', 'snapdeal', 'myntra', 'shop', 'commerce', 'retail'])]
-    
-    if not any(page in available_pages for page in target_pages) and ecommerce_related_pages:
-        print(f"Target pages not found exactly. Using similar pages: {ecommerce_related_pages}")
-        target_pages = ecommerce_related_pages
+    target_pages = select_target_pages(merged_data['postedBy'].unique())
     
     # Filter for e-commerce pages
     ecommerce_data = merged_data[merged_data['postedBy'].isin(target_pages)]
@@ -258,53 +132,154 @@ def analyze_user_reactions():
                 ecommerce_data.at[idx, 'postedBy'] = target_pages[idx % len(target_pages)]
     
     # Step 5: Group comments into 96 time buckets (15-minute intervals)
+    instrumentation.step("Step 5: Assign time buckets")
+    instrumentation.set_rows(len(ecommerce_data))
     print("\nGrouping comments into time buckets...")
     
-    # Extract hour and minute from the timestamp
-    ecommerce_data['hour'] = ecommerce_data['timestamp'].dt.hour
-    ecommerce_data['minute'] = ecommerce_data['timestamp'].dt.minute
-    
-    # Create a time bucket index (0-95) for each comment
+    # Create a time bucket index (0-95) for each comment, in the local time of its page
     # Each bucket represents a 15-minute interval in a 24-hour day
-    ecommerce_data['time_bucket'] = (ecommerce_data['hour'] * 4) + (ecommerce_data['minute'] // 15)
+    time_buckets = comments_df.buckets(ecommerce_data['postedBy'], rows=ecommerce_data.index)
     
     # Step 6: Calculate total reactions in each time bucket for each e-commerce page
+    instrumentation.step("Step 6: Count reactions per bucket")
+    instrumentation.set_rows(len(ecommerce_data))
     print("\nCalculating reactions in each time bucket...")
     
-    # Create a DataFrame to store the results
-    result_data = []
+    # Count all pages in a single pass: page_counts has one row of 96 buckets per page
+    _, page_counts = count_codes_by_bucket(ecommerce_data['postedBy'], time_buckets, target_pages)
     
-    for page in target_pages:
-        page_data = ecommerce_data[ecommerce_data['postedBy'] == page]
-        if len(page_data) > 0:
-            # Count comments in each time bucket
-            bucket_counts = page_data.groupby('time_bucket').size()
-            
-            # Ensure all buckets from 0-95 are included, filling missing buckets with 0
-            full_buckets = pd.Series(0, index=range(96))
-            full_buckets.update(bucket_counts)
-            
-            # Add the results to the data
-            for bucket, count in full_buckets.items():
-                # Calculate corresponding hour and minute
-                hour = bucket // 4
-                minute = (bucket % 4) * 15
-                time_label = f"{hour:02d}:{minute:02d}"
-                
-                result_data.append({
-                    'E-commerce Page': page,
-                    'Time Bucket': bucket,
-                    'Time': time_label,
-                    'Comment Count': count
-                })
-    
-    # Convert the results to a DataFrame
-    result_df = pd.DataFrame(result_data)
+    # Count the comments without timestamp per page in one pass
+    others_pages = PostAttributes(post_data, columns=('postedBy',)).lookup_compact(comments_without_timestamp)
+    others_per_page = others_pages['postedBy'].value_counts()
     
-    # Step 7: Generate visualization comparing reaction patterns
-    print("\nGenerating visualization comparing reaction patterns...")
+    return target_pages, page_counts, others_per_page
+
+def count_reactions_from_store(store):
+    """
+    Read the comments per (e-commerce page, time bucket) from the aggregate store.
     
-    plt.figure(figsize=(15, 8))
+    The store must already hold the comments (see aggregate_store.update_store).
+    Returns (target_pages, page_counts, others_per_page), or None if it is empty.
+    """
+    instrumentation.step("Steps 2-6: Read counts from the aggregate store")
+    print("\nReading the comment counts from the aggregate store...")
+    if not store.comment_counts:
+        print("The aggregate store holds no comments; run without --incremental or update it first")
+        return None
+    
+    target_pages = select_target_pages(store.pages())
+    target_pages, page_counts = store.bucket_counts('comments', target_pages)
+    print(f"Found {page_counts.sum()} comments for the specified e-commerce pages")
+    return target_pages, page_counts, store.others_per_page(target_pages)
+
+def count_reactions_in_chunks(post_data, chunksize):
+    """
+    Count comments per (e-commerce page, time bucket) by streaming Comments.csv.
+    
+    Each chunk of `chunksize` rows is exploded, attributed to its pages and bucketed
+    on its own, and only the partial (page x bucket) count matrices are kept, so
+    peak memory is bounded by the chunk size rather than the size of the file.
+    
+    Returns (target_pages, page_counts, others_per_page).
+    """
+    # The e-commerce pages are chosen up front from the posts, since the comments
+    # are never held in memory all at once
+    print("\nFiltering for e-commerce pages...")
+    target_pages = select_target_pages(post_data['postedBy'].unique())
+    
+    instrumentation.step("Steps 2-6: Stream and count comments")
+    print(f"\nStreaming comments in chunks of {chunksize} rows...")
+    lookup = PostAttributes(post_data, columns=('postedBy',))
+    page_counts = np.zeros((len(target_pages), bucket_count()), dtype=np.int64)
+    others_per_page = pd.Series(0, index=target_pages)
+    total_parsed = 0
+    total_others = 0
+    
+    for chunk_number, (parsed, others) in enumerate(iter_exploded_comments(COMMENTS_FILE, chunksize), 1):
+        # Bucket this chunk's timestamped comments and fold them into the totals
+        pages = lookup.lookup(parsed['pid'])['postedBy']
+        _, chunk_counts = count_by_page(pages, timezones.local_times(parsed['timestamp'], pages), target_pages)
+        page_counts += chunk_counts
+        
+        # Count this chunk's comments without timestamp per page
+        other_pages = lookup.lookup(others['pid'])['postedBy']
+        other_counts = other_pages[other_pages.isin(target_pages)].value_counts()
+        others_per_page = others_per_page.add(other_counts, fill_value=0)
+        
+        total_parsed += len(parsed)
+        total_others += len(others)
+        print(f"  Chunk {chunk_number}: {len(parsed)} comments with timestamps, {len(others)} without")
+    
+    print(f"Successfully extracted {total_parsed} individual comments with timestamps")
+    print(f"Found {total_others} comments without timestamps (will be categorized as 'Others')")
+    print(f"Found {page_counts.sum()} comments for the specified e-commerce pages")
+    instrumentation.set_rows(total_parsed + total_others)
+    
+    return target_pages, page_counts, others_per_page.astype(int)
+
+def print_reaction_insights(page_names, page_counts, others_per_page):
+    """Print when users are most active on each page, from its bucket counts"""
+    # Hour of day at the start of each bucket
+    bucket_minutes = 24 * 60 // page_counts.shape[1]
+    hours = np.arange(page_counts.shape[1]) * bucket_minutes // 60
+    
+    for page, counts in zip(page_names, page_counts):
+        # Count comments with timestamp info
+        comments_with_timestamp = counts.sum()
+        if comments_with_timestamp == 0:
+            print(f"\n  {page}: No comments found")
+            continue
+        
+        # Find the most active time bucket
+        most_active_bucket = counts.argmax()
+        most_active_time = bucket_range_label(most_active_bucket, bucket_minutes)
+        
+        # Find the least active time bucket (with at least one comment)
+        active_buckets = np.flatnonzero(counts)
+        least_active_time_bucket = active_buckets[counts[active_buckets].argmin()]
+        least_active_count = counts[least_active_time_bucket]
+        least_active_time = bucket_range_label(least_active_time_bucket, bucket_minutes)
+        
+        # Calculate the average number of comments per (active) bucket
+        avg_comments = counts[active_buckets].mean()
+        
+        # Count comments without timestamp info for this page
+        comments_without_timestamp_count = int(others_per_page.get(page, 0))
+        
+        total_comments = comments_with_timestamp + comments_without_timestamp_count
+        
+        print(f"\n  {page}:")
+        print(f"    - Total comments: {total_comments}")
+        print(f"    - Comments with timestamp data: {comments_with_timestamp}")
+        print(f"    - Comments without timestamp (categorized as 'Others'): {comments_without_timestamp_count}")
+        print(f"    - Most active time: {most_active_time} ({counts[most_active_bucket]} comments)")
+        print(f"    - Least active time: {least_active_time} ({least_active_count} comments)")
+        print(f"    - Average comments per time bucket: {avg_comments:.2f}")
+        
+        # Check if there are clear activity patterns
+        morning_comments = counts[(hours >= 6) & (hours < 12)].sum()
+        afternoon_comments = counts[(hours >= 12) & (hours < 18)].sum()
+        evening_comments = counts[(hours >= 18) & (hours < 22)].sum()
+        night_comments = counts[(hours >= 22) | (hours < 6)].sum()
+        
+        # Only show distribution for comments with timestamp data
+        print(f"    - Time of day distribution (for comments with timestamp data):")
+        print(f"      * Morning (6:00-11:59): {morning_comments} comments ({morning_comments/comments_with_timestamp*100:.1f}%)")
+        print(f"      * Afternoon (12:00-17:59): {afternoon_comments} comments ({afternoon_comments/comments_with_timestamp*100:.1f}%)")
+        print(f"      * Evening (18:00-21:59): {evening_comments} comments ({evening_comments/comments_with_timestamp*100:.1f}%)")
+        print(f"      * Night (22:00-5:59): {night_comments} comments ({night_comments/comments_with_timestamp*100:.1f}%)")
+        
+        # Show percentage of comments with timestamp vs without
+        print(f"      * Comments with timestamp: {comments_with_timestamp/total_comments*100:.1f}%")
+        print(f"      * Others (no timestamp): {comments_without_timestamp_count/total_comments*100:.1f}%")
+
+def plot_reaction_patterns(result_df, target_pages, output_file):
+    """
+    Draw the comments per time bucket of each e-commerce page as a line chart and save it.
+    
+    Returns the path written (its extension follows the configured chart format).
+    """
+    fig, ax = plotting.figure((15, 8))
     
     # Define colors for each platform
     colors = {
@@ -315,144 +290,135 @@ def analyze_user_reactions():
         'Myntra': 'purple'
     }
     
+    # One line per page, in the order of target_pages
+    page_results = dict(tuple(result_df.groupby('E-commerce Page', sort=False)))
     for page in target_pages:
-        page_results = result_df[result_df['E-commerce Page'] == page]
-        if not page_results.empty:
-            plt.plot(
-                page_results['Time Bucket'], 
-                page_results['Comment Count'], 
+        if page in page_results:
+            ax.plot(
+                page_results[page]['Time Bucket'], 
+                page_results[page]['Comment Count'], 
                 marker='o', 
                 linestyle='-', 
                 color=colors.get(page, 'blue'),
                 label=page
             )
     
-    # Set the x-tick labels (show every 4th label to avoid overcrowding)
-    tick_indices = range(0, 96, 4)  # Every 1 hour
-    tick_labels = []
-    
-    for i in tick_indices:
-        hour = i // 4
-        minute = (i % 4) * 15
-        
-        # Calculate the end time (add 14 minutes)
-        end_minute = minute + 14
-        if end_minute >= 60:
-            end_hour = hour + 1
-            end_minute = end_minute - 60
-        else:
-            end_hour = hour
-            
-        # Format the time range in 24-hour format
-        time_range = f"{hour:02d}:{minute:02d}-{end_hour:02d}:{end_minute:02d}"
-        tick_labels.append(time_range)
-    
-    plt.xticks(tick_indices, tick_labels, rotation=45)
+    # Label every full hour with the time range of its bucket
+    tick_indices, tick_labels = plotting.hour_ticks(range_labels=True)
+    ax.set_xticks(tick_indices)
+    ax.set_xticklabels(tick_labels, rotation=45)
     
     # Add labels and title
-    plt.xlabel('Time of Day (15-minute ranges)', fontsize=12)
-    plt.ylabel('Number of Comments', fontsize=12)
-    plt.title('User Reaction Patterns for E-commerce Facebook Pages', fontsize=14)
+    ax.set_xlabel('Time of Day (15-minute ranges)', fontsize=12)
+    ax.set_ylabel('Number of Comments', fontsize=12)
+    ax.set_title('User Reaction Patterns for E-commerce Facebook Pages', fontsize=14)
     
     # Add grid and legend
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.legend(title='E-commerce Page', fontsize=10)
+    ax.grid(True, linestyle='--', alpha=0.7)
+    ax.legend(title='E-commerce Page', fontsize=10)
     
-    # Adjust layout
-    plt.tight_layout()
+    # Adjust layout and save the figure
+    fig.tight_layout()
+    return plotting.save(fig, output_file)
+
+def analyze_user_reactions(chunksize=None, post_data=None, comment_tables=None, plots=True, store=None):
+    """
+    Analyze user reactions (comments) on e-commerce Facebook pages.
+    
+    This function:
+    1. Loads and parses Comments.csv and Post-Summary.csv
+    2. Extracts individual comments and their timestamps
+    3. Filters for e-commerce pages: Flipkart, Amazon, Snapdeal, Myntra
+    4. Groups comments into 96 time buckets (15-minute intervals)
+    5. Calculates total reactions in each time bucket
+    6. Generates visualization comparing reaction patterns
+    7. Provides insights on when users are most active
+    
+    With `chunksize`, Comments.csv is streamed in chunks of that many rows and
+    steps 2-5 run chunk by chunk, keeping memory bounded for very large files.
+    
+    `post_data` and `comment_tables` may hold already loaded tables (see
+    run_analyses.py); whatever is missing is loaded here. With plots=False the
+    chart is skipped and matplotlib is never imported. With an
+    aggregate_store.AggregateStore the counts of steps 2-6 are read from its
+    persisted aggregates instead of recounted.
+    """
+    print("Starting analysis of user reactions on e-commerce Facebook pages...\n")
     
-    # Save the figure
-    output_file = os.path.join(current_dir, "user_reaction_patterns.png")
-    plt.savefig(output_file)
-    print(f"Chart saved as 'user_reaction_patterns.png'")
+    # Step 1: Load the data from CSV files
+    instrumentation.step("Step 1: Load post data")
+    if post_data is None:
+        print("Loading data from CSV files...")
+        try:
+            # Load the typed Post Summary table (pid is already a string for joining)
+            post_data = load_post_summary()
+            print(f"Successfully loaded {len(post_data)} posts")
+        except Exception as e:
+            print(f"Error loading CSV files: {e}")
+            return
+    else:
+        print(f"Using {len(post_data)} preloaded posts")
+    instrumentation.set_rows(len(post_data))
+    
+    # Print the column names to verify the structure
+    print("Columns in the post dataset:", post_data.columns.tolist())
+    
+    # Steps 2-6: Extract the comments and count them per page and time bucket
+    if store is not None:
+        counts = count_reactions_from_store(store)
+    elif chunksize:
+        counts = count_reactions_in_chunks(post_data, chunksize)
+    else:
+        counts = count_reactions_in_memory(post_data, comment_tables)
+    if counts is None:
+        return
+    target_pages, page_counts, others_per_page = counts
+    
+    # Keep only pages that actually have comments
+    has_comments = page_counts.sum(axis=1) > 0
+    result_df = counts_to_frame(
+        [page for page, keep in zip(target_pages, has_comments) if keep],
+        page_counts[has_comments],
+        page_column='E-commerce Page',
+        count_column='Comment Count'
+    )
+    
+    # Step 7: Generate visualization comparing reaction patterns
+    if plots:
+        instrumentation.step("Step 7: Plot reaction patterns")
+        print("\nGenerating visualization comparing reaction patterns...")
+        output_file = plot_reaction_patterns(result_df, target_pages,
+                                             os.path.join(current_dir, "user_reaction_patterns.png"))
+        print(f"Chart saved as '{os.path.basename(output_file)}'")
+    else:
+        print("\nSkipping the reaction pattern chart (--no-plots)")
     
     # Step 8: Provide insights on when users are most active
+    instrumentation.step("Step 8: Reaction insights")
     print("\nInsights on when users are most active:")
+    print_reaction_insights(target_pages, page_counts, others_per_page)
     
-    for page in target_pages:
-        page_data = ecommerce_data[ecommerce_data['postedBy'] == page]
-        if len(page_data) > 0:
-            # Find the most active time bucket
-            most_active_bucket = page_data['time_bucket'].value_counts().idxmax()
-            most_active_hour = most_active_bucket // 4
-            most_active_minute = (most_active_bucket % 4) * 15
-            
-            # Calculate the end of the 15-minute range
-            end_minute = most_active_minute + 14
-            if end_minute >= 60:
-                end_hour = most_active_hour + 1
-                end_minute = end_minute - 60
-            else:
-                end_hour = most_active_hour
-                
-            # Format the time range
-            most_active_time = f"{most_active_hour:02d}:{most_active_minute:02d}-{end_hour:02d}:{end_minute:02d}"
-            
-            # Find the least active time bucket (with at least one comment)
-            active_buckets = page_data['time_bucket'].value_counts()
-            if len(active_buckets) > 0:
-                least_active_bucket = active_buckets.min()
-                least_active_time_bucket = active_buckets[active_buckets == least_active_bucket].index[0]
-                least_active_hour = least_active_time_bucket // 4
-                least_active_minute = (least_active_time_bucket % 4) * 15
-                
-                # Calculate the end of the 15-minute range for least active time
-                end_minute = least_active_minute + 14
-                if end_minute >= 60:
-                    end_hour = least_active_hour + 1
-                    end_minute = end_minute - 60
-                else:
-                    end_hour = least_active_hour
-                    
-                least_active_time = f"{least_active_hour:02d}:{least_active_minute:02d}-{end_hour:02d}:{end_minute:02d}"
-            else:
-                least_active_time = "N/A"
-                least_active_bucket = 0
-            
-            # Calculate the average number of comments per bucket
-            avg_comments = page_data.groupby('time_bucket').size().mean() if len(page_data.groupby('time_bucket')) > 0 else 0
-            
-            # Count comments with timestamp info
-            comments_with_timestamp = len(page_data)
-            
-            # Count comments without timestamp info for this page
-            # This requires accessing the original data
-            comments_without_timestamp_count = sum(1 for comment in comments_without_timestamp 
-                                                if comment['pid'] in set(post_data[post_data['postedBy'] == page]['pid']))
-            
-            total_comments = comments_with_timestamp + comments_without_timestamp_count
-            
-            print(f"\n  {page}:")
-            print(f"    - Total comments: {total_comments}")
-            print(f"    - Comments with timestamp data: {comments_with_timestamp}")
-            print(f"    - Comments without timestamp (categorized as 'Others'): {comments_without_timestamp_count}")
-            
-            if comments_with_timestamp > 0:
-                print(f"    - Most active time: {most_active_time} ({page_data['time_bucket'].value_counts().max()} comments)")
-                print(f"    - Least active time: {least_active_time} ({least_active_bucket} comments)")
-                print(f"    - Average comments per time bucket: {avg_comments:.2f}")
-                
-                # Check if there are clear activity patterns
-                morning_comments = len(page_data[(page_data['hour'] >= 6) & (page_data['hour'] < 12)])
-                afternoon_comments = len(page_data[(page_data['hour'] >= 12) & (page_data['hour'] < 18)])
-                evening_comments = len(page_data[(page_data['hour'] >= 18) & (page_data['hour'] < 22)])
-                night_comments = len(page_data[((page_data['hour'] >= 22) | (page_data['hour'] < 6))])
-                
-                # Only show distribution for comments with timestamp data
-                print(f"    - Time of day distribution (for comments with timestamp data):")
-                print(f"      * Morning (6:00-11:59): {morning_comments} comments ({morning_comments/comments_with_timestamp*100:.1f}%)")
-                print(f"      * Afternoon (12:00-17:59): {afternoon_comments} comments ({afternoon_comments/comments_with_timestamp*100:.1f}%)")
-                print(f"      * Evening (18:00-21:59): {evening_comments} comments ({evening_comments/comments_with_timestamp*100:.1f}%)")
-                print(f"      * Night (22:00-5:59): {night_comments} comments ({night_comments/comments_with_timestamp*100:.1f}%)")
-                
-                # Show percentage of comments with timestamp vs without
-                if total_comments > 0:
-                    print(f"      * Comments with timestamp: {comments_with_timestamp/total_comments*100:.1f}%")
-                    print(f"      * Others (no timestamp): {comments_without_timestamp_count/total_comments*100:.1f}%")
-        else:
-            print(f"\n  {page}: No comments found")
-    
+    instrumentation.end_step()
     print("\nAnalysis complete!")
 
 if __name__ == "__main__":
-    analyze_user_reactions()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Analyze user reactions on e-commerce Facebook pages")
+    parser.add_argument('--chunksize', type=int,
+                        help="stream Comments.csv in chunks of this many rows to bound memory use")
+    parser.add_argument('--incremental', action='store_true',
+                        help="fold new posts and comments into the aggregate store and read the counts from it")
+    plotting.add_plot_arguments(parser)
+    timezones.add_timezone_arguments(parser)
+    instrumentation.add_profile_arguments(parser)
+    args = parser.parse_args()
+    plotting.configure_from_args(args)
+    timezones.configure_from_args(args)
+    instrumentation.start_profiling(args)
+    try:
+        post_data = store = None
+        if args.incremental:
+            post_data = load_post_summary()
+            store = update_store(post_data, load_comment_tables())
+        analyze_user_reactions(chunksize=args.chunksize, post_data=post_data, plots=args.plots, store=store)
+    finally:
+        instrumentation.finish_profiling(args)
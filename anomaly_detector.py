@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Anomalous-timestamp detector for posts and comments.
+
+Automates the manual hunt behind the 3:00-3:14 AM Bengaluru investigation
+(see analyze_posting_behavior.py and extract_times.py). Three kinds of
+anomalies are flagged, each with a vectorized pass over the sorted
+(page, epoch second) pairs or the (page x bucket) count matrix:
+
+- duplicate timestamps: several rows of one page stamped at the exact same
+  second (np.unique with counts), typical of bulk imports
+- bursts: runs of rows of one page that follow each other within a few
+  seconds (np.diff, then cluster ids with a cumulative sum), typical of
+  scheduled posting
+- bucket deviations: time buckets whose count is far from the page's
+  baseline, by the robust z-score 0.6745 * (count - median) / MAD
+
+The findings are printed and written to a compact text report.
+
+Usage:
+    python anomaly_detector.py [--kind posts|comments] [--group traffic|e-commerce|all]
+        [--burst-gap 60] [--burst-size 5] [--threshold 3.5] [--top 10] [--report anomaly_report.txt]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import timezones
+from comment_parser import PostAttributes
+from data_loader import load_comment_tables, load_post_summary
+from period_cube import PAGE_GROUPS
+from time_buckets import bucket_index, bucket_range_label, count_codes_by_bucket
+
+# Get the current directory where the script is running
+current_dir = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+
+# Scales the MAD to the standard deviation of normally distributed counts
+MAD_SCALE = 0.6745
+
+
+def post_timestamps(post_data, pages=None):
+    """Return (page of each post, epoch seconds) for the posts with a creation time"""
+    times = pd.to_datetime(post_data['createdTime'], utc=True)
+    keep = times.notna()
+    if pages is not None:
+        keep &= post_data['postedBy'].isin(pages)
+    keep = keep.to_numpy()
+    epoch = times[keep].to_numpy(dtype='datetime64[s]').astype(np.int64)
+    return post_data['postedBy'][keep].to_numpy(dtype=object), epoch
+
+
+def comment_timestamps(post_data, comment_tables, pages=None):
+    """Return (page of each comment's post, epoch seconds) for the timestamped comments"""
+    parsed, _ = comment_tables
+    comment_pages = PostAttributes(post_data, columns=('postedBy',)).lookup_compact(parsed)['postedBy']
+    keep = comment_pages.notna()
+    if pages is not None:
+        keep &= comment_pages.isin(pages)
+    keep = keep.to_numpy()
+    return comment_pages[keep].to_numpy(dtype=object), parsed.epoch[keep]
+
+
+def _sorted_codes(pages, epoch):
+    """Return (page names, page codes, epoch) sorted by page and then time"""
+    codes, names = pd.factorize(pd.Series(pages), sort=True)
+    order = np.lexsort((epoch, codes))
+    return list(names), codes[order].astype(np.int64), np.asarray(epoch, dtype=np.int64)[order]
+
+
+def _local_frame(names, codes, epoch, columns):
+    """Return a frame with the page, the local time of `epoch` and the extra columns"""
+    pages = pd.Series(np.asarray(names, dtype=object)[codes] if len(names) else [], dtype=object)
+    times = pd.Series(epoch.astype('datetime64[s]').astype('datetime64[ns]'))
+    local = timezones.local_times(times, pages)
+    return pd.DataFrame({'Page': pages, 'Local Time': local, **columns})
+
+
+def duplicate_timestamps(pages, epoch, min_count=2):
+    """
+    Return the exact timestamps shared by `min_count` or more rows of the same page.
+
+    Columns: Page, Local Time, Count; sorted by Count (largest first).
+    """
+    names, codes, epoch = _sorted_codes(pages, epoch)
+    if len(epoch) == 0:
+        return _local_frame(names, codes, epoch, {'Count': np.empty(0, dtype=np.int64)})
+
+    # One (page, second) key per row; np.unique counts the repeats of every key
+    keys = np.stack([codes, epoch], axis=1)
+    unique_keys, counts = np.unique(keys, axis=0, return_counts=True)
+    repeated = counts >= min_count
+    result = _local_frame(names, unique_keys[repeated, 0], unique_keys[repeated, 1], {'Count': counts[repeated]})
+    return result.sort_values(['Count', 'Local Time'], ascending=[False, True], kind='stable').reset_index(drop=True)
+
+
+def burst_clusters(pages, epoch, max_gap=60, min_size=5):
+    """
+    Return the bursts: runs of `min_size` or more rows of one page, each at most
+    `max_gap` seconds after the previous one.
+
+    Columns: Page, Local Time (start), Rows, Seconds (duration), Distinct
+    Seconds; sorted by Rows (largest first).
+    """
+    names, codes, epoch = _sorted_codes(pages, epoch)
+    columns = {'Rows': np.empty(0, dtype=np.int64), 'Seconds': np.empty(0, dtype=np.int64),
+               'Distinct Seconds': np.empty(0, dtype=np.int64)}
+    if len(epoch) == 0:
+        return _local_frame(names, codes, epoch, columns)
+
+    # A new cluster starts at the first row, at every change of page and after every long gap
+    starts = np.ones(len(epoch), dtype=bool)
+    starts[1:] = (np.diff(codes) != 0) | (np.diff(epoch) > max_gap)
+    cluster = np.cumsum(starts) - 1
+    sizes = np.bincount(cluster)
+
+    first = np.flatnonzero(starts)
+    last = np.append(first[1:], len(epoch)) - 1
+    # Rows that repeat the previous row's second add no distinct second
+    new_second = np.ones(len(epoch), dtype=np.int64)
+    new_second[1:] = (epoch[1:] != epoch[:-1]) | starts[1:]
+    distinct = np.bincount(cluster, weights=new_second).astype(np.int64)
+
+    bursts = sizes >= min_size
+    result = _local_frame(names, codes[first[bursts]], epoch[first[bursts]], {
+        'Rows': sizes[bursts],
+        'Seconds': epoch[last[bursts]] - epoch[first[bursts]],
+        'Distinct Seconds': distinct[bursts]
+    })
+    return result.sort_values(['Rows', 'Local Time'], ascending=[False, True], kind='stable').reset_index(drop=True)
+
+
+def robust_z_scores(counts):
+    """
+    Return (robust z-scores, median) of every bucket against its page's row.
+
+    z = 0.6745 * (count - median) / MAD. For pages whose MAD is 0 (most buckets
+    share one count) the mean absolute deviation, scaled by 0.7979, stands in;
+    pages without any spread get z = 0.
+    """
+    counts = np.asarray(counts, dtype=float)
+    median = np.median(counts, axis=1, keepdims=True)
+    deviation = np.abs(counts - median)
+    mad = np.median(deviation, axis=1, keepdims=True)
+    # Both spreads estimate the standard deviation of normally distributed counts:
+    # MAD / 0.6745 and mean absolute deviation / 0.7979 (sqrt(2 / pi))
+    spread = np.where(mad > 0, mad / MAD_SCALE, deviation.mean(axis=1, keepdims=True) / 0.7979)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(spread > 0, (counts - median) / spread, 0.0)
+    return z, median[:, 0]
+
+
+def bucket_deviations(pages, epoch, threshold=3.5, min_page_rows=100):
+    """
+    Return the (page, local time bucket) cells whose robust z-score is at least `threshold` in size.
+
+    Pages with fewer than `min_page_rows` rows are skipped: with a handful of
+    rows spread over 96 buckets every non-empty bucket looks like an outlier.
+
+    Columns: Page, Time Bucket, Time, Count, Baseline (the page's median
+    bucket count) and Robust Z; sorted by Robust Z (largest first).
+    """
+    pages = pd.Series(pages, dtype=object)
+    local = timezones.local_times(pd.Series(np.asarray(epoch, dtype='datetime64[s]').astype('datetime64[ns]')),
+                                  pages)
+    names, counts = count_codes_by_bucket(pages, bucket_index(local), sorted(pages.unique()))
+    z, baseline = robust_z_scores(counts)
+    z[counts.sum(axis=1) < min_page_rows] = 0
+
+    rows, buckets = np.nonzero(np.abs(z) >= threshold)
+    result = pd.DataFrame({
+        'Page': np.asarray(names, dtype=object)[rows] if len(names) else np.empty(0, dtype=object),
+        'Time Bucket': buckets,
+        'Time': [bucket_range_label(bucket) for bucket in buckets],
+        'Count': counts[rows, buckets],
+        'Baseline': baseline[rows],
+        'Robust Z': z[rows, buckets]
+    })
+    return result.sort_values('Robust Z', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def detect_anomalies(pages, epoch, max_gap=60, min_size=5, threshold=3.5, min_page_rows=100):
+    """Run all three detectors; return {'duplicates', 'bursts', 'deviations'} frames"""
+    return {
+        'duplicates': duplicate_timestamps(pages, epoch),
+        'bursts': burst_clusters(pages, epoch, max_gap, min_size),
+        'deviations': bucket_deviations(pages, epoch, threshold, min_page_rows)
+    }
+
+
+def format_report(anomalies, kind, total_rows, max_gap, min_size, threshold, top=10):
+    """Return the findings as a compact text report (the `top` largest of each kind per section)"""
+    duplicates = anomalies['duplicates']
+    bursts = anomalies['bursts']
+    deviations = anomalies['deviations']
+    lines = [f"Anomalous timestamps in {total_rows} {kind} (local time of each page)", ""]
+
+    lines.append(f"Duplicate timestamps: {len(duplicates)} seconds shared by "
+                 f"{int(duplicates['Count'].sum())} {kind}")
+    for page, rows in duplicates.groupby('Page', sort=True):
+        lines.append(f"  {page}: {len(rows)} seconds, {int(rows['Count'].sum())} {kind}")
+    for _, row in duplicates.head(top).iterrows():
+        lines.append(f"    {row['Local Time']:%Y-%m-%d %H:%M:%S} {row['Page']}: {row['Count']} {kind}")
+
+    lines.append("")
+    lines.append(f"Bursts ({min_size}+ {kind}, at most {max_gap}s apart): {len(bursts)}")
+    for _, row in bursts.head(top).iterrows():
+        lines.append(f"    {row['Local Time']:%Y-%m-%d %H:%M:%S} {row['Page']}: {row['Rows']} {kind} in "
+                     f"{row['Seconds']}s ({row['Distinct Seconds']} distinct seconds)")
+
+    lines.append("")
+    lines.append(f"Buckets deviating from the page baseline (|robust z| >= {threshold:g}): {len(deviations)}")
+    for _, row in deviations.head(top).iterrows():
+        lines.append(f"    {row['Time']} {row['Page']}: {row['Count']} {kind} vs a median of "
+                     f"{row['Baseline']:g} (z = {row['Robust Z']:.1f})")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag duplicate, bursty and unusual posting or comment times")
+    parser.add_argument('--kind', choices=('posts', 'comments'), default='posts', help='timestamps to check')
+    parser.add_argument('--group', choices=list(PAGE_GROUPS) + ['all'], default='all',
+                        help='pages to check (default: all)')
+    parser.add_argument('--burst-gap', type=int, default=60, metavar='SECONDS',
+                        help='largest gap between two rows of a burst (default: 60)')
+    parser.add_argument('--burst-size', type=int, default=5, help='fewest rows that make a burst (default: 5)')
+    parser.add_argument('--threshold', type=float, default=3.5,
+                        help='robust z-score that flags a bucket (default: 3.5)')
+    parser.add_argument('--min-page-rows', type=int, default=100,
+                        help='skip the bucket check for pages with fewer rows (default: 100)')
+    parser.add_argument('--top', type=int, default=10, help='findings listed per section of the report')
+    parser.add_argument('--report', default=os.path.join(current_dir, "anomaly_report.txt"),
+                        help='text report to write (default: anomaly_report.txt)')
+    parser.add_argument('--csv-prefix', help='also write each finding table to PREFIX_<kind>.csv')
+    timezones.add_timezone_arguments(parser)
+    args = parser.parse_args()
+    timezones.configure_from_args(args)
+
+    print("Loading data...")
+    post_data = load_post_summary()
+    pages = PAGE_GROUPS.get(args.group)
+    if args.kind == 'posts':
+        row_pages, epoch = post_timestamps(post_data, pages)
+    else:
+        row_pages, epoch = comment_timestamps(post_data, load_comment_tables(), pages)
+    print(f"Checking {len(epoch)} {args.kind} for anomalous timestamps...")
+
+    anomalies = detect_anomalies(row_pages, epoch, args.burst_gap, args.burst_size, args.threshold,
+                                 args.min_page_rows)
+    report = format_report(anomalies, args.kind, len(epoch), args.burst_gap, args.burst_size,
+                           args.threshold, args.top)
+    print()
+    print(report, end='')
+
+    with open(args.report, 'w') as f:
+        f.write(report)
+    print(f"\nReport written to {args.report}")
+
+    if args.csv_prefix:
+        for name, frame in anomalies.items():
+            frame.to_csv(f"{args.csv_prefix}_{name}.csv", index=False)
+        print(f"Finding tables written to {args.csv_prefix}_*.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Pipeline benchmark on synthetic Post Summary / Comments data.
+
+Times the main stages of the analyses - CSV load, cached load, comment explode,
+comment compaction, time bucketing, category aggregation, category cube
+queries, engagement bootstrap, comment sentiment scoring, term indexing and
+word-cloud rendering - on a generated dataset and reports throughput and peak
+RSS per stage. Every stage runs in a fresh process so its peak RSS is not
+inflated by earlier stages.
+
+Results can be saved with --json and compared against a saved run with
+--compare; the script exits with status 1 when a stage got slower (or uses more
+memory) than the tolerance allows.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--size 10k|100k|1m|10m] [--repeat N]
+        [--stages load,explode,...] [--json results.json] [--compare baseline.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+# Stages run in worker processes; none of them may try to open a window
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# Generated datasets are kept here between runs
+DATA_DIR = os.path.join(REPO_DIR, 'benchmarks', 'data')
+
+# Number of organizations rendered by the word-cloud stage
+WORD_CLOUD_ORGS = 3
+
+
+# Every stage takes the dataset paths and a scratch directory, does its setup and
+# returns (function to time, number of rows the function processes)
+
+def stage_load(post_path, comments_path, work_dir):
+    from data_loader import load_post_summary
+
+    return (lambda: load_post_summary(post_path, use_cache=False)), _count_rows(post_path)
+
+
+def stage_load_cached(post_path, comments_path, work_dir):
+    from data_loader import load_post_summary
+
+    posts = load_post_summary(post_path)  # Fills the cache
+    return (lambda: load_post_summary(post_path)), len(posts)
+
+
+def stage_explode(post_path, comments_path, work_dir):
+    from comment_parser import load_exploded_comments
+
+    parsed, others = load_exploded_comments(comments_path)
+    return (lambda: load_exploded_comments(comments_path)), len(parsed) + len(others)
+
+
+def stage_compact(post_path, comments_path, work_dir):
+    from comment_parser import load_compact_comments
+
+    parsed, others = load_compact_comments(comments_path)
+    return (lambda: load_compact_comments(comments_path)), len(parsed) + len(others)
+
+
+def stage_bucketing(post_path, comments_path, work_dir):
+    from data_loader import load_post_summary
+    from time_buckets import count_by_page
+
+    posts = load_post_summary(post_path, use_cache=False)
+    return (lambda: count_by_page(posts['postedBy'], posts['createdTime'])), len(posts)
+
+
+def stage_category(post_path, comments_path, work_dir):
+    from category_analysis_wordcloud import analyze_likes_by_category
+    from data_loader import load_post_summary
+
+    posts = load_post_summary(post_path, use_cache=False)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return analyze_likes_by_category(posts)
+
+    return run, len(posts)
+
+
+def stage_category_cube(post_path, comments_path, work_dir):
+    from category_cube import CategoryCube
+    from data_loader import load_post_summary
+
+    cube = CategoryCube.build(load_post_summary(post_path, use_cache=False))
+
+    def run():
+        # The queries the category analysis and the cube CLI answer most often
+        cube.summary('category')
+        cube.summary('page')
+        cube.summary(('category', 'month'))
+
+    return run, int(cube.count.sum())
+
+
+def stage_engagement(post_path, comments_path, work_dir):
+    from comment_parser import load_compact_comments
+    from data_loader import load_post_summary
+    from engagement_analysis import engagement_by_bucket, post_engagement
+
+    posts = post_engagement(load_post_summary(post_path, use_cache=False), load_compact_comments(comments_path))
+    return (lambda: engagement_by_bucket(posts)), len(posts)
+
+
+def stage_sentiment(post_path, comments_path, work_dir):
+    from comment_parser import load_compact_comments
+    from sentiment import score_comments
+
+    parsed, _ = load_compact_comments(comments_path)
+    # One process, so the throughput is per core (and the peak RSS is this process's)
+    return (lambda: score_comments(parsed, workers=1)), len(parsed)
+
+
+def stage_term_index(post_path, comments_path, work_dir):
+    from data_loader import load_post_summary
+    from term_index import TermIndex
+
+    posts = load_post_summary(post_path, use_cache=False)
+    return (lambda: TermIndex().update(posts)), len(posts)
+
+
+def stage_word_cloud(post_path, comments_path, work_dir):
+    from category_analysis_wordcloud import CUSTOM_STOPWORDS, render_word_cloud
+    from data_loader import load_post_summary
+    from term_index import TermIndex
+    from wordcloud import STOPWORDS
+
+    index = TermIndex()
+    index.update(load_post_summary(post_path, use_cache=False))
+    stopwords = set(STOPWORDS) | set(CUSTOM_STOPWORDS)
+    orgs = sorted(index.counts, key=lambda org: -sum(index.counts[org].values()))[:WORD_CLOUD_ORGS]
+    frequencies = {org: index.frequencies(org, stopwords) for org in orgs}
+
+    def run():
+        for i, org in enumerate(orgs):
+            render_word_cloud(org, frequencies[org], os.path.join(work_dir, f"cloud_{i}.png"))
+
+    return run, len(orgs)
+
+
+STAGES = {
+    'load': stage_load,
+    'load_cached': stage_load_cached,
+    'explode': stage_explode,
+    'compact': stage_compact,
+    'bucketing': stage_bucketing,
+    'category': stage_category,
+    'category_cube': stage_category_cube,
+    'engagement': stage_engagement,
+    'sentiment': stage_sentiment,
+    'term_index': stage_term_index,
+    'word_cloud': stage_word_cloud
+}
+
+
+def _count_rows(csv_path):
+    import pandas as pd
+    return sum(len(chunk) for chunk in pd.read_csv(csv_path, usecols=[0], chunksize=1_000_000))
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_stage(name, post_path, comments_path, repeat):
+    """Run one stage in the current (fresh) process and return its measurements"""
+    import data_loader
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Keep the benchmark's cached tables away from the real data cache
+        data_loader.CACHE_DIR = os.path.join(work_dir, '.cache')
+
+        func, rows = STAGES[name](post_path, comments_path, work_dir)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+
+    best = min(times)
+    return {
+        'stage': name,
+        'rows': rows,
+        'best_s': best,
+        'mean_s': sum(times) / len(times),
+        'rows_per_s': rows / best if best > 0 else float('inf'),
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+
+def ensure_dataset(size, seed):
+    """Generate the synthetic dataset for `size` unless it already exists; return its paths"""
+    from synthetic_data import write_dataset
+
+    out_dir = os.path.join(DATA_DIR, f"{size}-seed{seed}")
+    post_path = os.path.join(out_dir, 'Post-Summary.csv')
+    comments_path = os.path.join(out_dir, 'Comments.csv')
+    if not (os.path.exists(post_path) and os.path.exists(comments_path)):
+        print(f"Generating {size} synthetic dataset in {out_dir}...")
+        start = time.perf_counter()
+        write_dataset(out_dir, size, seed)
+        print(f"  done in {time.perf_counter() - start:.1f} s")
+    return post_path, comments_path
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of every stage against a baseline run; return the regressed stages"""
+    previous = {result['stage']: result for result in baseline['results']}
+    regressions = []
+    print(f"\nComparison with baseline (tolerance {tolerance:.0%}):")
+    for result in results:
+        old = previous.get(result['stage'])
+        if old is None:
+            continue
+        time_change = result['best_s'] / old['best_s'] - 1 if old['best_s'] > 0 else 0.0
+        rss_change = result['peak_rss_mb'] / old['peak_rss_mb'] - 1 if old['peak_rss_mb'] > 0 else 0.0
+        regressed = time_change > tolerance or rss_change > tolerance
+        if regressed:
+            regressions.append(result['stage'])
+        print(f"  {result['stage']:<12} time {time_change:+7.1%}   peak RSS {rss_change:+7.1%}"
+              f"{'   REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    from synthetic_data import SIZES
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', default='10k', help=f"dataset size: {', '.join(SIZES)} or a number of posts")
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the synthetic dataset')
+    parser.add_argument('--repeat', type=int, default=3, help='timing repetitions per stage (best is reported)')
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma-separated stages to run')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='baseline results file written by --json')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown/growth against the baseline')
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)} (available: {', '.join(STAGES)})")
+
+    post_path, comments_path = ensure_dataset(args.size, args.seed)
+
+    # A fresh spawned process per stage, so the peak RSS of each stage is its own
+    context = multiprocessing.get_context('spawn')
+    results = []
+    print(f"\n{'stage':<12} {'rows':>11} {'best':>10} {'mean':>10} {'rows/s':>13} {'peak RSS':>10}")
+    for stage in stages:
+        with context.Pool(1) as pool:
+            result = pool.apply(_run_stage, (stage, post_path, comments_path, args.repeat))
+        results.append(result)
+        print(f"{stage:<12} {result['rows']:>11,} {result['best_s'] * 1000:>8.1f}ms {result['mean_s'] * 1000:>8.1f}ms "
+              f"{result['rows_per_s']:>13,.0f} {result['peak_rss_mb']:>8.1f}MB")
+
+    report = {'size': args.size, 'seed': args.seed, 'repeat': args.repeat, 'results': results}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
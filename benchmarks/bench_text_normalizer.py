@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: batch text normalization vs. the original six-pass cleanup.
+
+Times the original per-message cleanup (.apply) against the column-wide
+normalize_series on the full Post Summary message column and checks that they
+produce identical output.
+
+Usage:
+    python benchmarks/bench_text_normalizer.py [--repeat N]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import load_post_summary
+from text_normalizer import normalize_series
+
+
+def reference_preprocess_text(text):
+    """The original preprocess_text implementation (one regex pass per step)"""
+    if pd.isna(text) or text == "":
+        return ""
+    text = str(text).lower()
+    text = re.sub(r'http\S+|www\S+|https\S+', '', text)
+    text = re.sub(r'@\w+', '', text)
+    text = re.sub(r'#\w+', '', text)
+    text = re.sub(r'[^\w\s]', '', text)
+    text = re.sub(r'\d+', '', text)
+    text = ''.join(c for c in text if ord(c) < 128)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def best_time(func, repeat):
+    """Return the best wall time of `repeat` calls and the last result"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='timing repetitions (best is reported)')
+    args = parser.parse_args()
+
+    messages = load_post_summary()['message']
+    print(f"Normalizing {len(messages)} messages ({messages.astype(str).str.len().sum()} characters)")
+
+    old_time, old_result = best_time(lambda: messages.apply(reference_preprocess_text), args.repeat)
+    new_time, new_result = best_time(lambda: normalize_series(messages), args.repeat)
+
+    mismatches = (old_result != new_result).sum()
+    print(f"  original preprocess_text (.apply): {old_time * 1000:8.1f} ms")
+    print(f"  normalize_series (column-wide):    {new_time * 1000:8.1f} ms")
+    print(f"  speedup: {old_time / new_time:.1f}x, mismatching rows: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
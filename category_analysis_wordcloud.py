@@ -1,70 +1,84 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from wordcloud import WordCloud, STOPWORDS
-import re
+import argparse
 import os
 import hashlib
+import json
 from collections import Counter
 
-# Set the style for plots
-plt.style.use('ggplot')
-sns.set_palette("Set2")
+import instrumentation
+import plotting
+from aggregate_store import update_store
+from category_cube import CategoryCube
+from data_loader import load_post_summary
+from excel_export import ExcelReport
+from term_index import TermIndex
+from text_normalizer import normalize_text
 
 def load_data():
     """Load the Post Summary data"""
-    # Read the CSV file
-    post_summary = pd.read_csv('data/Post-Summary.csv')
-    # Convert likesCount to numeric, handling empty strings
-    post_summary['likesCount'] = pd.to_numeric(post_summary['likesCount'], errors='coerce')
-    # Fill NaN values with 0
-    post_summary['likesCount'] = post_summary['likesCount'].fillna(0)
-    return post_summary
-
-def analyze_likes_by_category(post_summary):
-    """Calculate average likes per post for each category"""
-    # List of categories to include in the analysis
-    target_categories = [
-        'Politician', 
-        'Media/News/Publishing', 
-        'Telecommunication', 
-        'Product/Service', 
-        'Website', 
-        'Retail and Consumer Merchandise', 
-        'Clothing', 
-        'Hospital/Clinic', 
-        'Government Organization', 
-        'Health/Medical/Pharmaceuticals'
-    ]
-    
-    # Filter the data to include only the specified categories
-    filtered_data = post_summary[post_summary['category'].isin(target_categories)]
-    
-    # Group by category and calculate average likes
-    category_likes = filtered_data.groupby('category')['likesCount'].agg(['mean', 'sum', 'count']).reset_index()
-    # Rename columns for clarity
-    category_likes.columns = ['Category', 'Average Likes', 'Total Likes', 'Post Count']
-    # Sort by average likes in descending order
-    category_likes = category_likes.sort_values('Average Likes', ascending=False)
+    # The shared loader converts likesCount to numeric (missing values become 0)
+    # and caches the typed table for later runs
+    return load_post_summary()
+
+# Categories compared by default
+TARGET_CATEGORIES = [
+    'Politician', 
+    'Media/News/Publishing', 
+    'Telecommunication', 
+    'Product/Service', 
+    'Website', 
+    'Retail and Consumer Merchandise', 
+    'Clothing', 
+    'Hospital/Clinic', 
+    'Government Organization', 
+    'Health/Medical/Pharmaceuticals'
+]
+
+def analyze_likes_by_category(post_summary, store=None, categories=TARGET_CATEGORIES, cube=None):
+    """
+    Calculate average, median, p90/p99 and trimmed mean likes per post for each category.
+    
+    `categories` may be any list of categories (None for all of them). The
+    statistics are read from a category_cube.CategoryCube, built from
+    `post_summary` unless one is passed in. With an aggregate_store.AggregateStore
+    the like sums and post counts are read from its persisted aggregates and the
+    robust statistics from its persisted cube instead, so the posts are not regrouped.
+    """
+    if cube is None and store is not None and store.category_cube is not None:
+        cube = store.category_cube
+    # Build the (category x page x month) cube once; every statistic is read from it
+    if cube is None:
+        cube = CategoryCube.build(post_summary)
+    category_likes = cube.summary('category', categories)
+    
+    if store is not None and store.category_likes:
+        # Already sorted by average likes, highest first; the robust statistics come from the cube
+        robust_columns = ['Category'] + list(category_likes.columns[4:])
+        category_likes = store.category_summary(categories).merge(category_likes[robust_columns], on='Category',
+                                                                  how='left')
     
     # Print the results
     print("\nCategory Analysis Results:")
     print("=" * 50)
     for _, row in category_likes.iterrows():
         print(f"{row['Category']}: {row['Average Likes']:.2f} avg likes across {row['Post Count']} posts (Total: {row['Total Likes']})")
+        print(f"    median {row['Median Likes']:.0f}, p90 {row['P90 Likes']:.0f}, p99 {row['P99 Likes']:.0f}, "
+              f"trimmed mean {row['Trimmed Mean Likes']:.2f}")
     
     return category_likes
 
-def create_category_bar_chart(category_likes):
-    """Create a bar chart showing average likes per category"""
+def create_category_bar_chart(category_likes, output_file='category_likes_analysis.png'):
+    """Create a bar chart showing average likes per category; return the path written"""
     # Filter out categories with excessively long names for better plotting
     filtered_likes = category_likes[category_likes['Category'].str.len() < 30]
     
-    plt.figure(figsize=(12, 8))
+    # Set the style for plots
+    plotting.apply_style('ggplot', 'Set2')
+    fig, ax = plotting.figure((12, 8))
     
     # Create bar chart
-    ax = sns.barplot(x='Category', y='Average Likes', data=filtered_likes)
+    plotting.seaborn().barplot(x='Category', y='Average Likes', data=filtered_likes, ax=ax)
     
     # Add post count as text on each bar
     for i, row in enumerate(filtered_likes.itertuples()):
@@ -74,162 +88,241 @@ def create_category_bar_chart(category_likes):
                 fontweight='bold')
     
     # Add labels and title
-    plt.title('Average Number of Likes per Post by Category', fontsize=16)
-    plt.xlabel('Category', fontsize=14)
-    plt.ylabel('Average Likes', fontsize=14)
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
+    ax.set_title('Average Number of Likes per Post by Category', fontsize=16)
+    ax.set_xlabel('Category', fontsize=14)
+    ax.set_ylabel('Average Likes', fontsize=14)
+    ax.tick_params(axis='x', labelrotation=45)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+    fig.tight_layout()
     
     # Save the figure
-    plt.savefig('category_likes_analysis.png', dpi=300)
-    plt.close()
+    return plotting.save(fig, output_file, dpi=300)
 
-def save_to_excel(category_likes):
+def save_to_excel(category_likes, output_file='category_analysis.xlsx'):
     """Save category analysis results to Excel"""
-    # Create a Excel writer object
-    writer = pd.ExcelWriter('category_analysis.xlsx', engine='xlsxwriter')
-    
-    # Write the dataframe to excel
-    category_likes.to_excel(writer, sheet_name='Category Analysis', index=False)
-    
-    # Get the xlsxwriter workbook and worksheet objects
-    workbook = writer.book
-    worksheet = writer.sheets['Category Analysis']
-    
-    # Add a format for the header
-    header_format = workbook.add_format({
-        'bold': True,
-        'text_wrap': True,
-        'valign': 'top',
-        'fg_color': '#D7E4BC',
-        'border': 1
-    })
-    
-    # Write the column headers with the defined format
-    for col_num, value in enumerate(category_likes.columns.values):
-        worksheet.write(0, col_num, value, header_format)
-        
-    # Set the column width
-    worksheet.set_column('A:A', 20)
-    worksheet.set_column('B:C', 15)
-    
-    # Close the Pandas Excel writer and save the Excel file
-    writer._save()
+    # Stream the table into the workbook with the shared header format (see excel_export)
+    with ExcelReport(output_file) as workbook:
+        workbook.write_frame('Category Analysis', category_likes, widths={'A:A': 20, 'B:C': 15})
 
 def preprocess_text(text):
     """Preprocess text for word cloud generation"""
-    if pd.isna(text) or text == "":
-        return ""
-    
-    # Convert to lowercase
-    text = str(text).lower()
+    # Lowercase and remove URLs, mentions, hashtags, special characters, numbers
+    # and non-ASCII characters (see text_normalizer for the batch version)
+    return normalize_text(text)
+
+# Custom stopwords added on top of the wordcloud defaults
+CUSTOM_STOPWORDS = ['will', 'now', 'get', 'one', 'like', 'shop', 'offers', 
+                    'available', 'check', 'new', 'today', 'facebook', 'make',
+                    'offer', 'limited', 'time', 'can', 'also', 'discount',
+                    'just', 'buy', 'shopping', 'day', 'know', 'use']
+
+# Parameters passed to WordCloud for every organization
+WORDCLOUD_PARAMS = {
+    'background_color': 'white',
+    'max_words': 100,
+    'max_font_size': 40,
+    'width': 800,
+    'height': 400,
+    'random_state': 42
+}
+
+WORD_CLOUD_DIR = 'word_clouds'
+WORD_CLOUD_DPI = 300
+
+# Manifest recording the cache key each word cloud image was rendered from
+WORD_CLOUD_CACHE_FILE = os.path.join(WORD_CLOUD_DIR, '.wordcloud_cache.json')
+
+def word_cloud_filename(org):
+    """Return the image filename for an organization's word cloud"""
+    # Use a hash for long organization names to keep filenames manageable
+    if len(str(org)) > 30:
+        hashed_name = hashlib.md5(str(org).encode('utf-8')).hexdigest()[:10]
+        return f"org_{hashed_name}_wordcloud.png"
+    return f"{org}_wordcloud.png"
+
+def word_cloud_cache_key(org, frequencies, stopwords):
+    """Return a content hash of everything that determines a word cloud image"""
+    frequency_data = json.dumps(sorted(frequencies.items()), ensure_ascii=False)
+    frequency_hash = hashlib.sha256(frequency_data.encode('utf-8')).hexdigest()
+    output_settings = [plotting.chart_dpi(WORD_CLOUD_DPI), plotting.settings()['format']]
+    key_data = json.dumps([str(org), frequency_hash, sorted(stopwords), WORDCLOUD_PARAMS, output_settings],
+                          sort_keys=True)
+    return hashlib.sha256(key_data.encode('utf-8')).hexdigest()
+
+def render_word_cloud(org, frequencies, output_path):
+    """Render a single organization's word cloud and save it to output_path; return the path written"""
+    plotting.apply_style('ggplot', 'Set2')
+    wordcloud = plotting.wordcloud().WordCloud(**WORDCLOUD_PARAMS).generate_from_frequencies(frequencies)
     
-    # Remove URLs, mentions, hashtags, and special characters
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text)
-    text = re.sub(r'@\w+', '', text)
-    text = re.sub(r'#\w+', '', text)
-    text = re.sub(r'[^\w\s]', '', text)
+    # Plot the word cloud (the figure is reused for the next organization)
+    fig, ax = plotting.figure((10, 5))
+    ax.imshow(wordcloud, interpolation='bilinear')
+    ax.axis('off')
+    ax.set_title(f'Word Cloud: {str(org)[:30]}{"..." if len(str(org)) > 30 else ""}', fontsize=16)
+    fig.tight_layout()
     
-    # Remove numbers
-    text = re.sub(r'\d+', '', text)
+    # Save the word cloud image
+    return plotting.save(fig, output_path, dpi=WORD_CLOUD_DPI)
+
+def _load_word_cloud_cache():
+    try:
+        with open(WORD_CLOUD_CACHE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_word_cloud_cache(cache):
+    with open(WORD_CLOUD_CACHE_FILE, 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+def _record_hashed_name(safe_filename, org):
+    # Keep a mapping file to track hashed names (one line per organization)
+    mapping_file = os.path.join(WORD_CLOUD_DIR, 'org_mapping.txt')
+    line = f"{safe_filename}: {org}\n"
+    if os.path.exists(mapping_file):
+        with open(mapping_file) as f:
+            if line in f.readlines():
+                return
+    with open(mapping_file, "a") as f:
+        f.write(line)
+
+def generate_word_clouds(post_summary, workers=None, keep_non_ascii=False):
+    """
+    Generate word clouds for each organization based on post messages.
     
-    # Remove non-ASCII characters
-    text = ''.join(c for c in text if ord(c) < 128)
+    Word frequencies come from the persistent term index, so only new posts are
+    tokenized. Organizations whose frequencies, stopwords and WordCloud parameters
+    are unchanged since the last run are skipped; the rest are rendered in parallel
+    across `workers` processes (defaults to the number of CPUs). Set
+    keep_non_ascii to keep e.g. Devanagari words (this needs a WordCloud font
+    with the matching glyphs).
+    """
+    stopwords = set(plotting.wordcloud().STOPWORDS)
+    stopwords.update(CUSTOM_STOPWORDS)
     
-    # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
+    # Create a directory for word cloud images if it doesn't exist
+    if not os.path.exists(WORD_CLOUD_DIR):
+        os.makedirs(WORD_CLOUD_DIR)
     
-    return text
-
-def generate_word_clouds(post_summary):
-    """Generate word clouds for each organization based on post messages"""
-    # Add custom stopwords
-    custom_stopwords = set(STOPWORDS)
-    custom_stopwords.update(['will', 'now', 'get', 'one', 'like', 'shop', 'offers', 
-                            'available', 'check', 'new', 'today', 'facebook', 'make',
-                            'offer', 'limited', 'time', 'can', 'also', 'discount',
-                            'just', 'buy', 'shopping', 'day', 'know', 'use'])
+    # Bring the per-organization term counts up to date; only posts whose pid has
+    # not been indexed before are preprocessed and counted
+    index = TermIndex.load(keep_non_ascii=keep_non_ascii)
+    new_posts = index.update(post_summary)
+    if new_posts:
+        index.save()
+    print(f"Term index: {new_posts} new posts indexed")
     
-    # Get unique organizations
     organizations = post_summary['postedBy'].unique()
     
-    # Create a directory for word cloud images if it doesn't exist
-    if not os.path.exists('word_clouds'):
-        os.makedirs('word_clouds')
+    cache = _load_word_cloud_cache()
+    jobs = []
+    cache_hits = []
     
-    # Generate word cloud for each organization
     for org in organizations:
         if pd.isna(org) or org == "":
             continue
-            
-        # Filter posts by organization
-        org_posts = post_summary[post_summary['postedBy'] == org]
-        
-        # Combine all messages
-        all_text = ' '.join(org_posts['message'].apply(preprocess_text))
         
-        if all_text.strip():  # Check if there's text to process
-            # Create the word cloud
-            wordcloud = WordCloud(
-                background_color='white',
-                max_words=100,
-                max_font_size=40,
-                width=800,
-                height=400,
-                stopwords=custom_stopwords,
-                random_state=42
-            ).generate(all_text)
-            
-            # Create a safe filename using a hash for long organization names
-            if len(str(org)) > 30:
-                # Hash the organization name for consistency
-                hashed_name = hashlib.md5(str(org).encode('utf-8')).hexdigest()[:10]
-                safe_filename = f"org_{hashed_name}_wordcloud.png"
-                
-                # Create a mapping file to track hashed names
-                with open("word_clouds/org_mapping.txt", "a") as f:
-                    f.write(f"{safe_filename}: {org}\n")
-            else:
-                safe_filename = f"{org}_wordcloud.png"
-                
-            # Plot the word cloud
-            plt.figure(figsize=(10, 5))
-            plt.imshow(wordcloud, interpolation='bilinear')
-            plt.axis('off')
-            plt.title(f'Word Cloud: {str(org)[:30]}{"..." if len(str(org)) > 30 else ""}', fontsize=16)
-            plt.tight_layout()
-            
-            # Save the word cloud image
-            plt.savefig(f'word_clouds/{safe_filename}', dpi=300)
-            plt.close()
-            
-            print(f"Generated word cloud for {str(org)[:30]}...")
-        else:
+        frequencies = index.frequencies(org, stopwords)
+        if not frequencies:  # Check if there's text to process
             print(f"No text available to generate word cloud for {str(org)[:30]}...")
-
-def main():
-    print("Starting Category Analysis and Word Cloud Generation...")
+            continue
+        
+        safe_filename = word_cloud_filename(org)
+        output_path = plotting.chart_path(os.path.join(WORD_CLOUD_DIR, safe_filename))
+        image_name = os.path.basename(output_path)
+        key = word_cloud_cache_key(org, frequencies, stopwords)
+        
+        # Skip organizations whose word cloud is already up to date
+        if cache.get(image_name) == key and os.path.exists(output_path):
+            cache_hits.append(org)
+            continue
+        
+        if safe_filename != f"{org}_wordcloud.png":
+            _record_hashed_name(safe_filename, org)
+        jobs.append((org, frequencies, output_path))
+        cache[image_name] = key
     
-    # Load data
-    post_summary = load_data()
+    # Render the changed organizations, spreading them across processes
+    for (org, _, _), _ in zip(jobs, plotting.render_all(render_word_cloud, jobs, workers)):
+        print(f"Generated word cloud for {str(org)[:30]}...")
     
+    _save_word_cloud_cache(cache)
+    
+    # Run summary
+    print(f"\nWord cloud cache: {len(cache_hits)} hits, {len(jobs)} misses")
+    if cache_hits:
+        print("  Unchanged (skipped): " + ", ".join(str(org)[:30] for org in cache_hits))
+    if jobs:
+        print("  Rendered: " + ", ".join(str(job[0])[:30] for job in jobs))
+
+def analyze_categories(post_summary, plots=True, store=None, categories=TARGET_CATEGORIES):
+    """
+    Compare likes across categories: console summary, bar chart and Excel workbook.
+    
+    With plots=False the bar chart is skipped. `store` optionally serves the
+    like statistics from the aggregate store (see analyze_likes_by_category).
+    """
     # Analyze likes by category
-    category_likes = analyze_likes_by_category(post_summary)
+    with instrumentation.stage("Analyze likes by category", rows=len(post_summary)):
+        category_likes = analyze_likes_by_category(post_summary, store, categories)
     
     # Create bar chart
-    create_category_bar_chart(category_likes)
-    print("Bar chart created and saved as 'category_likes_analysis.png'")
+    if plots:
+        with instrumentation.stage("Create category bar chart"):
+            output_file = create_category_bar_chart(category_likes)
+        print(f"Bar chart created and saved as '{output_file}'")
+    else:
+        print("Skipping the bar chart (--no-plots)")
     
     # Save to Excel
-    save_to_excel(category_likes)
+    with instrumentation.stage("Save Excel workbook"):
+        save_to_excel(category_likes)
     print("Category analysis saved to 'category_analysis.xlsx'")
+    return category_likes
+
+def main(plots=True, incremental=False, categories=TARGET_CATEGORIES):
+    print("Starting Category Analysis and Word Cloud Generation...")
+    
+    # Load data
+    with instrumentation.stage("Load post data"):
+        post_summary = load_data()
+        instrumentation.set_rows(len(post_summary))
+    
+    # Fold the new posts into the aggregate store and read the likes from it
+    store = None
+    if incremental:
+        with instrumentation.stage("Update aggregate store"):
+            store = update_store(post_summary)
+    
+    analyze_categories(post_summary, plots, store, categories)
     
     # Generate word clouds
-    print("\nGenerating word clouds for each organization...")
-    generate_word_clouds(post_summary)
-    print("\nWord clouds have been saved to the 'word_clouds' directory")
+    if plots:
+        print("\nGenerating word clouds for each organization...")
+        with instrumentation.stage("Generate word clouds", rows=len(post_summary)):
+            generate_word_clouds(post_summary)
+        print("\nWord clouds have been saved to the 'word_clouds' directory")
+    else:
+        print("\nSkipping the word clouds (--no-plots)")
     
     print("\nAnalysis complete!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Category analysis and word clouds per organization")
+    parser.add_argument('--incremental', action='store_true',
+                        help="fold new posts into the aggregate store and read the likes from it")
+    parser.add_argument('--categories', type=lambda value: [item.strip() for item in value.split(',') if item.strip()],
+                        default=TARGET_CATEGORIES,
+                        help="comma-separated categories to compare (default: the ten main categories)")
+    parser.add_argument('--all-categories', dest='categories', action='store_const', const=None,
+                        help="compare every category")
+    plotting.add_plot_arguments(parser)
+    instrumentation.add_profile_arguments(parser)
+    args = parser.parse_args()
+    plotting.configure_from_args(args)
+    instrumentation.start_profiling(args)
+    try:
+        main(plots=args.plots, incremental=args.incremental, categories=args.categories)
+    finally:
+        instrumentation.finish_profiling(args)
\ No newline at end of file
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Category engagement cube: like statistics per (category x page x month).
+
+The Post Summary table is aggregated once into one cell per non-empty
+(category, page, month) combination. Every cell keeps the post count, the
+sum and the sum of squares of likesCount, and a sparse histogram of
+likesCount over fixed bins shared by all cells: one bin per like count up to
+EXACT_LIKES, then log-spaced bins LIKE_BIN_GROWTH apart. Only the occupied
+bins of a cell are stored (bin index, post count and like total), so a cell
+costs a few bytes per distinct like level rather than the full bin range.
+The histograms answer medians, p90/p99 and trimmed means for any set of
+categories, pages and months by summing cells, without regrouping the posts.
+Quantiles are exact up to EXACT_LIKES likes and within a bin width (2%) above.
+
+Usage:
+    python category_cube.py [--by category|page|month ...] [--categories A,B]
+        [--pages A,B] [--from 2013-01] [--to 2013-06] [--trim 0.1] [--csv stats.csv]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import timezones
+from data_loader import load_post_summary
+
+# Like counts below this get a bin of their own (exact quantiles)
+EXACT_LIKES = 100
+
+# Ratio between the edges of consecutive bins above EXACT_LIKES
+LIKE_BIN_GROWTH = 1.02
+
+# Upper edge of the last bin (no post comes close)
+MAX_LIKES = 1e12
+
+# Dimensions of the cube, in cell-key order
+DIMENSIONS = ('category', 'page', 'month')
+
+
+def like_bin_edges(exact=EXACT_LIKES, growth=LIKE_BIN_GROWTH, max_likes=MAX_LIKES):
+    """Return the bin edges: 0, 1, ..., exact, then exact * growth^k up to max_likes"""
+    steps = int(np.ceil(np.log(max_likes / exact) / np.log(growth)))
+    geometric = np.ceil(exact * growth ** np.arange(1, steps + 1))
+    return np.unique(np.concatenate([np.arange(exact + 1, dtype=float), geometric]))
+
+
+LIKE_BIN_EDGES = like_bin_edges()
+
+
+class CategoryCube:
+    """
+    Like statistics per non-empty (category, page, month) cell.
+
+    - categories, pages, months: the labels of each dimension (months as
+      'YYYY-MM' strings in local time, or None for posts without a time)
+    - cell_codes: (cells x 3) codes into those labels
+    - count, total, total_sq: posts, sum and sum of squares of likes per cell
+    - offsets: the occupied bins of cell i are entries offsets[i]:offsets[i + 1]
+    - bins, bin_counts, bin_totals: bin index, posts and likes of every
+      occupied bin, ordered by cell then bin
+    """
+
+    def __init__(self, categories, pages, months, cell_codes, count, total, total_sq, offsets, bins, bin_counts,
+                 bin_totals, edges=LIKE_BIN_EDGES):
+        self.labels = {'category': list(categories), 'page': list(pages), 'month': list(months)}
+        self.cell_codes = cell_codes
+        self.count = count
+        self.total = total
+        self.total_sq = total_sq
+        self.offsets = offsets
+        self.bins = bins
+        self.bin_counts = bin_counts
+        self.bin_totals = bin_totals
+        self.edges = edges
+
+    @classmethod
+    def build(cls, post_data, edges=LIKE_BIN_EDGES):
+        """Aggregate the posts with a category into the cube (one bincount pass per statistic)"""
+        posts = post_data[post_data['category'].notna()]
+        likes = posts['likesCount'].fillna(0).to_numpy(dtype=float)
+
+        # Months in the local time of each page; posts without a time get their own month
+        local = timezones.local_times(posts['createdTime'], posts['postedBy'])
+        months = local.dt.strftime('%Y-%m').where(local.notna(), None)
+
+        codes = []
+        labels = []
+        for values in (posts['category'], posts['postedBy'], months):
+            value_codes, value_labels = pd.factorize(values, sort=True, use_na_sentinel=False)
+            codes.append(value_codes.astype(np.int64))
+            labels.append([None if pd.isna(label) else label for label in value_labels])
+
+        # One key per (category, page, month); only the keys that occur become cells
+        sizes = [len(label) for label in labels]
+        keys = (codes[0] * sizes[1] + codes[1]) * sizes[2] + codes[2]
+        cell_keys, cells = np.unique(keys, return_inverse=True)
+        cell_codes = np.stack([cell_keys // (sizes[1] * sizes[2]), cell_keys // sizes[2] % sizes[1],
+                               cell_keys % sizes[2]], axis=1)
+
+        n_cells = len(cell_keys)
+        n_bins = len(edges) - 1
+        bins = np.clip(np.searchsorted(edges, likes, side='right') - 1, 0, n_bins - 1)
+        return cls(
+            *labels, cell_codes,
+            np.bincount(cells, minlength=n_cells),
+            np.bincount(cells, weights=likes, minlength=n_cells),
+            np.bincount(cells, weights=likes * likes, minlength=n_cells),
+            *_sparse_histograms(cells, bins, likes, n_cells, n_bins),
+            edges
+        )
+
+    def merge(self, other):
+        """
+        Return a cube holding the posts of this cube and of `other`.
+
+        Both cubes must use the same bins; cells present in both are summed.
+        """
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge category cubes with different like bins")
+
+        # Recode both cubes' cells against the union of their labels
+        labels = []
+        codes = []
+        for i, dimension in enumerate(DIMENSIONS):
+            known = set(self.labels[dimension]) | set(other.labels[dimension])
+            merged = sorted(label for label in known if label is not None) + ([None] if None in known else [])
+            position = {label: code for code, label in enumerate(merged)}
+            labels.append(merged)
+            codes.append(np.concatenate([
+                np.array([position[label] for label in cube.labels[dimension]], dtype=np.int64)[cube.cell_codes[:, i]]
+                for cube in (self, other)
+            ]))
+
+        sizes = [len(label) for label in labels]
+        keys = (codes[0] * sizes[1] + codes[1]) * sizes[2] + codes[2]
+        cell_keys, cells = np.unique(keys, return_inverse=True)
+        cell_codes = np.stack([cell_keys // (sizes[1] * sizes[2]), cell_keys // sizes[2] % sizes[1],
+                               cell_keys % sizes[2]], axis=1)
+        n_cells = len(cell_keys)
+
+        # Every stored bin moves to the merged cell of its old cell
+        entry_cells = np.concatenate([
+            cells[start:start + len(cube.count)][np.repeat(np.arange(len(cube.count)), np.diff(cube.offsets))]
+            for start, cube in ((0, self), (len(self.count), other))
+        ])
+
+        def merged_sum(name):
+            return np.bincount(cells, weights=np.concatenate([getattr(self, name), getattr(other, name)]),
+                               minlength=n_cells)
+
+        return CategoryCube(
+            *labels, cell_codes,
+            merged_sum('count').astype(np.int64), merged_sum('total'), merged_sum('total_sq'),
+            *_sparse_histograms(entry_cells, np.concatenate([self.bins, other.bins]).astype(np.int64),
+                                np.concatenate([self.bin_totals, other.bin_totals]), n_cells, len(self.edges) - 1,
+                                np.concatenate([self.bin_counts, other.bin_counts])),
+            self.edges
+        )
+
+    @property
+    def nbytes(self):
+        arrays = [self.cell_codes, self.count, self.total, self.total_sq, self.offsets, self.bins,
+                  self.bin_counts, self.bin_totals]
+        return sum(array.nbytes for array in arrays)
+
+    def select(self, categories=None, pages=None, month_from=None, month_to=None):
+        """
+        Return a boolean mask of the cells in the given categories, pages and months.
+
+        month_from/month_to ('YYYY-MM', both inclusive) exclude the posts without
+        a time; None means no restriction.
+        """
+        mask = np.ones(len(self.count), dtype=bool)
+        for dimension, values in (('category', categories), ('page', pages)):
+            if values is not None:
+                wanted = np.isin(np.asarray(self.labels[dimension], dtype=object), list(values))
+                mask &= wanted[self.cell_codes[:, DIMENSIONS.index(dimension)]]
+        if month_from is not None or month_to is not None:
+            months = np.asarray(self.labels['month'], dtype=object)
+            known = np.array([month is not None for month in months])
+            wanted = known.copy()
+            if month_from is not None:
+                wanted[known] &= months[known] >= month_from
+            if month_to is not None:
+                wanted[known] &= months[known] <= month_to
+            mask &= wanted[self.cell_codes[:, 2]]
+        return mask
+
+    def summary(self, by='category', categories=None, pages=None, month_from=None, month_to=None,
+                quantiles=(0.5, 0.9, 0.99), trim=0.1):
+        """
+        Return the like statistics of every group of selected cells.
+
+        `by` is a dimension name or a tuple of them. Columns: the group
+        columns (Category, Page, Month), Average Likes, Total Likes, Post
+        Count, Std Likes, one column per quantile (Median Likes, P90 Likes, ...)
+        and Trimmed Mean Likes (the mean without the lowest and highest `trim`
+        share of the posts); sorted by average likes, highest first.
+        """
+        by = (by,) if isinstance(by, str) else tuple(by)
+        mask = self.select(categories, pages, month_from, month_to)
+        group_keys, groups = np.unique(self.cell_codes[mask][:, [DIMENSIONS.index(d) for d in by]],
+                                       axis=0, return_inverse=True)
+        groups = groups.ravel()
+        n_groups = len(group_keys)
+
+        count = np.bincount(groups, weights=self.count[mask], minlength=n_groups)
+        total = np.bincount(groups, weights=self.total[mask], minlength=n_groups)
+        total_sq = np.bincount(groups, weights=self.total_sq[mask], minlength=n_groups)
+
+        # Sum the stored bins of each group's cells into a dense (groups x used bins)
+        # histogram, with a column only for the bins occupied in the selection
+        cell_groups = np.full(len(self.count), -1, dtype=np.int64)
+        cell_groups[mask] = groups
+        entry_groups = cell_groups[np.repeat(np.arange(len(self.count)), np.diff(self.offsets))]
+        selected = entry_groups >= 0
+        used_bins, columns = np.unique(self.bins[selected], return_inverse=True)
+        if not len(used_bins):
+            # Nothing selected: keep one (empty) bin so the histogram has columns
+            used_bins = np.zeros(1, dtype=self.bins.dtype)
+        flat = entry_groups[selected] * len(used_bins) + columns
+        shape = (n_groups, len(used_bins))
+        histogram = np.bincount(flat, weights=self.bin_counts[selected], minlength=shape[0] * shape[1]).reshape(shape)
+        bin_totals = np.bincount(flat, weights=self.bin_totals[selected], minlength=shape[0] * shape[1]).reshape(shape)
+        bin_lows = self.edges[used_bins]
+        bin_highs = self.edges[used_bins.astype(np.int64) + 1]
+
+        result = pd.DataFrame({
+            dimension.capitalize(): np.asarray(self.labels[dimension], dtype=object)[group_keys[:, i]]
+            for i, dimension in enumerate(by)
+        })
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result['Average Likes'] = total / count
+            result['Total Likes'] = total
+            result['Post Count'] = count.astype(np.int64)
+            result['Std Likes'] = np.sqrt(np.maximum(total_sq - total * total / count, 0) / (count - 1))
+        for q in quantiles:
+            name = 'Median Likes' if q == 0.5 else f"P{q * 100:g} Likes"
+            result[name] = histogram_quantile(histogram, bin_lows, bin_highs, q)
+        result['Trimmed Mean Likes'] = histogram_trimmed_mean(histogram, bin_totals, trim)
+        return result.sort_values('Average Likes', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def _sparse_histograms(cells, bins, likes, n_cells, n_bins, counts=None):
+    """
+    Return (offsets, bins, bin_counts, bin_totals) of the occupied bins per cell.
+
+    Every row falls in bin `bins` of cell `cells` with `likes` likes; `counts`
+    gives the posts per row (one each by default).
+    """
+    entry_keys, entries = np.unique(cells * n_bins + bins, return_inverse=True)
+    return (
+        np.searchsorted(entry_keys // n_bins, np.arange(n_cells + 1)),
+        (entry_keys % n_bins).astype(np.min_scalar_type(n_bins - 1)),
+        np.bincount(entries, weights=counts, minlength=len(entry_keys)).astype(np.uint32),
+        np.bincount(entries, weights=likes, minlength=len(entry_keys))
+    )
+
+
+def _value_at_rank(histogram, cumulative, bin_lows, bin_highs, rank):
+    """Return the value of the given (0-based) rank of every row of a histogram"""
+    rows = np.arange(len(histogram))
+    bins = (cumulative > rank[:, None]).argmax(axis=1)
+    in_bin = histogram[rows, bins]
+    position = rank - (cumulative[rows, bins] - in_bin)
+    low, high = bin_lows[bins], bin_highs[bins]
+    # A bin of one like holds a single value; wider bins spread their values evenly
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(high - low > 1, low + (high - low) * (position + 0.5) / in_bin, low)
+
+
+def histogram_quantile(histogram, bin_lows, bin_highs, q):
+    """
+    Return the q-quantile of every row of a (groups x bins) histogram.
+
+    bin_lows/bin_highs are the edges of each column's bin.
+    Interpolates between neighbouring ranks like np.quantile's default method;
+    empty rows get NaN.
+    """
+    count = histogram.sum(axis=1)
+    cumulative = np.cumsum(histogram, axis=1)
+    rank = q * np.maximum(count - 1, 0)
+    below = np.floor(rank)
+    low = _value_at_rank(histogram, cumulative, bin_lows, bin_highs, below)
+    high = _value_at_rank(histogram, cumulative, bin_lows, bin_highs, np.minimum(below + 1, np.maximum(count - 1, 0)))
+    values = low + (high - low) * (rank - below)
+    values[count == 0] = np.nan
+    return values
+
+
+def _lowest_sum(histogram, bin_totals, k):
+    """Return the sum of the k lowest values of every row (bin means for partial bins)"""
+    cumulative = np.cumsum(histogram, axis=1)
+    cumulative_totals = np.cumsum(bin_totals, axis=1)
+    rows = np.arange(len(histogram))
+    bins = (cumulative >= k[:, None]).argmax(axis=1)
+    in_bin = histogram[rows, bins]
+    before = cumulative[rows, bins] - in_bin
+    with np.errstate(divide='ignore', invalid='ignore'):
+        partial = np.where(in_bin > 0, (k - before) * bin_totals[rows, bins] / in_bin, 0)
+    return np.where(k > 0, cumulative_totals[rows, bins] - bin_totals[rows, bins] + partial, 0)
+
+
+def histogram_trimmed_mean(histogram, bin_totals, trim=0.1):
+    """Return the mean of every row without its lowest and highest `trim` share of the values"""
+    count = histogram.sum(axis=1)
+    k = np.floor(trim * count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (_lowest_sum(histogram, bin_totals, count - k) - _lowest_sum(histogram, bin_totals, k)) / (count - 2 * k)
+
+
+def _list_argument(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Like statistics per category, page and month from a precomputed cube")
+    parser.add_argument('--by', choices=DIMENSIONS, action='append',
+                        help='dimension to group by (repeatable; default: category)')
+    parser.add_argument('--categories', type=_list_argument, help='comma-separated categories (default: all)')
+    parser.add_argument('--pages', type=_list_argument, help='comma-separated pages (default: all)')
+    parser.add_argument('--from', dest='month_from', metavar='YYYY-MM', help='first month (inclusive)')
+    parser.add_argument('--to', dest='month_to', metavar='YYYY-MM', help='last month (inclusive)')
+    parser.add_argument('--trim', type=float, default=0.1,
+                        help='share of posts cut from each end for the trimmed mean (default: 0.1)')
+    parser.add_argument('--csv', help='also write the statistics to this CSV file')
+    timezones.add_timezone_arguments(parser)
+    args = parser.parse_args()
+    timezones.configure_from_args(args)
+    if not 0 <= args.trim < 0.5:
+        parser.error("--trim must be at least 0 and below 0.5")
+
+    print("Loading data...")
+    post_data = load_post_summary()
+    cube = CategoryCube.build(post_data)
+    print(f"Built a cube of {len(cube.count)} (category, page, month) cells "
+          f"({cube.nbytes / 1024:.0f} KB) from {int(cube.count.sum())} posts")
+
+    stats = cube.summary(args.by or 'category', args.categories, args.pages, args.month_from, args.month_to,
+                         trim=args.trim)
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.max_colwidth', 40):
+        print()
+        print(stats.to_string(index=False, float_format=lambda value: f"{value:.1f}"))
+
+    if args.csv:
+        stats.to_csv(args.csv, index=False)
+        print(f"\nStatistics written to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
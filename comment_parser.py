@@ -0,0 +1,382 @@
+"""
+Helper module: vectorized parsing of the packed commentsText column.
+
+Comments.csv stores every comment of a post in a single cell, separated by '?#+@',
+with the comment's creation time embedded somewhere in its text. This module
+explodes those cells into one row per comment and extracts the timestamps with
+pandas string operations instead of a per-comment Python loop.
+
+The exploded comments are kept in memory as CompactComments: integer pid codes,
+epoch seconds and time buckets in NumPy arrays, with the comment texts packed
+into one UTF-8 buffer that is only decoded when a text is actually needed.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+
+import timezones
+from source_reader import iter_table_chunks
+from time_buckets import bucket_index
+
+# Separator used between individual comments inside a commentsText cell
+COMMENT_SEPARATOR = '?#+@'
+
+# Number of Comments.csv rows read at a time when streaming the file
+DEFAULT_CHUNKSIZE = 50000
+
+# Format of a full timestamp once spaces in the date have been replaced by dashes
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S+0000'
+
+# The three timestamp formats accepted in a comment, combined into one pattern:
+#   1. YYYY-MM-DDThh:mm:ss+0000
+#   2. YYYY MM DDThh:mm:ss+0000 (with spaces instead of dashes)
+#   3. any year 20xx followed by a month/day pattern (date only)
+# Every alternative is a lookahead anchored at the start of the comment, so the
+# first format found *anywhere* in the comment wins - the same priority as trying
+# three separate re.search calls one after the other.
+TIMESTAMP_PATTERN = re.compile(
+    r'^(?:'
+    r'(?=.*?(?P<iso>\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\+\d{4}))'
+    r'|(?=.*?(?P<spaced>\d{4}\s+\d{2}\s+\d{2}T\d{2}:\d{2}:\d{2}\+\d{4}))'
+    r'|(?=.*?(?P<year>20\d{2})\s*[\/\-\s]\s*(?P<month>\d{1,2})\s*[\/\-\s]\s*(?P<day>\d{1,2}))'
+    r')?',
+    re.DOTALL
+)
+
+
+def get_comments_column(comments_data):
+    """Return the name of the column holding the packed comments, or None"""
+    for column in ('commentsText', 'comments'):
+        if column in comments_data.columns:
+            return column
+    return None
+
+
+def parse_comment_timestamps(comments):
+    """
+    Extract the timestamp of each comment in a Series of comment strings.
+
+    Returns a datetime64 Series aligned with `comments`; comments without a
+    readable timestamp get NaT.
+    """
+    parts = comments.str.extract(TIMESTAMP_PATTERN)
+
+    # Full timestamps: the spaced variant is only valid when single spaces separate
+    # the date fields, which is what replacing spaces with dashes checks for us
+    full_stamp = parts['iso'].fillna(parts['spaced'].str.replace(' ', '-', regex=False))
+    timestamps = pd.to_datetime(full_stamp, format=TIMESTAMP_FORMAT, errors='coerce')
+
+    # Date-only matches use midnight as the time of day
+    date_only = full_stamp.isna() & parts['year'].notna()
+    if date_only.any():
+        dates = pd.to_datetime(
+            parts.loc[date_only, ['year', 'month', 'day']].astype(int),
+            errors='coerce'
+        )
+        timestamps = timestamps.copy()
+        timestamps[date_only] = dates
+
+    return timestamps
+
+
+def explode_comments(comments_data):
+    """
+    Explode a Comments frame into one row per individual comment.
+
+    Returns two DataFrames:
+    - parsed: `pid`, `timestamp` and `comment_text` for comments with a timestamp
+    - others: `pid` and `comment_text` for comments without a readable timestamp
+    """
+    column = get_comments_column(comments_data)
+    if column is None or len(comments_data) == 0:
+        return _empty_parsed(), _empty_others()
+
+    # Skip rows without any comments text
+    texts = comments_data[column]
+    has_text = texts.notna() & (texts.astype(str) != '')
+    if 'pid' in comments_data.columns:
+        pids = comments_data.loc[has_text, 'pid'].astype(str)
+    else:
+        pids = pd.Series(None, index=texts.index[has_text], dtype=object)
+
+    # Split every cell on the separator and give each comment its own row
+    exploded = pd.DataFrame({
+        'pid': pids,
+        'comment': texts[has_text].astype(str).str.split(COMMENT_SEPARATOR, regex=False)
+    }).explode('comment', ignore_index=True)
+
+    # Drop empty fragments (e.g. after a trailing separator)
+    comment_text = exploded['comment'].str.strip()
+    non_empty = comment_text != ''
+    exploded = exploded[non_empty]
+    comment_text = comment_text[non_empty]
+
+    timestamps = parse_comment_timestamps(exploded['comment'])
+    has_timestamp = timestamps.notna()
+
+    parsed = pd.DataFrame({
+        'pid': exploded['pid'][has_timestamp],
+        'timestamp': timestamps[has_timestamp],
+        'comment_text': comment_text[has_timestamp]
+    }).reset_index(drop=True)
+
+    others = pd.DataFrame({
+        'pid': exploded['pid'][~has_timestamp],
+        'comment_text': comment_text[~has_timestamp]
+    }).reset_index(drop=True)
+
+    return parsed, others
+
+
+def iter_exploded_comments(file_path, chunksize=DEFAULT_CHUNKSIZE):
+    """Stream the Comments file (CSV or xlsx) in chunks, yielding (parsed, others) for each chunk"""
+    for chunk in iter_table_chunks(file_path, chunksize):
+        yield explode_comments(chunk)
+
+
+def load_exploded_comments(file_path, chunksize=DEFAULT_CHUNKSIZE):
+    """Stream Comments.csv and return the combined (parsed, others) frames"""
+    parsed_chunks = []
+    other_chunks = []
+    for parsed, others in iter_exploded_comments(file_path, chunksize):
+        parsed_chunks.append(parsed)
+        other_chunks.append(others)
+
+    if not parsed_chunks:
+        return _empty_parsed(), _empty_others()
+
+    parsed = pd.concat(parsed_chunks, ignore_index=True)
+    others = pd.concat(other_chunks, ignore_index=True)
+    return parsed, others
+
+
+class CompactComments:
+    """
+    Exploded comments in a compact, columnar layout.
+
+    - pid_codes: int32 code of each comment's pid into pid_values (the distinct pids)
+    - epoch: int64 seconds since the epoch (UTC) of each comment, or None for
+      comments without a timestamp
+    - bucket: uint8 UTC time-of-day bucket of each comment (or None)
+    - text_offsets / text_buffer: the UTF-8 text of comment i is
+      text_buffer[text_offsets[i]:text_offsets[i + 1]] (Arrow-style)
+
+    Compared with a frame of pid strings, datetimes and comment strings this
+    takes several times less memory, and counting never touches the texts.
+    """
+
+    def __init__(self, pid_values, pid_codes, text_offsets, text_buffer, epoch=None, bucket=None):
+        self.pid_values = pid_values
+        self.pid_codes = pid_codes
+        self.text_offsets = text_offsets
+        self.text_buffer = text_buffer
+        self.epoch = epoch
+        self.bucket = bucket
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Build from an exploded comments frame (pid, comment_text and, if present, timestamp)"""
+        codes, pid_values = pd.factorize(frame['pid'].astype(str))
+
+        # Encode every text once and concatenate the bytes into a single buffer
+        encoded = frame['comment_text'].astype(str).str.encode('utf-8')
+        text_offsets = np.zeros(len(frame) + 1, dtype=np.int64)
+        np.cumsum(encoded.str.len().to_numpy(dtype=np.int64), out=text_offsets[1:])
+        text_buffer = np.frombuffer(b''.join(encoded.tolist()), dtype=np.uint8)
+
+        epoch = bucket = None
+        if 'timestamp' in frame.columns:
+            times = pd.to_datetime(frame['timestamp'])
+            if times.dt.tz is not None:
+                times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+            epoch = times.to_numpy(dtype='datetime64[s]').astype(np.int64)
+            bucket = bucket_index(times).astype(np.uint8)
+
+        return cls(np.asarray(pid_values, dtype=object), codes.astype(np.int32),
+                   text_offsets, text_buffer, epoch, bucket)
+
+    @classmethod
+    def concat(cls, parts):
+        """Combine several CompactComments (all with or all without timestamps) into one"""
+        parts = list(parts)
+        # Re-code every part against the union of the pid dictionaries
+        pid_values = pd.unique(np.concatenate([part.pid_values for part in parts]))
+        pid_index = pd.Index(pid_values)
+        pid_codes = np.concatenate([
+            pid_index.get_indexer(part.pid_values)[part.pid_codes] for part in parts
+        ]).astype(np.int32)
+
+        # Shift every part's text offsets by the size of the buffers before it
+        buffer_sizes = np.cumsum([0] + [len(part.text_buffer) for part in parts])
+        text_offsets = np.concatenate(
+            [[0]] + [part.text_offsets[1:] + shift for part, shift in zip(parts, buffer_sizes)]
+        ).astype(np.int64)
+        text_buffer = np.concatenate([part.text_buffer for part in parts])
+
+        epoch = bucket = None
+        if parts and parts[0].epoch is not None:
+            epoch = np.concatenate([part.epoch for part in parts])
+            bucket = np.concatenate([part.bucket for part in parts])
+        return cls(np.asarray(pid_values, dtype=object), pid_codes, text_offsets, text_buffer, epoch, bucket)
+
+    @classmethod
+    def empty(cls, timestamps=True):
+        """Return a table without any comments"""
+        return cls(np.empty(0, dtype=object), np.empty(0, dtype=np.int32), np.zeros(1, dtype=np.int64),
+                   np.empty(0, dtype=np.uint8),
+                   np.empty(0, dtype=np.int64) if timestamps else None,
+                   np.empty(0, dtype=np.uint8) if timestamps else None)
+
+    def __len__(self):
+        return len(self.pid_codes)
+
+    @property
+    def nbytes(self):
+        """Approximate memory used by the table, including the pid strings"""
+        arrays = [self.pid_codes, self.text_offsets, self.text_buffer, self.epoch, self.bucket]
+        return (sum(array.nbytes for array in arrays if array is not None)
+                + int(pd.Series(self.pid_values, dtype=object).memory_usage(deep=True, index=False)))
+
+    def pids(self):
+        """Return the pid of every comment (the strings are shared, not copied)"""
+        return pd.Series(self.pid_values[self.pid_codes], dtype=object)
+
+    def timestamps(self):
+        """Return the timestamp of every comment as naive UTC datetimes"""
+        return pd.Series(self.epoch.astype('datetime64[s]').astype('datetime64[ns]'))
+
+    def buckets(self, pages=None, rows=None):
+        """
+        Return the time-of-day bucket of every comment (or of the given `rows`).
+
+        With `pages` (the page of each returned comment), buckets are in the local
+        time of the page (see timezones); the stored UTC buckets are used when
+        every page is on UTC. Comments without a page get -1.
+        """
+        rows = slice(None) if rows is None else np.asarray(rows)
+        if pages is None or timezones.is_utc():
+            buckets = self.bucket[rows].astype(np.int64)
+        else:
+            buckets = bucket_index(timezones.local_times(self.timestamps()[rows].reset_index(drop=True), pages))
+        if pages is not None:
+            buckets = np.where(pd.Series(pages).notna().to_numpy(), buckets, -1)
+        return buckets
+
+    def text(self, row):
+        """Return the text of one comment"""
+        return bytes(self.text_buffer[self.text_offsets[row]:self.text_offsets[row + 1]]).decode('utf-8')
+
+    def texts(self, rows=None):
+        """Return the texts of the given comment rows (default: all), decoding only those"""
+        rows = range(len(self)) if rows is None else rows
+        return [self.text(row) for row in rows]
+
+    def to_frame(self, text=False):
+        """Return the comments as a pid/timestamp(/comment_text) frame, like explode_comments"""
+        columns = {'pid': self.pids()}
+        if self.epoch is not None:
+            columns['timestamp'] = self.timestamps()
+        if text:
+            columns['comment_text'] = pd.Series(self.texts(), dtype=object)
+        return pd.DataFrame(columns)
+
+    def to_tables(self, prefix):
+        """Return the table as plain frames (for the columnar cache), named with `prefix`"""
+        rows = {'pid_code': self.pid_codes, 'text_end': self.text_offsets[1:]}
+        if self.epoch is not None:
+            rows['epoch'] = self.epoch
+            rows['bucket'] = self.bucket
+        return {
+            f"{prefix}_rows": pd.DataFrame(rows),
+            f"{prefix}_pids": pd.DataFrame({'pid': self.pid_values}),
+            f"{prefix}_text": pd.DataFrame({'byte': self.text_buffer})
+        }
+
+    @classmethod
+    def from_tables(cls, tables, prefix):
+        """Rebuild a table from the frames written by to_tables"""
+        rows = tables[f"{prefix}_rows"]
+        text_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        text_offsets[1:] = rows['text_end'].to_numpy(dtype=np.int64)
+        epoch = rows['epoch'].to_numpy(dtype=np.int64) if 'epoch' in rows.columns else None
+        bucket = rows['bucket'].to_numpy(dtype=np.uint8) if 'bucket' in rows.columns else None
+        return cls(tables[f"{prefix}_pids"]['pid'].to_numpy(dtype=object),
+                   rows['pid_code'].to_numpy(dtype=np.int32), text_offsets,
+                   tables[f"{prefix}_text"]['byte'].to_numpy(dtype=np.uint8), epoch, bucket)
+
+
+def load_compact_comments(file_path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Stream Comments.csv and return (parsed, others) as CompactComments.
+
+    Every chunk is compacted right after it is exploded, so the full exploded
+    frames never exist at once.
+    """
+    parsed_chunks = []
+    other_chunks = []
+    for parsed, others in iter_exploded_comments(file_path, chunksize):
+        parsed_chunks.append(CompactComments.from_frame(parsed))
+        other_chunks.append(CompactComments.from_frame(others))
+
+    if not parsed_chunks:
+        return CompactComments.empty(), CompactComments.empty(timestamps=False)
+    return CompactComments.concat(parsed_chunks), CompactComments.concat(other_chunks)
+
+
+class PostAttributes:
+    """
+    pid -> post attribute lookup, built once and reused for many comment batches.
+
+    Comment pids are mapped to the dense row code of their post and only the
+    requested Post Summary columns are gathered with a NumPy take, so the frames
+    are never merged.
+    """
+
+    def __init__(self, post_data, columns=('postedBy', 'category')):
+        posts = post_data.drop_duplicates('pid')
+        self._index = pd.Index(posts['pid'])
+        # Append a missing value to every column so that unmatched pids (code -1) pick it up
+        self._values = {
+            column: np.append(posts[column].to_numpy(dtype=object), [np.nan])
+            for column in columns if column in posts.columns
+        }
+
+    def lookup(self, pids):
+        """Return the attributes of each pid as a DataFrame aligned with `pids` (NaN if unknown)"""
+        pids = pd.Series(pids)
+        codes = self._index.get_indexer(pids)
+        return pd.DataFrame(
+            {column: np.take(values, codes) for column, values in self._values.items()},
+            index=pids.index
+        )
+
+    def lookup_compact(self, comments):
+        """
+        Return the attributes of every comment of a CompactComments table.
+
+        Only the distinct pids are looked up; the comments then gather their
+        post's row through their pid code.
+        """
+        codes = self._index.get_indexer(pd.Index(comments.pid_values))[comments.pid_codes]
+        return pd.DataFrame({column: np.take(values, codes) for column, values in self._values.items()})
+
+
+def attribute_comments(pids, post_data, columns=('postedBy', 'category')):
+    """Look up post attributes for each comment pid without merging the frames"""
+    return PostAttributes(post_data, columns).lookup(pids)
+
+
+def _empty_parsed():
+    return pd.DataFrame({
+        'pid': pd.Series(dtype=object),
+        'timestamp': pd.Series(dtype='datetime64[ns]'),
+        'comment_text': pd.Series(dtype=object)
+    })
+
+
+def _empty_others():
+    return pd.DataFrame({
+        'pid': pd.Series(dtype=object),
+        'comment_text': pd.Series(dtype=object)
+    })
@@ -0,0 +1,175 @@
+"""
+Helper module: shared loading of the Post Summary and Comments data.
+
+Every analysis script used to re-read the CSV files and redo the same type
+coercion. This module does that work once and keeps a typed, columnar copy of
+the result (Arrow IPC files) in data/.cache. Later loads memory-map the cached
+copy instead of parsing the CSV again. A cached table is rebuilt automatically
+when its source file changes: a different size or mtime triggers a content
+hash check, and the cache is only reused if the hash still matches.
+"""
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+import comment_parser
+from source_reader import find_source, read_table
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # without pyarrow the data is simply loaded from source every time
+    pa = None
+    feather = None
+
+# Get the directory of this module so paths work from any working directory
+current_dir = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+
+DATA_DIR = os.path.join(current_dir, "data")
+CACHE_DIR = os.path.join(DATA_DIR, ".cache")
+# The sources may be CSV files or xlsx workbooks, under any of the usual name
+# variants ("Post-Summary.csv", "Post Summary.xlsx", ...; see source_reader)
+POST_SUMMARY_FILE = find_source(DATA_DIR, "Post-Summary", os.path.join(DATA_DIR, "Post-Summary.csv"))
+COMMENTS_FILE = find_source(DATA_DIR, "Comments", os.path.join(DATA_DIR, "Comments.csv"))
+
+# Bump whenever the cached layout or the type coercion below changes
+CACHE_VERSION = 2
+
+
+def coerce_post_summary(post_data):
+    """Apply the common type coercion to a raw Post Summary frame"""
+    # Make sure the pid column is a string for consistent joins with the comments
+    if 'pid' in post_data.columns:
+        post_data['pid'] = post_data['pid'].astype(str)
+
+    # Convert likesCount to numeric, treating empty or invalid values as 0 likes
+    if 'likesCount' in post_data.columns:
+        post_data['likesCount'] = pd.to_numeric(post_data['likesCount'], errors='coerce').fillna(0)
+
+    # Parse the posting times (stored as e.g. 2013-12-31T08:30:01+0000)
+    if 'createdTime' in post_data.columns:
+        post_data['createdTime'] = pd.to_datetime(post_data['createdTime'], errors='coerce', utc=True)
+
+    return post_data
+
+
+def load_post_summary(file_path=POST_SUMMARY_FILE, use_cache=True):
+    """Load the typed Post Summary table (CSV or xlsx), using the columnar cache when possible"""
+    def build():
+        return {'posts': coerce_post_summary(read_table(file_path))}
+
+    return _load_cached('post_summary', file_path, build, use_cache)['posts']
+
+
+def load_comment_tables(file_path=COMMENTS_FILE, use_cache=True):
+    """
+    Load the exploded comments as a (parsed, others) pair of CompactComments.
+
+    `parsed` holds the comments with a timestamp, `others` the comments without
+    one (see comment_parser.explode_comments and comment_parser.CompactComments).
+    """
+    def build():
+        parsed, others = comment_parser.load_compact_comments(file_path)
+        return {**parsed.to_tables('parsed'), **others.to_tables('others')}
+
+    tables = _load_cached('comments', file_path, build, use_cache)
+    return (comment_parser.CompactComments.from_tables(tables, 'parsed'),
+            comment_parser.CompactComments.from_tables(tables, 'others'))
+
+
+def clear_cache():
+    """Remove every cached table"""
+    if not os.path.isdir(CACHE_DIR):
+        return
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith('.arrow') or name.endswith('.meta.json'):
+            os.remove(os.path.join(CACHE_DIR, name))
+
+
+def file_hash(file_path):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_cached(name, source_path, build, use_cache):
+    """Return the tables produced by `build`, reading/writing the cache for `name`"""
+    if not use_cache or feather is None:
+        return build()
+
+    meta_path = os.path.join(CACHE_DIR, f"{name}.meta.json")
+    source_stat = os.stat(source_path)
+
+    meta = _read_meta(meta_path)
+    if meta is not None and _is_fresh(meta, source_path, source_stat, meta_path):
+        try:
+            return {
+                table: _read_table(os.path.join(CACHE_DIR, f"{name}_{table}.arrow"))
+                for table in meta['tables']
+            }
+        except (OSError, pa.ArrowException):
+            pass  # Unreadable cache files are simply rebuilt below
+
+    tables = build()
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for table, frame in tables.items():
+        _write_table(frame, os.path.join(CACHE_DIR, f"{name}_{table}.arrow"))
+    _write_meta(meta_path, {
+        'version': CACHE_VERSION,
+        'source': os.path.abspath(source_path),
+        'size': source_stat.st_size,
+        'mtime_ns': source_stat.st_mtime_ns,
+        'sha256': file_hash(source_path),
+        'tables': list(tables)
+    })
+    return tables
+
+
+def _is_fresh(meta, source_path, source_stat, meta_path):
+    """Check whether cached tables described by `meta` still match the source file"""
+    if meta.get('version') != CACHE_VERSION or meta.get('source') != os.path.abspath(source_path):
+        return False
+
+    # Fast path: the file has not been touched since the cache was written
+    if meta.get('size') == source_stat.st_size and meta.get('mtime_ns') == source_stat.st_mtime_ns:
+        return True
+
+    # The file was touched (or copied); only its contents decide whether to rebuild
+    if meta.get('size') != source_stat.st_size or meta.get('sha256') != file_hash(source_path):
+        return False
+
+    meta['mtime_ns'] = source_stat.st_mtime_ns
+    _write_meta(meta_path, meta)
+    return True
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def _read_table(path):
+    # Memory-map the uncompressed Arrow file so numeric columns are not copied
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+
+def _write_table(frame, path):
+    # Write to a temporary file first so an interrupted run never leaves a broken cache
+    tmp_path = path + '.tmp'
+    feather.write_feather(frame.reset_index(drop=True), tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Posting time vs engagement: how many posts go out in each 15-minute bucket and
+how many likes and comments those posts get.
+
+For every (page, time bucket) - or (category, time bucket) - the post
+frequency, the mean and median likes per post and the mean and median comments
+per post are computed in one grouped pass over the Post Summary table and the
+exploded comments. Bootstrap confidence intervals of the means are computed
+for all groups at once: every resample draws a random index within each group
+and the resampled sums are taken with np.add.reduceat, so there is no Python
+loop over groups or posts.
+
+Usage:
+    python engagement_analysis.py [--by page|category] [--group traffic|e-commerce|all]
+        [--boot 1000] [--confidence 0.95] [--min-posts 5] [--csv engagement.csv]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+import plotting
+import timezones
+from data_loader import load_comment_tables, load_post_summary
+from period_cube import PAGE_GROUPS
+from time_buckets import bucket_count, bucket_index, bucket_label
+
+# Get the current directory where the script is running
+current_dir = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+
+# Post Summary column and output column name for each way of grouping the posts
+GROUPINGS = {
+    'page': ('postedBy', 'Page'),
+    'category': ('category', 'Category')
+}
+
+# Resampled values drawn at a time (resamples x posts); keeps each chunk of the
+# bootstrap small enough to stay in cache, which is faster than fewer, larger chunks
+BOOTSTRAP_CHUNK_VALUES = 1_000_000
+
+
+def comments_per_post(post_data, comment_tables):
+    """
+    Return the number of comments on each post, aligned with post_data.
+
+    Comments with and without a readable timestamp both count.
+    """
+    post_pids = post_data['pid'].astype(str)
+    unique_pids = pd.Index(post_pids.unique())
+    per_pid = np.zeros(len(unique_pids), dtype=np.int64)
+    for comments in comment_tables:
+        # Count the comments per pid code, then look up only the distinct pids
+        per_code = np.bincount(comments.pid_codes, minlength=len(comments.pid_values))
+        codes = unique_pids.get_indexer(pd.Index(comments.pid_values))
+        np.add.at(per_pid, codes[codes >= 0], per_code[codes >= 0])
+    return per_pid[unique_pids.get_indexer(post_pids)]
+
+
+def post_engagement(post_data, comment_tables, by='page', groups=None):
+    """
+    Return one row per post: group, time bucket, likes and comments.
+
+    Posts are bucketed in the local time of their page (see timezones). Posts
+    outside `groups` (default: all) or without a creation time are dropped.
+    """
+    column, _ = GROUPINGS[by]
+    posts = pd.DataFrame({
+        'group': post_data[column].to_numpy(),
+        'bucket': bucket_index(timezones.local_times(post_data['createdTime'], post_data['postedBy'])),
+        'likes': post_data['likesCount'].fillna(0).to_numpy(dtype=float),
+        'comments': comments_per_post(post_data, comment_tables).astype(float)
+    })
+    keep = posts['group'].notna() & (posts['bucket'] >= 0)
+    if groups is not None:
+        keep &= posts['group'].isin(groups)
+    return posts[keep].reset_index(drop=True)
+
+
+def engagement_matrices(posts, groups=None):
+    """
+    Return (group names, posts, likes, comments) as (groups x buckets) matrices.
+
+    `posts` is a frame from post_engagement; likes and comments are totals, so
+    likes / posts is the mean likes per post of a bucket. Counted with one
+    weighted bincount per measure.
+    """
+    n_buckets = bucket_count()
+    codes = pd.Categorical(posts['group'], categories=groups)
+    names = list(codes.categories)
+    flat_index = np.asarray(codes.codes, dtype=np.int64) * n_buckets + posts['bucket'].to_numpy(dtype=np.int64)
+    valid = flat_index >= 0
+    size = len(names) * n_buckets
+    shape = (len(names), n_buckets)
+    post_counts = np.bincount(flat_index[valid], minlength=size).reshape(shape)
+    likes = np.bincount(flat_index[valid], weights=posts['likes'].to_numpy()[valid], minlength=size).reshape(shape)
+    comments = np.bincount(flat_index[valid], weights=posts['comments'].to_numpy()[valid], minlength=size).reshape(shape)
+    return names, post_counts, likes, comments
+
+
+def bootstrap_mean_ci(values, group_codes, n_boot=1000, confidence=0.95, seed=0):
+    """
+    Return (low, high) bootstrap confidence intervals of the mean of every group.
+
+    `values` is a (measures x rows) array and `group_codes` the dense group code
+    (0 .. groups-1, every group non-empty) of each row; the result arrays have
+    shape (measures x groups). All measures share the same resamples.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    group_codes = np.asarray(group_codes, dtype=np.int64)
+
+    # Rows sorted by group, so each group is the slice starts[g]:starts[g] + sizes[g]
+    order = np.argsort(group_codes, kind='stable')
+    values = values[:, order]
+    codes = group_codes[order]
+    sizes = np.bincount(codes)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    row_starts = starts[codes]
+    row_sizes = sizes[codes].astype(float)
+
+    rng = np.random.default_rng(seed)
+    chunk = max(1, BOOTSTRAP_CHUNK_VALUES // max(len(codes), 1))
+    boot_means = np.empty((n_boot, values.shape[0], len(sizes)))
+    for first in range(0, n_boot, chunk):
+        n = min(chunk, n_boot - first)
+        # Each row of a resample is replaced by a random row of the same group
+        offsets = rng.random((n, len(codes)))
+        offsets *= row_sizes
+        draws = offsets.astype(np.int64)
+        draws += row_starts
+        for measure in range(values.shape[0]):
+            sums = np.add.reduceat(values[measure][draws], starts, axis=1)
+            boot_means[first:first + n, measure] = sums / sizes
+
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(boot_means, [tail, 100 - tail], axis=0)
+    return low, high
+
+
+def engagement_by_bucket(posts, by='page', n_boot=1000, confidence=0.95, seed=0):
+    """
+    Return the engagement of every (group, time bucket) that has posts.
+
+    Columns: the group ('Page' or 'Category'), Time Bucket, Time, Posts, Mean
+    Likes, Median Likes, Mean Comments, Median Comments and the bootstrap
+    interval of both means (Likes CI Low/High, Comments CI Low/High).
+    """
+    _, group_column = GROUPINGS[by]
+    grouped = posts.groupby(['group', 'bucket'], sort=True)
+    stats = grouped.agg(
+        Posts=('likes', 'size'),
+        mean_likes=('likes', 'mean'),
+        median_likes=('likes', 'median'),
+        mean_comments=('comments', 'mean'),
+        median_comments=('comments', 'median')
+    ).reset_index()
+
+    result = pd.DataFrame({
+        group_column: stats['group'],
+        'Time Bucket': stats['bucket'],
+        'Time': [bucket_label(bucket) for bucket in stats['bucket']],
+        'Posts': stats['Posts'],
+        'Mean Likes': stats['mean_likes'],
+        'Median Likes': stats['median_likes'],
+        'Mean Comments': stats['mean_comments'],
+        'Median Comments': stats['median_comments']
+    })
+
+    if n_boot > 0 and len(posts):
+        # ngroup numbers the groups in the same (sorted) order as the aggregation above
+        low, high = bootstrap_mean_ci(posts[['likes', 'comments']].to_numpy().T, grouped.ngroup().to_numpy(),
+                                      n_boot, confidence, seed)
+        result['Likes CI Low'], result['Likes CI High'] = low[0], high[0]
+        result['Comments CI Low'], result['Comments CI High'] = low[1], high[1]
+    return result
+
+
+def plot_frequency_vs_engagement(result, group_column, output_file):
+    """Plot posts per bucket against mean likes per post (with CIs), one colour per group; return the path"""
+    fig, ax = plotting.figure((12, 8))
+    for group, rows in result.groupby(group_column, sort=False):
+        errors = None
+        if 'Likes CI Low' in rows:
+            errors = [rows['Mean Likes'] - rows['Likes CI Low'], rows['Likes CI High'] - rows['Mean Likes']]
+        ax.errorbar(rows['Posts'], rows['Mean Likes'], yerr=errors, fmt='o', alpha=0.6, capsize=2, label=group)
+
+    ax.set_title('Post Frequency vs. Engagement by Time Bucket', fontsize=16)
+    ax.set_xlabel('Number of Posts in the 15-minute Bucket', fontsize=14)
+    ax.set_ylabel('Average Likes per Post', fontsize=14)
+    ax.grid(True, alpha=0.3)
+    ax.legend(title=group_column, fontsize=9)
+
+    fig.tight_layout()
+    return plotting.save(fig, output_file)
+
+
+def print_engagement(result, group_column, min_posts, top=3):
+    """Print the buckets with the highest mean likes per post for each group"""
+    has_ci = 'Likes CI Low' in result
+    for group, rows in result.groupby(group_column, sort=False):
+        total_posts = rows['Posts'].sum()
+        mean_likes = (rows['Mean Likes'] * rows['Posts']).sum() / total_posts
+        mean_comments = (rows['Mean Comments'] * rows['Posts']).sum() / total_posts
+        print(f"\n  {group}: {total_posts} posts, {mean_likes:.1f} likes and {mean_comments:.2f} comments per post")
+
+        eligible = rows[rows['Posts'] >= min_posts]
+        if len(eligible) == 0:
+            print(f"    No bucket has {min_posts} or more posts")
+            continue
+        for _, row in eligible.nlargest(top, 'Mean Likes').iterrows():
+            ci = f" [{row['Likes CI Low']:.1f}, {row['Likes CI High']:.1f}]" if has_ci else ""
+            print(f"    - {row['Time']}: {row['Posts']} posts, {row['Mean Likes']:.1f} mean likes{ci}, "
+                  f"median {row['Median Likes']:.0f}, {row['Mean Comments']:.2f} comments per post")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare posting times with the engagement the posts get")
+    parser.add_argument('--by', choices=GROUPINGS, default='page', help='group posts by page or by category')
+    parser.add_argument('--group', choices=list(PAGE_GROUPS) + ['all'], default='all',
+                        help='pages to include when grouping by page (default: all)')
+    parser.add_argument('--boot', type=int, default=1000, help='bootstrap resamples (0 skips the intervals)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='confidence level of the intervals')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the bootstrap')
+    parser.add_argument('--min-posts', type=int, default=5,
+                        help='only recommend buckets with at least this many posts')
+    parser.add_argument('--csv', help='also write the per-bucket table to this CSV file')
+    plotting.add_plot_arguments(parser)
+    timezones.add_timezone_arguments(parser)
+    instrumentation.add_profile_arguments(parser)
+    args = parser.parse_args()
+    plotting.configure_from_args(args)
+    timezones.configure_from_args(args)
+    instrumentation.start_profiling(args)
+
+    try:
+        with instrumentation.stage("Load data"):
+            print("Loading data...")
+            post_data = load_post_summary()
+            comment_tables = load_comment_tables()
+
+        groups = PAGE_GROUPS.get(args.group) if args.by == 'page' else None
+        with instrumentation.stage("Per-post engagement", rows=len(post_data)):
+            posts = post_engagement(post_data, comment_tables, args.by, groups)
+
+        with instrumentation.stage("Aggregate and bootstrap", rows=len(posts)):
+            print(f"Aggregating {len(posts)} posts with {args.boot} bootstrap resamples...")
+            result = engagement_by_bucket(posts, args.by, args.boot, args.confidence, args.seed)
+
+        _, group_column = GROUPINGS[args.by]
+        print(f"\nBest time buckets by mean likes per post (at least {args.min_posts} posts, "
+              f"{args.confidence:.0%} bootstrap interval):")
+        print_engagement(result, group_column, args.min_posts)
+
+        if args.csv:
+            result.to_csv(args.csv, index=False)
+            print(f"\nPer-bucket table written to {args.csv}")
+
+        if args.plots:
+            with instrumentation.stage("Plot frequency vs engagement"):
+                output_file = plot_frequency_vs_engagement(
+                    result, group_column, os.path.join(current_dir, "post_frequency_vs_engagement.png"))
+            print(f"\nChart saved as '{os.path.basename(output_file)}'")
+    finally:
+        instrumentation.finish_profiling(args)
+
+
+if __name__ == "__main__":
+    main()
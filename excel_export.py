@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Streaming Excel export for the analysis reports.
+
+pandas' to_excel keeps the whole workbook in memory until it is saved. Here
+every sheet is written row by row through xlsxwriter's constant_memory mode,
+which flushes each row to disk as soon as the next one starts, so memory stays
+flat however many rows a report has. Frames are converted to Python values one
+chunk of rows at a time, and a table longer than an Excel sheet continues on
+"<name> (2)", "<name> (3)" and so on.
+
+The multi-sheet report holds the category like statistics, the posts and the
+comments per (page, time bucket) of every page, the comment totals per page
+and the recommended posting windows.
+
+Usage:
+    python excel_export.py [--output analysis_report.xlsx]
+        [--sheets categories,posting,reactions,comments,windows] [--hours 2] [--top 3]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import xlsxwriter
+except ImportError:  # the Excel exports then fail with a clear message instead of at import time
+    xlsxwriter = None
+
+import timezones
+from category_cube import CategoryCube
+from comment_parser import PostAttributes
+from data_loader import load_comment_tables, load_post_summary
+from engagement_analysis import engagement_matrices, post_engagement
+from posting_windows import recommend_windows
+from time_buckets import DEFAULT_BUCKET_MINUTES, bucket_index, count_codes_by_bucket, counts_to_frame
+
+# Get the current directory where the script is running
+current_dir = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+
+# Header format of every sheet (the format the category workbook always used)
+HEADER_FORMAT = {
+    'bold': True,
+    'text_wrap': True,
+    'valign': 'top',
+    'fg_color': '#D7E4BC',
+    'border': 1
+}
+
+# Rows per sheet, including the header row (Excel's limit)
+MAX_SHEET_ROWS = 1_048_576
+
+# Rows converted from a frame to Python values at a time
+CHUNK_ROWS = 50_000
+
+# Sheets of the full report, in workbook order
+REPORT_SHEETS = ('categories', 'posting', 'reactions', 'comments', 'windows')
+
+
+class ExcelReport:
+    """
+    A workbook written sheet by sheet and row by row in constant_memory mode.
+
+    Sheets must be written one after the other: in constant_memory mode a sheet
+    can no longer be changed once the next one is started. Use as a context
+    manager (or call close()) to finish the file.
+    """
+
+    def __init__(self, path, max_sheet_rows=MAX_SHEET_ROWS):
+        if xlsxwriter is None:
+            raise ImportError("Writing Excel files requires xlsxwriter (pip install xlsxwriter)")
+        self.path = path
+        self.max_sheet_rows = max_sheet_rows
+        self.workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        self.header_format = self.workbook.add_format(HEADER_FORMAT)
+        self.sheet_rows = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.workbook.close()
+
+    def write_rows(self, name, columns, rows, widths=None):
+        """
+        Write a sheet from an iterable of row tuples; return the number of data rows.
+
+        `widths` maps column ranges such as 'A:A' or 'B:C' to widths. Rows that do
+        not fit on one sheet continue on "<name> (2)" and so on.
+        """
+        sheet_number = 1
+        worksheet = self._add_sheet(name, columns, widths)
+        row_number = 0
+        total = 0
+        for row in rows:
+            if row_number + 1 == self.max_sheet_rows:
+                sheet_number += 1
+                worksheet = self._add_sheet(f"{name} ({sheet_number})", columns, widths)
+                row_number = 0
+            row_number += 1
+            worksheet.write_row(row_number, 0, row)
+            total += 1
+        self.sheet_rows[name] = total
+        return total
+
+    def write_frame(self, name, frame, widths=None):
+        """Write a DataFrame as a sheet (header row plus one row per frame row); return the row count"""
+        return self.write_rows(name, [str(column) for column in frame.columns], _frame_rows(frame), widths)
+
+    def _add_sheet(self, name, columns, widths):
+        # Excel sheet names are limited to 31 characters
+        worksheet = self.workbook.add_worksheet(name[:31])
+        for columns_range, width in (widths or {}).items():
+            worksheet.set_column(columns_range, width)
+        worksheet.write_row(0, 0, columns, self.header_format)
+        return worksheet
+
+
+def _frame_rows(frame, chunk_rows=CHUNK_ROWS):
+    """Yield the rows of a frame as tuples of Python values, converting one chunk at a time"""
+    for start in range(0, len(frame), chunk_rows):
+        chunk = frame.iloc[start:start + chunk_rows]
+        yield from zip(*(_cell_values(chunk[column]) for column in chunk.columns))
+
+
+def _cell_values(column):
+    """Return a column as a list of values xlsxwriter can write (None leaves the cell empty)"""
+    if pd.api.types.is_datetime64_any_dtype(column):
+        column = column.dt.strftime('%Y-%m-%d %H:%M:%S')
+    # astype(object) turns numpy scalars into plain Python ints and floats
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+def page_bucket_frame(pages, buckets, count_column):
+    """Return the rows per (page, time bucket) of every page, as written to the bucket sheets"""
+    page_order = sorted(pd.Series(pages).dropna().unique())
+    page_names, counts = count_codes_by_bucket(pages, buckets, page_order)
+    return counts_to_frame(page_names, counts, page_column='Page', count_column=count_column)
+
+
+def build_report(post_data, comment_tables=None, sheets=REPORT_SHEETS, window_hours=2, top=3):
+    """
+    Return the sheets of the full report as {sheet name: (frame, column widths)}.
+
+    Every table is computed from the loaded data in local time (see
+    timezones); `comment_tables` is needed for the reactions, comments and
+    windows sheets.
+    """
+    # Imported here: category_analysis_wordcloud itself writes its workbook with ExcelReport
+    from category_analysis_wordcloud import TARGET_CATEGORIES
+
+    report = {}
+    if 'categories' in sheets:
+        stats = CategoryCube.build(post_data).summary('category', TARGET_CATEGORIES)
+        report['Category Analysis'] = (stats, {'A:A': 20, 'B:C': 15})
+
+    if 'posting' in sheets:
+        local = timezones.local_times(post_data['createdTime'], post_data['postedBy'])
+        frame = page_bucket_frame(post_data['postedBy'], bucket_index(local), 'Post Count')
+        report['Posting Buckets'] = (frame, {'A:A': 30, 'B:D': 12})
+
+    if comment_tables is not None:
+        parsed, others = comment_tables
+        lookup = PostAttributes(post_data, columns=('postedBy',))
+        if 'reactions' in sheets:
+            pages = lookup.lookup_compact(parsed)['postedBy']
+            frame = page_bucket_frame(pages, parsed.buckets(pages), 'Comment Count')
+            report['Reaction Buckets'] = (frame, {'A:A': 30, 'B:D': 12})
+
+        if 'comments' in sheets:
+            with_time = lookup.lookup_compact(parsed)['postedBy'].value_counts()
+            without_time = lookup.lookup_compact(others)['postedBy'].value_counts()
+            totals = pd.DataFrame({'Comments With Timestamp': with_time,
+                                   'Comments Without Timestamp': without_time}).fillna(0).astype(np.int64)
+            totals['Total Comments'] = totals.sum(axis=1)
+            totals = totals.rename_axis('Page').reset_index().sort_values('Total Comments', ascending=False)
+            report['Comment Totals'] = (totals, {'A:A': 30, 'B:D': 18})
+
+        if 'windows' in sheets:
+            posts = post_engagement(post_data, comment_tables, 'page')
+            names, post_counts, likes, _ = engagement_matrices(posts)
+            window = int(round(window_hours * 60 / DEFAULT_BUCKET_MINUTES))
+            frame = recommend_windows(names, post_counts, likes, window, top).rename(columns={'Group': 'Page'})
+            report['Recommended Windows'] = (frame, {'A:A': 30, 'B:H': 14})
+    return report
+
+
+def export_report(report, path):
+    """Write the sheets of build_report to one workbook; return {sheet name: rows written}"""
+    with ExcelReport(path) as workbook:
+        for name, (frame, widths) in report.items():
+            workbook.write_frame(name, frame, widths)
+    return workbook.sheet_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the analysis tables to a multi-sheet Excel report")
+    parser.add_argument('--output', default=os.path.join(current_dir, "analysis_report.xlsx"),
+                        help='workbook to write (default: analysis_report.xlsx)')
+    parser.add_argument('--sheets', type=lambda value: [sheet.strip() for sheet in value.split(',')],
+                        default=list(REPORT_SHEETS),
+                        help=f"comma-separated sheets to include (default: {','.join(REPORT_SHEETS)})")
+    parser.add_argument('--hours', type=float, default=2, help='length of the recommended windows in hours')
+    parser.add_argument('--top', type=int, default=3, help='recommended windows per page')
+    timezones.add_timezone_arguments(parser)
+    args = parser.parse_args()
+    timezones.configure_from_args(args)
+    unknown = sorted(set(args.sheets) - set(REPORT_SHEETS))
+    if unknown:
+        parser.error(f"Unknown sheets: {', '.join(unknown)} (choose from {', '.join(REPORT_SHEETS)})")
+
+    print("Loading data...")
+    post_data = load_post_summary()
+    comment_tables = None
+    if set(args.sheets) & {'reactions', 'comments', 'windows'}:
+        comment_tables = load_comment_tables()
+
+    report = build_report(post_data, comment_tables, args.sheets, args.hours, args.top)
+    sheet_rows = export_report(report, args.output)
+    for name, rows in sheet_rows.items():
+        print(f"  {name}: {rows} rows")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
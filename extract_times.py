@@ -1,15 +1,24 @@
-import pandas as pd
-data = pd.read_csv('Post-Summary.csv')
-bangalore_posts = data[data['postedBy'] == 'Bengaluru Traffic Police']
-
-# Filter posts made between 3:00-3:14 AM
-early_morning_posts = []
-for _, row in bangalore_posts.iterrows():
-    time_str = row['createdTime']
-    # Check if time is between 3:00-3:14 AM
-    if 'T03:0' in time_str or ('T03:1' in time_str and time_str.split('T03:1')[1][0] in '0123'):
-        early_morning_posts.append(time_str)
-
-print('Original createdTime values for Bengaluru Traffic Police posts between 3:00-3:14 AM:')
-for time in early_morning_posts:
+import argparse
+
+import timezones
+from data_loader import load_post_summary
+from time_query import TimeWindowIndex
+
+parser = argparse.ArgumentParser(description="List the Bengaluru Traffic Police posts made between 3:00-3:14 AM")
+timezones.add_timezone_arguments(parser)
+timezones.configure_from_args(parser.parse_args())
+
+data = load_post_summary()
+# Index the posts by their local time (see timezones), like the posting analysis
+local_data = data.assign(createdTime=timezones.local_times(data['createdTime'], data['postedBy']))
+index = TimeWindowIndex(local_data)
+
+# Posts made between 3:00-3:14 AM local time, i.e. in the window [03:00, 03:15)
+early_morning_posts = index.query('Bengaluru Traffic Police', 3 * 60, 3 * 60 + 15)
+
+print(f"Original createdTime values for Bengaluru Traffic Police posts between 3:00-3:14 AM "
+      f"({timezones.timezone_of('Bengaluru Traffic Police')}):")
+for time in data.loc[early_morning_posts.index, 'createdTime'].dt.strftime('%Y-%m-%dT%H:%M:%S+0000'):
     print(time)
+if len(early_morning_posts) == 0:
+    print("  No posts found in this time period.")
@@ -0,0 +1,245 @@
+"""
+Helper module: per-stage timing and memory instrumentation for the analysis scripts.
+
+Stages are marked either with the `stage` context manager or, for the long
+linear analysis functions, with `step`, which ends the previous step and starts
+the next one. For every stage the wall time, CPU time, peak RSS, optional
+tracemalloc peak and row count are recorded. CPU time and memory cover the
+calling process only, not worker processes started by a stage.
+
+Nothing is recorded unless profiling was started (the scripts do this for
+--profile), so the markers cost nothing in normal runs.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is then not reported
+    resource = None
+
+# Default file names for the JSON report and the cProfile dump
+DEFAULT_REPORT_FILE = 'profile.json'
+DEFAULT_DUMP_FILE = 'profile_stage.prof'
+
+# Profiler of the current run (None when profiling is off)
+_active = None
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class StageProfiler:
+    """
+    Collects one record per stage.
+
+    `profile_stage` names a stage (case-insensitive substring of its name) to run
+    under cProfile; its stats are written to `profile_dump`.
+    """
+
+    def __init__(self, trace_memory=False, profile_stage=None, profile_dump=DEFAULT_DUMP_FILE):
+        self.trace_memory = trace_memory
+        self.profile_stage = profile_stage.lower() if profile_stage else None
+        self.profile_dump = profile_dump
+        self.records = []
+        self._open = []        # Records of the stages currently running, outermost first
+        self._step = None      # Record of the current step()
+        self._cprofile = None  # (record, cProfile.Profile) while the profiled stage runs
+        self._started = time.perf_counter()
+        self._started_at = datetime.now(timezone.utc)
+
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def start(self, name):
+        """Start a stage and return its record"""
+        self._fold_traced_peak()
+        record = {
+            'name': name,
+            'rows': None,
+            '_wall': time.perf_counter(),
+            '_cpu': time.process_time(),
+            '_rss': _peak_rss_mb(),
+            '_traced_peak': 0
+        }
+        self.records.append(record)
+        self._open.append(record)
+
+        if self.profile_stage and self._cprofile is None and self.profile_stage in name.lower():
+            profiler = cProfile.Profile()
+            self._cprofile = (record, profiler)
+            profiler.enable()
+        return record
+
+    def stop(self, record):
+        """End a stage started with start()"""
+        # Records are compared by identity: two stages may hold equal values
+        if not any(open_record is record for open_record in self._open):
+            return
+        if self._cprofile is not None and self._cprofile[0] is record:
+            self._dump_cprofile()
+
+        self._fold_traced_peak()
+        self._open = [open_record for open_record in self._open if open_record is not record]
+        rss = _peak_rss_mb()
+        record['wall_s'] = time.perf_counter() - record.pop('_wall')
+        record['cpu_s'] = time.process_time() - record.pop('_cpu')
+        record['rows_per_s'] = (record['rows'] / record['wall_s']
+                                if record['rows'] and record['wall_s'] > 0 else None)
+        start_rss = record.pop('_rss')
+        record['peak_rss_mb'] = rss
+        record['rss_growth_mb'] = rss - start_rss if rss is not None else None
+        traced_peak = record.pop('_traced_peak')
+        if self.trace_memory:
+            record['traced_peak_mb'] = traced_peak / (1024 * 1024)
+
+    def step(self, name):
+        """End the current step (if any) and start the next one"""
+        self.end_step()
+        self._step = self.start(name)
+
+    def end_step(self):
+        """End the current step, if one is running"""
+        if self._step is not None:
+            self.stop(self._step)
+            self._step = None
+
+    def set_rows(self, rows):
+        """Set the row count of the innermost running stage"""
+        if self._open:
+            self._open[-1]['rows'] = int(rows)
+
+    def finish(self):
+        """End every stage that is still running"""
+        self.end_step()
+        for record in list(reversed(self._open)):
+            self.stop(record)
+
+    def report(self):
+        """Return the collected records as a JSON-serializable dict"""
+        return {
+            'script': os.path.basename(sys.argv[0]),
+            'argv': sys.argv[1:],
+            'started': self._started_at.isoformat(),
+            'total_wall_s': time.perf_counter() - self._started,
+            'total_cpu_s': time.process_time(),
+            'peak_rss_mb': _peak_rss_mb(),
+            'stages': [record for record in self.records if 'wall_s' in record]
+        }
+
+    def print_summary(self):
+        """Print a table of the finished stages"""
+        report = self.report()
+        print(f"\nStage timings ({report['total_wall_s']:.2f} s wall in total):")
+        print(f"  {'stage':<58} {'wall':>9} {'cpu':>9} {'rows':>10} {'peak RSS':>10}")
+        for record in report['stages']:
+            rows = f"{record['rows']:,}" if record['rows'] is not None else '-'
+            rss = f"{record['peak_rss_mb']:.0f}MB" if record['peak_rss_mb'] is not None else '-'
+            print(f"  {record['name'][:58]:<58} {record['wall_s']:>8.3f}s {record['cpu_s']:>8.3f}s "
+                  f"{rows:>10} {rss:>10}")
+
+    def _fold_traced_peak(self):
+        # Credit the tracemalloc peak since the last check to every running stage,
+        # then reset it so the next stage starts from the current usage
+        if not self.trace_memory or not tracemalloc.is_tracing():
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        for record in self._open:
+            record['_traced_peak'] = max(record['_traced_peak'], peak)
+        tracemalloc.reset_peak()
+
+    def _dump_cprofile(self):
+        record, profiler = self._cprofile
+        profiler.disable()
+        self._cprofile = None
+        profiler.dump_stats(self.profile_dump)
+        print(f"\ncProfile stats of '{record['name']}' written to {self.profile_dump}")
+        pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(10)
+
+
+@contextmanager
+def stage(name, rows=None):
+    """Record the enclosed block as a stage; yields its record (None when not profiling)"""
+    if _active is None:
+        yield None
+        return
+    record = _active.start(name)
+    if rows is not None:
+        record['rows'] = int(rows)
+    try:
+        yield record
+    finally:
+        _active.stop(record)
+
+
+def step(name):
+    """End the current step and start a new one (for linear, numbered analysis steps)"""
+    if _active is not None:
+        _active.step(name)
+
+
+def end_step():
+    """End the current step without starting another"""
+    if _active is not None:
+        _active.end_step()
+
+
+def set_rows(rows):
+    """Record the number of rows handled by the innermost running stage"""
+    if _active is not None:
+        _active.set_rows(rows)
+
+
+def add_profile_arguments(parser):
+    """Add the --profile family of options to an argparse parser"""
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--profile', nargs='?', const=DEFAULT_REPORT_FILE, metavar='JSON',
+                       help=f"record per-stage timings and memory and write them to JSON "
+                            f"(default {DEFAULT_REPORT_FILE})")
+    group.add_argument('--trace-memory', action='store_true',
+                       help='also record the tracemalloc peak of every stage (slows the run down)')
+    group.add_argument('--profile-stage', metavar='NAME',
+                       help='run the first stage whose name contains NAME under cProfile')
+    group.add_argument('--profile-dump', default=DEFAULT_DUMP_FILE, metavar='PATH',
+                       help=f"where to write the cProfile stats (default {DEFAULT_DUMP_FILE})")
+
+
+def start_profiling(args):
+    """Start profiling if the parsed arguments ask for it; return the profiler or None"""
+    global _active
+    if not (args.profile or args.profile_stage or args.trace_memory):
+        return None
+    _active = StageProfiler(trace_memory=args.trace_memory, profile_stage=args.profile_stage,
+                            profile_dump=args.profile_dump)
+    return _active
+
+
+def finish_profiling(args):
+    """Stop profiling, print the stage table and write the JSON report"""
+    global _active
+    if _active is None:
+        return None
+    profiler = _active
+    _active = None
+
+    profiler.finish()
+    profiler.print_summary()
+    report = profiler.report()
+    if args.profile:
+        with open(args.profile, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Profile report written to {args.profile}")
+    return report
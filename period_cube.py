@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Period comparisons from a precomputed (page x day x time bucket) count cube.
+
+The posts (or comments) are counted once into a compact uint32 cube with one
+cell per page, calendar day and 15-minute bucket. Any "period A vs period B"
+or rolling-window comparison is then a slice-and-sum over the day axis of that
+cube, so no comparison has to rescan the source frames.
+
+Usage:
+    python period_cube.py --group traffic --period-a 2013-01-01:2013-06-30 --period-b 2013-07-01:2013-12-31
+    python period_cube.py --group e-commerce --kind comments --period-a 2013-11-01:2013-11-30 \\
+        --period-b 2013-12-01:2013-12-31 --rolling 7
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import plotting
+import timezones
+from comment_parser import PostAttributes
+from data_loader import load_comment_tables, load_post_summary
+from time_buckets import DEFAULT_BUCKET_MINUTES, bucket_count, bucket_index
+
+# Get the current directory where the script is running
+current_dir = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+
+# Page groups that can be compared with --group
+PAGE_GROUPS = {
+    'traffic': ["Bengaluru Traffic Police", "Kolkata Traffic Police", "Hyderabad Traffic Police"],
+    'e-commerce': ["Flipkart", "Amazon India", "Snapdeal", "Myntra"]
+}
+GROUP_TITLES = {'traffic': 'Traffic Police', 'e-commerce': 'E-commerce'}
+
+# Parts of the day shown in the comparison chart: (label, first hour, end hour)
+DAY_PARTS = [
+    ('Early Morning (12:00-5:59 AM)', 0, 6),
+    ('Morning (6:00-11:59 AM)', 6, 12),
+    ('Afternoon (12:00-5:59 PM)', 12, 18),
+    ('Evening (6:00-11:59 PM)', 18, 24)
+]
+
+
+def _to_days(times):
+    """Return timestamps as datetime64[D] calendar days (UTC for tz-aware input)"""
+    times = pd.to_datetime(pd.Series(times))
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+    return times.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+
+
+def _parse_day(value):
+    """Return a date ('YYYY-MM-DD', date or datetime) as a datetime64[D] day"""
+    return np.datetime64(pd.Timestamp(str(value)).date(), 'D')
+
+
+class PeriodCube:
+    """
+    Counts per (page, calendar day, time bucket) as a uint32 array.
+
+    The day axis covers every day from the first to the last counted one, so a
+    date range maps to a contiguous slice of it.
+    """
+
+    def __init__(self, pages, first_day, counts, bucket_minutes=DEFAULT_BUCKET_MINUTES):
+        self.pages = list(pages)
+        self.first_day = first_day
+        self.counts = counts
+        self.bucket_minutes = bucket_minutes
+
+    @classmethod
+    def build(cls, pages, times, page_order=None, bucket_minutes=DEFAULT_BUCKET_MINUTES):
+        """
+        Count rows into a cube in a single bincount pass.
+
+        Rows whose page is not in page_order (default: all pages, sorted), or
+        whose timestamp is missing, are ignored.
+        """
+        n_buckets = bucket_count(bucket_minutes)
+        page_codes = pd.Categorical(pd.Series(pages).to_numpy(), categories=page_order)
+        codes = np.asarray(page_codes.codes, dtype=np.int64)
+        buckets = bucket_index(times, bucket_minutes)
+        days = _to_days(times)
+
+        valid = (codes >= 0) & (buckets >= 0) & ~np.isnat(days)
+        if not valid.any():
+            empty = np.zeros((len(page_codes.categories), 0, n_buckets), dtype=np.uint32)
+            return cls(page_codes.categories, None, empty, bucket_minutes)
+
+        first_day = days[valid].min()
+        day_offsets = (days[valid] - first_day).astype(np.int64)
+        n_days = int(day_offsets.max()) + 1
+        flat_index = (codes[valid] * n_days + day_offsets) * n_buckets + buckets[valid]
+        counts = np.bincount(flat_index, minlength=len(page_codes.categories) * n_days * n_buckets)
+        return cls(page_codes.categories, first_day,
+                   counts.astype(np.uint32).reshape(len(page_codes.categories), n_days, n_buckets),
+                   bucket_minutes)
+
+    @property
+    def days(self):
+        """Calendar days of the day axis"""
+        if self.first_day is None:
+            return np.empty(0, dtype='datetime64[D]')
+        return self.first_day + np.arange(self.counts.shape[1])
+
+    def day_slice(self, date_from=None, date_to=None):
+        """Return the slice of the day axis for [date_from, date_to] (both inclusive)"""
+        n_days = self.counts.shape[1]
+        if self.first_day is None:
+            return slice(0, 0)
+        start = 0 if date_from is None else int((_parse_day(date_from) - self.first_day).astype(np.int64))
+        stop = n_days if date_to is None else int((_parse_day(date_to) - self.first_day).astype(np.int64)) + 1
+        return slice(min(max(start, 0), n_days), min(max(stop, 0), n_days))
+
+    def _page_rows(self, pages):
+        if pages is None:
+            return list(range(len(self.pages)))
+        rows = {page: i for i, page in enumerate(self.pages)}
+        return [rows[page] for page in pages if page in rows]
+
+    def period_counts(self, date_from=None, date_to=None, pages=None):
+        """Return the (pages x buckets) counts summed over [date_from, date_to]"""
+        rows = self._page_rows(pages)
+        return self.counts[rows, self.day_slice(date_from, date_to)].sum(axis=1, dtype=np.int64)
+
+    def compare(self, period_a, period_b, pages=None):
+        """
+        Return the (pages x buckets) counts of two periods.
+
+        Each period is a (date_from, date_to) pair; either end may be None.
+        """
+        return self.period_counts(*period_a, pages=pages), self.period_counts(*period_b, pages=pages)
+
+    def rolling(self, window_days, pages=None):
+        """
+        Return (window end days, counts) for every window of `window_days` days.
+
+        counts has shape (pages, windows, buckets); window i covers days
+        i .. i + window_days - 1 of the day axis. Computed with one cumulative
+        sum over the day axis rather than one sum per window.
+        """
+        if window_days <= 0:
+            raise ValueError(f"The rolling window must be at least one day, got {window_days}")
+        rows = self._page_rows(pages)
+        cube = self.counts[rows]
+        cumulative = np.zeros((cube.shape[0], cube.shape[1] + 1, cube.shape[2]), dtype=np.int64)
+        np.cumsum(cube, axis=1, dtype=np.int64, out=cumulative[:, 1:])
+        windows = cumulative[:, window_days:] - cumulative[:, :-window_days]
+        return self.days[window_days - 1:], windows
+
+    def day_part_shares(self, counts):
+        """Return the percentage of `counts` (summed over pages) in each of DAY_PARTS"""
+        buckets_per_hour = 60 // self.bucket_minutes
+        totals = np.asarray(counts).reshape(-1, counts.shape[-1]).sum(axis=0)
+        parts = np.array([totals[start * buckets_per_hour:end * buckets_per_hour].sum()
+                          for _, start, end in DAY_PARTS], dtype=float)
+        return parts / parts.sum() * 100 if parts.sum() else parts
+
+
+def build_post_cube(post_data, pages=None):
+    """Build the cube of posts per (page, local day, bucket)"""
+    local = timezones.local_times(post_data['createdTime'], post_data['postedBy'])
+    return PeriodCube.build(post_data['postedBy'], local, pages)
+
+
+def build_comment_cube(post_data, comment_tables, pages=None):
+    """Build the cube of timestamped comments per (page of their post, local day, bucket)"""
+    parsed, _ = comment_tables
+    comment_pages = PostAttributes(post_data, columns=('postedBy',)).lookup_compact(parsed)['postedBy']
+    return PeriodCube.build(comment_pages, timezones.local_times(parsed.timestamps(), comment_pages), pages)
+
+
+def plot_period_comparison(cube, counts_a, counts_b, label_a, label_b, title, output_file):
+    """Draw the share of each part of the day in both periods as grouped bars; return the path written"""
+    shares_a = cube.day_part_shares(counts_a)
+    shares_b = cube.day_part_shares(counts_b)
+
+    fig, ax = plotting.figure((12, 6))
+    x = np.arange(len(DAY_PARTS))
+    width = 0.35
+    ax.bar(x - width / 2, shares_a, width, label=label_a)
+    ax.bar(x + width / 2, shares_b, width, label=label_b)
+
+    ax.set_title(title, fontsize=16)
+    ax.set_ylabel('Percentage (%)', fontsize=14)
+    ax.set_xticks(x)
+    ax.set_xticklabels([label for label, _, _ in DAY_PARTS], rotation=45, ha='right')
+    ax.grid(axis='y', alpha=0.3)
+    ax.legend()
+
+    fig.tight_layout()
+    return plotting.save(fig, output_file)
+
+
+def _parse_period(value):
+    """Parse 'FROM:TO' (YYYY-MM-DD, either side may be empty) into a (from, to) pair"""
+    date_from, sep, date_to = value.partition(':')
+    if not sep:
+        raise argparse.ArgumentTypeError(f"Invalid period '{value}', expected FROM:TO")
+    try:
+        return tuple(str(_parse_day(day)) if day else None for day in (date_from, date_to))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid period '{value}', expected YYYY-MM-DD:YYYY-MM-DD")
+
+
+def _period_label(period):
+    date_from, date_to = period
+    return f"{date_from or 'start'} to {date_to or 'end'}"
+
+
+def print_comparison(cube, pages, counts_a, counts_b, label_a, label_b, kind):
+    """Print the totals and the day-part shares of both periods per page"""
+    print(f"\n{kind.capitalize()} per page: {label_a} vs {label_b}")
+    for page, a, b in zip(pages, counts_a, counts_b):
+        change = f"{(b.sum() / a.sum() - 1):+.1%}" if a.sum() else "n/a"
+        print(f"  {page}: {a.sum()} vs {b.sum()} ({change})")
+
+    print("\nShare of each part of the day (all pages):")
+    for (label, _, _), share_a, share_b in zip(DAY_PARTS, cube.day_part_shares(counts_a),
+                                               cube.day_part_shares(counts_b)):
+        print(f"  {label}: {share_a:.1f}% vs {share_b:.1f}%")
+
+
+def print_rolling(cube, pages, window_days, kind):
+    """Print the busiest and quietest window per page and the latest window against the one before"""
+    end_days, windows = cube.rolling(window_days, pages)
+    if len(end_days) == 0:
+        print(f"\nNot enough days for a {window_days}-day rolling window")
+        return
+
+    print(f"\nRolling {window_days}-day windows of {kind}:")
+    totals = windows.sum(axis=2)
+    for page, page_totals in zip(pages, totals):
+        busiest = page_totals.argmax()
+        quietest = page_totals.argmin()
+        print(f"  {page}: busiest window ending {end_days[busiest]} ({page_totals[busiest]}), "
+              f"quietest ending {end_days[quietest]} ({page_totals[quietest]})")
+        if len(page_totals) > window_days:
+            latest, previous = page_totals[-1], page_totals[-1 - window_days]
+            change = f"{(latest / previous - 1):+.1%}" if previous else "n/a"
+            print(f"    latest window {latest} vs the {window_days} days before {previous} ({change})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare posting or comment activity between periods")
+    parser.add_argument('--group', choices=PAGE_GROUPS, default='traffic', help='pages to compare')
+    parser.add_argument('--kind', choices=('posts', 'comments'), default='posts', help='what to count')
+    parser.add_argument('--period-a', type=_parse_period, required=True, metavar='FROM:TO',
+                        help='first period, e.g. 2013-01-01:2013-06-30')
+    parser.add_argument('--period-b', type=_parse_period, required=True, metavar='FROM:TO',
+                        help='second period, e.g. 2013-07-01:2013-12-31')
+    parser.add_argument('--rolling', type=int, metavar='DAYS', help='also report rolling windows of DAYS days')
+    plotting.add_plot_arguments(parser)
+    timezones.add_timezone_arguments(parser)
+    args = parser.parse_args()
+    plotting.configure_from_args(args)
+    timezones.configure_from_args(args)
+
+    pages = PAGE_GROUPS[args.group]
+    print("Loading data...")
+    post_data = load_post_summary()
+    if args.kind == 'posts':
+        cube = build_post_cube(post_data, pages)
+    else:
+        cube = build_comment_cube(post_data, load_comment_tables(), pages)
+    print(f"Built a {' x '.join(map(str, cube.counts.shape))} cube "
+          f"({cube.counts.nbytes / 1024:.0f} KB) from {cube.counts.sum()} {args.kind}")
+
+    counts_a, counts_b = cube.compare(args.period_a, args.period_b)
+    label_a, label_b = _period_label(args.period_a), _period_label(args.period_b)
+    print_comparison(cube, cube.pages, counts_a, counts_b, label_a, label_b, args.kind)
+
+    if args.rolling:
+        print_rolling(cube, cube.pages, args.rolling, args.kind)
+
+    if args.plots:
+        title = f"Time Period Distribution: {GROUP_TITLES[args.group]} {args.kind.capitalize()}"
+        output_file = plot_period_comparison(cube, counts_a, counts_b, label_a, label_b, title,
+                                             os.path.join(current_dir, f"{args.group}_period_comparison.png"))
+        print(f"\nChart saved as '{os.path.basename(output_file)}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Helper module: chart rendering for the analysis scripts.
+
+Importing the plotting libraries takes about a second, which stats-only runs
+(--no-plots) should not pay for, so matplotlib, seaborn and wordcloud are
+imported on first use, with the non-interactive Agg backend since every chart
+is written to a file.
+
+Charts are drawn on Figure objects that are kept per process and cleared for
+the next chart of the same size instead of being created and destroyed every
+time. Independent charts can be rendered across a process pool, and the output
+format (PNG or SVG) and resolution are set once per run with configure().
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from time_buckets import bucket_count, bucket_label, bucket_range_label
+
+# Output formats charts can be written in
+CHART_FORMATS = ('png', 'svg')
+
+_pyplot = None
+_style_applied = False
+
+# Output settings of the current run (see configure)
+_settings = {'dpi': None, 'format': 'png'}
+
+# Figures kept for reuse, keyed by figure size
+_figures = {}
+
+
+def pyplot():
+    """Return matplotlib.pyplot, importing it with the Agg backend on first use"""
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot
+        _pyplot = matplotlib.pyplot
+    return _pyplot
+
+
+def seaborn():
+    """Return the seaborn module (imported on first use)"""
+    pyplot()
+    import seaborn
+    return seaborn
+
+
+def wordcloud():
+    """Return the wordcloud module (imported on first use)"""
+    import wordcloud
+    return wordcloud
+
+
+def apply_style(style='ggplot', palette='Set2'):
+    """Apply the plot style and seaborn palette used by the category charts (once per process)"""
+    global _style_applied
+    if not _style_applied:
+        pyplot().style.use(style)
+        seaborn().set_palette(palette)
+        _style_applied = True
+
+
+def configure(dpi=None, fmt='png'):
+    """
+    Set the output resolution and format of every chart saved afterwards.
+
+    dpi=None keeps each chart's own default resolution.
+    """
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f"Unsupported chart format '{fmt}', expected one of {', '.join(CHART_FORMATS)}")
+    _settings['dpi'] = dpi
+    _settings['format'] = fmt
+
+
+def settings():
+    """Return the current output settings (e.g. to pass them on to worker processes)"""
+    return dict(_settings)
+
+
+def chart_dpi(default=None):
+    """Return the resolution a chart is saved with: the configured one, else `default`"""
+    return _settings['dpi'] or default
+
+
+def chart_path(path):
+    """Return `path` with the extension of the configured output format"""
+    return os.path.splitext(path)[0] + '.' + _settings['format']
+
+
+def figure(figsize):
+    """
+    Return a cleared (figure, axes) pair of the given size.
+
+    The figure is reused by the next call with the same size, so a chart must be
+    saved before another one of that size is started.
+    """
+    fig = _figures.get(figsize)
+    if fig is None:
+        pyplot()  # Selects the Agg backend before the first figure is made
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=figsize)
+        _figures[figsize] = fig
+    else:
+        fig.clear()
+    return fig, fig.add_subplot()
+
+
+def save(fig, path, dpi=None):
+    """Save a figure in the configured format and return the path written"""
+    output_path = chart_path(path)
+    fig.savefig(output_path, dpi=chart_dpi(dpi) or 'figure', format=_settings['format'])
+    return output_path
+
+
+@lru_cache(maxsize=None)
+def hour_ticks(range_labels=False):
+    """
+    Return (tick positions, tick labels) marking every full hour of the bucket axis.
+
+    Labels are bucket start times ('03:00') or, with range_labels, the time
+    range of the bucket ('03:00-03:14'). Computed once per process.
+    """
+    buckets_per_hour = bucket_count() // 24
+    positions = tuple(range(0, bucket_count(), buckets_per_hour))
+    label = bucket_range_label if range_labels else bucket_label
+    return positions, tuple(label(bucket) for bucket in positions)
+
+
+def render_all(render, jobs, workers=None):
+    """
+    Call render(*job) for every job and yield the results in order.
+
+    With more than one worker the jobs are spread over a process pool; the
+    workers use the same output settings as this process. `render` must be a
+    module-level function so it can be sent to the workers.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                                 initializer=_init_worker, initargs=(settings(),)) as executor:
+            yield from executor.map(_render_job, [(render, job) for job in jobs])
+    else:
+        for job in jobs:
+            yield render(*job)
+
+
+def _render_job(task):
+    render, job = task
+    return render(*job)
+
+
+def _init_worker(output_settings):
+    configure(output_settings['dpi'], output_settings['format'])
+
+
+def add_plot_arguments(parser):
+    """Add the chart options (--no-plots, --dpi, --format) to an argparse parser"""
+    group = parser.add_argument_group('charts')
+    group.add_argument('--no-plots', dest='plots', action='store_false',
+                       help="only compute and print the statistics; skip charts and their imports")
+    group.add_argument('--dpi', type=int,
+                       help="resolution of the saved charts (default: each chart's own)")
+    group.add_argument('--format', dest='chart_format', choices=CHART_FORMATS, default='png',
+                       help='file format of the saved charts (default: png)')
+
+
+def configure_from_args(args):
+    """Apply the --dpi/--format options parsed by add_plot_arguments"""
+    configure(args.dpi, args.chart_format)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Recommended posting windows per page or category.
+
+For every page (or category) the optimizer looks for the top-k contiguous
+time-of-day windows of a given length whose posts get the most engagement per
+post relative to how much is posted in them. A window's score is its lift:
+
+    (engagement in the window / posts in the window) / (engagement / posts overall)
+
+which is also its share of the engagement divided by its share of the posts.
+Window totals come from circular prefix sums over the 96-bucket arrays of
+engagement_analysis.engagement_matrices, so windows that wrap around midnight
+are handled and all windows of all groups are scored in O(groups x buckets).
+
+Usage:
+    python posting_windows.py [--by page|category] [--group traffic|e-commerce|all]
+        [--hours 2] [--top 3] [--min-posts 10] [--metric likes|comments|both]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import plotting
+import timezones
+from data_loader import load_comment_tables, load_post_summary
+from engagement_analysis import GROUPINGS, engagement_matrices, post_engagement
+from period_cube import PAGE_GROUPS
+from time_buckets import DEFAULT_BUCKET_MINUTES, bucket_count, bucket_label
+
+# Get the current directory where the script is running
+current_dir = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+
+# Engagement measures a window can be scored on, with their labels
+METRICS = {'likes': 'likes', 'comments': 'comments', 'both': 'likes + comments'}
+
+
+def circular_window_sums(counts, window):
+    """
+    Return the sum of every circular window of `window` buckets.
+
+    `counts` is a (groups x buckets) array; entry [g, s] of the result is the
+    sum of buckets s .. s + window - 1 (wrapping past the last bucket) of group g.
+    """
+    n_buckets = counts.shape[1]
+    if not 0 < window <= n_buckets:
+        raise ValueError(f"The window must cover 1 to {n_buckets} buckets, got {window}")
+    # Append the first window - 1 buckets so windows that cross midnight are contiguous
+    extended = np.concatenate([counts, counts[:, :window - 1]], axis=1)
+    prefix = np.zeros((counts.shape[0], extended.shape[1] + 1), dtype=np.result_type(counts, np.float64))
+    np.cumsum(extended, axis=1, out=prefix[:, 1:])
+    return prefix[:, window:window + n_buckets] - prefix[:, :n_buckets]
+
+
+def window_lift(posts, engagement, window, min_posts=1):
+    """
+    Return (lift, window posts, window engagement) for every window start.
+
+    Windows with fewer than `min_posts` posts get a lift of NaN.
+    """
+    window_posts = circular_window_sums(posts, window)
+    window_engagement = circular_window_sums(engagement, window)
+    total_posts = posts.sum(axis=1, keepdims=True)
+    total_engagement = engagement.sum(axis=1, keepdims=True)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        overall = total_engagement / total_posts
+        lift = (window_engagement / window_posts) / overall
+    lift[(window_posts < max(min_posts, 1)) | ~np.isfinite(lift)] = np.nan
+    return lift, window_posts, window_engagement
+
+
+def top_windows(scores, window, top):
+    """
+    Return the starts of the `top` best-scoring windows that do not overlap.
+
+    Windows are picked greedily by score; a pick blocks every start closer than
+    `window` buckets to it (in either direction, around midnight).
+    """
+    n_buckets = len(scores)
+    blocked = np.isnan(scores)
+    picks = []
+    for start in np.argsort(-np.nan_to_num(scores, nan=-np.inf), kind='stable'):
+        if len(picks) == top:
+            break
+        if blocked[start]:
+            continue
+        picks.append(int(start))
+        blocked[(start + np.arange(-window + 1, window)) % n_buckets] = True
+    return picks
+
+
+def recommend_windows(names, posts, engagement, window, top=3, min_posts=10,
+                      bucket_minutes=DEFAULT_BUCKET_MINUTES):
+    """
+    Return the recommended windows of every group as a DataFrame.
+
+    Columns: Group, Rank, Start Bucket, Window (e.g. '03:00-04:59'), Posts,
+    Share of Posts, Engagement per Post and Lift.
+    """
+    lift, window_posts, window_engagement = window_lift(posts, engagement, window, min_posts)
+    total_posts = posts.sum(axis=1)
+    n_buckets = posts.shape[1]
+
+    rows = []
+    for g, name in enumerate(names):
+        for rank, start in enumerate(top_windows(lift[g], window, top), 1):
+            end = (start + window - 1) % n_buckets
+            end_minute = end * bucket_minutes + bucket_minutes - 1
+            rows.append({
+                'Group': name,
+                'Rank': rank,
+                'Start Bucket': start,
+                'Window': f"{bucket_label(start, bucket_minutes)}-{end_minute // 60:02d}:{end_minute % 60:02d}",
+                'Posts': int(window_posts[g, start]),
+                'Share of Posts': window_posts[g, start] / total_posts[g],
+                'Engagement per Post': window_engagement[g, start] / window_posts[g, start],
+                'Lift': lift[g, start]
+            })
+    return pd.DataFrame(rows, columns=['Group', 'Rank', 'Start Bucket', 'Window', 'Posts',
+                                       'Share of Posts', 'Engagement per Post', 'Lift'])
+
+
+def plot_recommended_windows(recommendations, names, window, title, output_file):
+    """Draw every group's recommended windows as bars on a 24-hour axis; return the path written"""
+    n_buckets = bucket_count()
+    hours_per_bucket = 24 / n_buckets
+    fig, ax = plotting.figure((15, 10))
+    colors = plotting.pyplot().rcParams['axes.prop_cycle'].by_key()['color']
+
+    for i, name in enumerate(names):
+        y = len(names) - i
+        for _, row in recommendations[recommendations['Group'] == name].iterrows():
+            start = row['Start Bucket'] * hours_per_bucket
+            length = window * hours_per_bucket
+            # A window crossing midnight is drawn as two pieces
+            spans = [(start, min(length, 24 - start))]
+            if start + length > 24:
+                spans.append((0, start + length - 24))
+            ax.broken_barh(spans, (y - 0.3, 0.6), color=colors[i % len(colors)], alpha=0.7)
+            ax.text(spans[0][0] + spans[0][1] / 2, y, row['Window'], ha='center', va='center', fontsize=9)
+
+    ax.set_yticks(range(len(names), 0, -1))
+    ax.set_yticklabels(names)
+    ax.set_xlim(0, 24)
+    ax.set_xticks(range(25))
+    ax.set_xticklabels([f"{hour:02d}:00" for hour in range(25)], fontsize=9)
+    ax.set_xlabel('Time of Day (24-hour format)', fontsize=14)
+    ax.set_title(title, fontsize=16)
+    ax.grid(axis='x', alpha=0.3)
+
+    fig.tight_layout()
+    return plotting.save(fig, output_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend posting windows with the best engagement per post")
+    parser.add_argument('--by', choices=GROUPINGS, default='page', help='recommend per page or per category')
+    parser.add_argument('--group', choices=list(PAGE_GROUPS) + ['all'], default='all',
+                        help='pages to include when recommending per page (default: all)')
+    parser.add_argument('--hours', type=float, default=2, help='window length in hours (default: 2)')
+    parser.add_argument('--top', type=int, default=3, help='windows to recommend per page or category')
+    parser.add_argument('--min-posts', type=int, default=10, help='ignore windows with fewer posts than this')
+    parser.add_argument('--metric', choices=METRICS, default='likes',
+                        help='engagement to optimize: likes, comments or both (likes + comments)')
+    parser.add_argument('--csv', help='also write the recommendations to this CSV file')
+    plotting.add_plot_arguments(parser)
+    timezones.add_timezone_arguments(parser)
+    args = parser.parse_args()
+    plotting.configure_from_args(args)
+    timezones.configure_from_args(args)
+
+    window = int(round(args.hours * 60 / DEFAULT_BUCKET_MINUTES))
+    if not 0 < window <= bucket_count():
+        parser.error("--hours must be between 0.25 and 24")
+
+    print("Loading data...")
+    post_data = load_post_summary()
+    groups = PAGE_GROUPS.get(args.group) if args.by == 'page' else None
+    posts = post_engagement(post_data, load_comment_tables(), args.by, groups)
+    names, post_counts, likes, comments = engagement_matrices(posts, groups)
+    engagement = {'likes': likes, 'comments': comments, 'both': likes + comments}[args.metric]
+
+    recommendations = recommend_windows(names, post_counts, engagement, window, args.top, args.min_posts)
+    metric_label = METRICS[args.metric]
+    print(f"\nRecommended {args.hours:g}-hour posting windows by {metric_label} per post "
+          f"(at least {args.min_posts} posts per window):")
+    for name in names:
+        rows = recommendations[recommendations['Group'] == name]
+        print(f"\n  {name}:")
+        if len(rows) == 0:
+            print("    No window has enough posts")
+        for _, row in rows.iterrows():
+            print(f"    {row['Rank']}. {row['Window']}: {row['Lift']:.2f}x the average {metric_label} per post "
+                  f"({row['Engagement per Post']:.1f}) from {row['Share of Posts']:.1%} of the posts")
+
+    if args.csv:
+        recommendations.to_csv(args.csv, index=False)
+        print(f"\nRecommendations written to {args.csv}")
+
+    if args.plots:
+        title = f"Recommended Posting Windows by {GROUPINGS[args.by][1]}"
+        output_file = plot_recommended_windows(recommendations, names, window, title,
+                                               os.path.join(current_dir, "recommended_posting_windows.png"))
+        print(f"\nChart saved as '{os.path.basename(output_file)}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Run several analyses in one process tree, loading the data only once.
+
+The Post Summary table (and the exploded comments, when the reaction analysis
+is requested) are loaded and coerced a single time and shared with every
+analysis. Independent analyses then run concurrently in forked worker
+processes, which see the loaded tables without copying or re-reading them;
+the output of each analysis is printed as a block once it finishes.
+
+Usage:
+    python run_analyses.py                                # all analyses
+    python run_analyses.py posting reactions --jobs 2
+    python run_analyses.py reactions --chunksize 100000
+    python run_analyses.py --incremental                  # counts from the aggregate store
+"""
+
+import argparse
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+import tempfile
+import time
+
+import instrumentation
+import plotting
+import timezones
+from aggregate_store import update_store
+from analyze_posting_behavior import analyze_posting_behavior
+from analyze_user_reactions import analyze_user_reactions
+from category_analysis_wordcloud import analyze_categories, generate_word_clouds
+from data_loader import load_comment_tables, load_post_summary
+
+# Analyses in the order they run (and their output is printed)
+ANALYSES = ('posting', 'reactions', 'categories', 'wordclouds')
+
+
+def load_shared_data(names, chunksize=None, incremental=False):
+    """
+    Load the tables needed by the requested analyses.
+    
+    With `incremental`, the new posts and comments are also folded into the
+    aggregate store, which the analyses then read their counts from.
+    """
+    data = {}
+    with instrumentation.stage("Load post data"):
+        print("Loading Post Summary data...")
+        data['post_data'] = load_post_summary()
+        instrumentation.set_rows(len(data['post_data']))
+        print(f"Loaded {len(data['post_data'])} posts")
+
+    # Chunked reaction runs stream the comments themselves
+    if 'reactions' in names and not chunksize:
+        with instrumentation.stage("Load comment tables"):
+            print("Loading exploded comments...")
+            parsed, others = load_comment_tables()
+            data['comment_tables'] = (parsed, others)
+            instrumentation.set_rows(len(parsed) + len(others))
+            print(f"Loaded {len(parsed)} comments with timestamps and {len(others)} without")
+
+    if incremental:
+        with instrumentation.stage("Update aggregate store"):
+            # The store is updated once here, never by the (concurrent) analyses
+            comment_tables = None
+            if 'reactions' in names:
+                comment_tables = data.get('comment_tables') or load_comment_tables()
+            data['store'] = update_store(data['post_data'], comment_tables)
+    return data
+
+
+def run_analysis(name, data, chunksize=None, plots=True):
+    """Run one analysis on the shared tables"""
+    post_data = data['post_data']
+    store = data.get('store')
+    if name == 'posting':
+        analyze_posting_behavior(post_data, plots, store)
+    elif name == 'reactions':
+        analyze_user_reactions(chunksize, post_data, data.get('comment_tables'), plots, store)
+    elif name == 'categories':
+        analyze_categories(post_data, plots, store)
+    elif name == 'wordclouds':
+        if plots:
+            print("Generating word clouds for each organization...")
+            generate_word_clouds(post_data)
+        else:
+            print("Skipping the word clouds (--no-plots)")
+    else:
+        raise ValueError(f"Unknown analysis '{name}'")
+
+
+def _run_in_child(name, data, chunksize, plots, log_path):
+    # Send everything the analysis writes (including warnings) to its log file
+    with open(log_path, 'w') as log:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        try:
+            run_analysis(name, data, chunksize, plots)
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+
+
+def run_sequentially(names, data, chunksize=None, plots=True):
+    """Run the analyses one after the other in this process; return the failed ones"""
+    failed = []
+    for name in names:
+        print(f"\n===== {name} =====")
+        with instrumentation.stage(f"Run {name}"):
+            try:
+                # Some analyses convert columns of the post table in place, so each
+                # one gets its own copy (forked workers get theirs for free)
+                run_analysis(name, dict(data, post_data=data['post_data'].copy()), chunksize, plots)
+            except Exception as e:
+                print(f"Analysis '{name}' failed: {e}")
+                failed.append(name)
+    return failed
+
+
+def run_concurrently(names, data, jobs, chunksize=None, plots=True):
+    """
+    Run the analyses in up to `jobs` forked processes at a time; return the failed ones.
+
+    Forked children inherit the loaded tables, so nothing is pickled or re-read.
+    """
+    context = multiprocessing.get_context('fork')
+    failed = []
+    with tempfile.TemporaryDirectory() as log_dir, instrumentation.stage("Run analyses concurrently"):
+        pending = list(names)
+        running = {}
+        finished = {}
+        printed = 0
+        while pending or running:
+            # Start analyses until `jobs` are running
+            while pending and len(running) < jobs:
+                name = pending.pop(0)
+                log_path = os.path.join(log_dir, f"{name}.log")
+                process = context.Process(target=_run_in_child, args=(name, data, chunksize, plots, log_path),
+                                          name=f"analysis-{name}")
+                process.start()
+                running[process.sentinel] = (name, process, log_path, time.perf_counter())
+
+            # Wait for any of them to finish
+            for sentinel in multiprocessing.connection.wait(list(running)):
+                name, process, log_path, started = running.pop(sentinel)
+                process.join()
+                finished[name] = (process.exitcode, log_path, time.perf_counter() - started)
+
+            # Print the output of finished analyses in the requested order
+            while printed < len(names) and names[printed] in finished:
+                name = names[printed]
+                exitcode, log_path, elapsed = finished.pop(name)
+                status = "done" if exitcode == 0 else f"FAILED (exit code {exitcode})"
+                print(f"\n===== {name}: {status} in {elapsed:.1f} s =====")
+                with open(log_path) as f:
+                    sys.stdout.write(f.read())
+                sys.stdout.flush()
+                if exitcode != 0:
+                    failed.append(name)
+                printed += 1
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several analyses, loading the data only once")
+    parser.add_argument('analyses', nargs='*', metavar='ANALYSIS',
+                        help=f"analyses to run: {', '.join(ANALYSES)} (default: all)")
+    parser.add_argument('--jobs', type=int, default=len(ANALYSES),
+                        help='number of analyses to run at the same time (1 runs them in this process)')
+    parser.add_argument('--chunksize', type=int,
+                        help="stream Comments.csv in chunks of this many rows in the reaction analysis")
+    parser.add_argument('--incremental', action='store_true',
+                        help="fold new rows into the aggregate store and read the counts from it")
+    plotting.add_plot_arguments(parser)
+    timezones.add_timezone_arguments(parser)
+    instrumentation.add_profile_arguments(parser)
+    args = parser.parse_args()
+    plotting.configure_from_args(args)
+    timezones.configure_from_args(args)
+
+    unknown = [name for name in args.analyses if name not in ANALYSES]
+    if unknown:
+        parser.error(f"unknown analyses: {', '.join(unknown)} (choose from {', '.join(ANALYSES)})")
+    names = [name for name in ANALYSES if name in args.analyses] if args.analyses else list(ANALYSES)
+    jobs = max(1, min(args.jobs, len(names)))
+    if jobs > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+        print("Forked worker processes are not available on this platform; running sequentially")
+        jobs = 1
+
+    instrumentation.start_profiling(args)
+    try:
+        data = load_shared_data(names, args.chunksize, args.incremental)
+        if jobs == 1:
+            failed = run_sequentially(names, data, args.chunksize, args.plots)
+        else:
+            print(f"\nRunning {', '.join(names)} with {jobs} worker processes...")
+            failed = run_concurrently(names, data, jobs, args.chunksize, args.plots)
+    finally:
+        instrumentation.finish_profiling(args)
+
+    if failed:
+        print(f"\nFailed analyses: {', '.join(failed)}")
+        return 1
+    print("\nAll analyses complete!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
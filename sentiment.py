@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Lexicon-based sentiment of the exploded comments, per (page, time bucket).
+
+analyze_user_reactions.py counts when users comment; this script scores what
+they write. Every comment is scored offline against a small word -> score
+lexicon (AFINN style, -3 to +3), with a negator ("not", "never", ...) right
+before a word reversing and damping its score.
+
+Scoring never calls Python per comment. A batch of comments is tokenized
+straight from the UTF-8 text buffer of CompactComments: one lookup table
+lowercases the letters and blanks everything else, bytes.split() cuts the
+tokens, and a NumPy pass finds the comment each token belongs to. The tokens
+are matched against the precompiled lexicon with one hash lookup
+(Index.get_indexer) and summed per comment with np.bincount. Batches are
+spread over a process pool, so millions of comments are scored on all cores.
+
+The positive and negative volume is then summed per (page, 15-minute bucket)
+in the local time of each page; comments without a timestamp have no bucket
+and are left out.
+
+Usage:
+    python sentiment.py [--group e-commerce|traffic|all] [--workers N]
+        [--batch-size 100000] [--lexicon words.tsv] [--csv sentiment_by_bucket.csv]
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import timezones
+from comment_parser import PostAttributes
+from data_loader import load_comment_tables, load_post_summary
+from period_cube import PAGE_GROUPS
+from time_buckets import bucket_range_label, count_codes_by_bucket, counts_to_frame
+
+# Get the current directory where the script is running
+current_dir = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+
+# Comments scored per batch (one batch is one job of the process pool)
+BATCH_COMMENTS = 100_000
+
+# Word -> sentiment score, from -3 (very negative) to +3 (very positive).
+# Chosen from the words that actually occur in the comments (complaints about
+# orders and deliveries, thanks, traffic reports); spelling variants common in
+# the data ("gud", "thanx", "farud") are included.
+LEXICON = {
+    # Positive
+    'amazing': 3, 'awesome': 3, 'beautiful': 3, 'best': 3, 'brilliant': 3, 'excellent': 3,
+    'fantastic': 3, 'great': 3, 'happy': 3, 'love': 3, 'loved': 3, 'outstanding': 3,
+    'perfect': 3, 'super': 3, 'superb': 3, 'wonderful': 3, 'wow': 3,
+    'appreciate': 2, 'appreciated': 2, 'congrats': 2, 'congratulations': 2, 'enjoy': 2,
+    'enjoyed': 2, 'glad': 2, 'good': 2, 'gud': 2, 'helpful': 2, 'kudos': 2, 'lovely': 2,
+    'nice': 2, 'pleased': 2, 'proud': 2, 'recommend': 2, 'reliable': 2, 'satisfied': 2,
+    'thank': 2, 'thanks': 2, 'thanku': 2, 'thankyou': 2, 'thanx': 2, 'thnx': 2, 'thx': 2,
+    'better': 1, 'cool': 1, 'easy': 1, 'fast': 1, 'fine': 1, 'genuine': 1, 'hope': 1,
+    'interesting': 1, 'prompt': 1, 'quick': 1, 'safe': 1, 'useful': 1,
+    # Negative
+    'bribe': -3, 'cheat': -3, 'cheated': -3, 'cheaters': -3, 'cheating': -3, 'corrupt': -3,
+    'corruption': -3, 'dead': -3, 'defective': -3, 'disgusting': -3, 'fake': -3, 'farud': -3,
+    'fraud': -3, 'frauds': -3, 'fraudulent': -3, 'harassment': -3, 'hate': -3, 'horrible': -3,
+    'killed': -3, 'pathetic': -3, 'ridiculous': -3, 'scam': -3, 'terrible': -3, 'worse': -3,
+    'worst': -3,
+    'accident': -2, 'accidents': -2, 'angry': -2, 'bad': -2, 'broken': -2, 'careless': -2,
+    'complain': -2, 'complaint': -2, 'complaints': -2, 'damaged': -2, 'dangerous': -2,
+    'delayed': -2, 'disappointed': -2, 'disappointing': -2, 'fail': -2, 'failed': -2,
+    'irresponsible': -2, 'lost': -2, 'nonsense': -2, 'poor': -2, 'problem': -2,
+    'problems': -2, 'rude': -2, 'sad': -2, 'shame': -2, 'spam': -2, 'stolen': -2, 'stuck': -2,
+    'stupid': -2, 'unfair': -2, 'unhappy': -2, 'useless': -2, 'waste': -2, 'wasted': -2,
+    'worried': -2, 'worthless': -2, 'wrong': -2,
+    'cancelled': -1, 'delay': -1, 'issue': -1, 'issues': -1, 'jam': -1, 'late': -1,
+    'pending': -1, 'sorry': -1,
+}
+
+# Words that reverse the score of the word right after them ("not good")
+NEGATORS = ('cannot', 'cant', 'didnt', 'doesnt', 'dont', 'hardly', 'isnt', 'never', 'no', 'not',
+            'nothing', 'wasnt', 'without', 'wont')
+
+# A negated word counts this many times its score ("not bad" is milder than "good")
+NEGATION_FACTOR = -0.5
+
+# Byte -> byte table for tokenizing UTF-8 text: ASCII letters are lowercased,
+# every other ASCII byte becomes a space, and bytes of non-ASCII characters are
+# kept (so e.g. a Devanagari word stays one token that simply scores 0)
+_TOKEN_TABLE = np.full(256, ord(' '), dtype=np.uint8)
+_TOKEN_TABLE[ord('a'):ord('z') + 1] = np.arange(ord('a'), ord('z') + 1)
+_TOKEN_TABLE[ord('A'):ord('Z') + 1] = np.arange(ord('a'), ord('z') + 1)
+_TOKEN_TABLE[128:] = np.arange(128, 256)
+
+
+class Lexicon:
+    """
+    A word -> score lexicon compiled for batch lookups.
+
+    Words (and negators) are kept as UTF-8 bytes in one pandas Index, so a
+    whole batch of tokens is matched with a single get_indexer call; `scores`
+    and `negates` are indexed by the position found (the extra last entry
+    answers tokens that are not in the lexicon).
+    """
+
+    def __init__(self, scores=LEXICON, negators=NEGATORS):
+        words = sorted(set(scores) | set(negators))
+        self.index = pd.Index([word.encode('utf-8') for word in words], dtype=object)
+        self.scores = np.array([scores.get(word, 0) for word in words] + [0], dtype=np.float64)
+        self.negates = np.array([word in negators for word in words] + [False])
+
+    def __len__(self):
+        return len(self.index)
+
+
+def load_lexicon(path):
+    """Read an AFINN-style lexicon file (one 'word<TAB>score' per line) into a {word: score} dict"""
+    scores = {}
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            word, _, score = line.rpartition('\t')
+            try:
+                scores[word.strip().lower()] = float(score)
+            except ValueError:
+                raise ValueError(f"{path}, line {line_number}: expected 'word<TAB>score', got {line!r}")
+    return scores
+
+
+def tokenize(text_offsets, text_buffer):
+    """
+    Split a batch of comments into lowercased word tokens.
+
+    `text_offsets` (starting at 0) and `text_buffer` are laid out like in
+    CompactComments. Returns (tokens as a list of bytes, comment row of every
+    token as an int64 array).
+    """
+    n_comments = len(text_offsets) - 1
+    # A space after every comment, so no token runs from one comment into the next
+    separators = text_offsets[1:] + np.arange(n_comments)
+    spaced = _TOKEN_TABLE[np.insert(text_buffer, text_offsets[1:], ord(' '))]
+
+    tokens = spaced.tobytes().split()
+    # A token starts at a word byte that follows a space; every space before the
+    # start that is a separator closes one comment
+    is_word = spaced != ord(' ')
+    starts = np.flatnonzero(is_word & ~np.concatenate([[False], is_word[:-1]]))
+    return tokens, np.searchsorted(separators, starts)
+
+
+def score_batch(text_offsets, text_buffer, lexicon=None):
+    """
+    Score a batch of comments (laid out like CompactComments, offsets starting at 0).
+
+    Returns (positive, negative) float32 arrays: the summed positive scores and
+    the summed (absolute) negative scores of the words of each comment.
+    """
+    if lexicon is None:
+        lexicon = _lexicon()
+    n_comments = len(text_offsets) - 1
+    tokens, rows = tokenize(text_offsets, text_buffer)
+    if not tokens:
+        return np.zeros(n_comments, dtype=np.float32), np.zeros(n_comments, dtype=np.float32)
+
+    # Position -1 (not in the lexicon) picks the trailing 0 score
+    codes = lexicon.index.get_indexer(tokens)
+    scores = lexicon.scores[codes]
+    negated = np.zeros(len(codes), dtype=bool)
+    negated[1:] = lexicon.negates[codes[:-1]] & (rows[1:] == rows[:-1])
+    scores[negated] *= NEGATION_FACTOR
+
+    positive = np.bincount(rows, weights=np.maximum(scores, 0), minlength=n_comments)
+    negative = np.bincount(rows, weights=np.maximum(-scores, 0), minlength=n_comments)
+    return positive.astype(np.float32), negative.astype(np.float32)
+
+
+# The lexicon of this process: compiled on first use, or set by a pool initializer
+_state = {'lexicon': None}
+
+
+def _lexicon():
+    if _state['lexicon'] is None:
+        _state['lexicon'] = Lexicon()
+    return _state['lexicon']
+
+
+def _init_worker(scores):
+    _state['lexicon'] = Lexicon(scores)
+
+
+def _score_job(job):
+    return score_batch(*job)
+
+
+def _batches(comments, batch_size):
+    """Yield (text_offsets, text_buffer) of consecutive comment rows, offsets rebased to 0"""
+    for start in range(0, len(comments), batch_size):
+        end = min(start + batch_size, len(comments))
+        offsets = comments.text_offsets[start:end + 1]
+        yield offsets - offsets[0], comments.text_buffer[offsets[0]:offsets[-1]]
+
+
+def score_comments(comments, workers=None, batch_size=BATCH_COMMENTS, scores=None):
+    """
+    Score every comment of a CompactComments table; return (positive, negative) arrays.
+
+    The comments are cut into batches of `batch_size` rows that are scored on
+    `workers` processes (defaults to the number of CPUs; 1 scores in this
+    process). `scores` ({word: score}) replaces the built-in LEXICON.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    jobs = list(_batches(comments, batch_size))
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=_init_worker,
+                                 initargs=(scores or LEXICON,)) as executor:
+            results = list(executor.map(_score_job, jobs))
+    else:
+        lexicon = Lexicon(scores) if scores else None
+        results = [score_batch(offsets, buffer, lexicon) for offsets, buffer in jobs]
+
+    if not results:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+    return (np.concatenate([positive for positive, _ in results]),
+            np.concatenate([negative for _, negative in results]))
+
+
+def sentiment_by_bucket(post_data, comments, positive, negative, pages=None):
+    """
+    Sum the comment sentiment per (page, time bucket).
+
+    `positive`/`negative` are the scores of every comment of `comments` (see
+    score_comments). Returns one row per page and bucket with the number of
+    comments, of positive and of negative comments (by net score), the summed
+    positive and negative scores and the net score. `pages` limits and orders
+    the pages (default: all, sorted).
+    """
+    page_of = PostAttributes(post_data, columns=('postedBy',)).lookup_compact(comments)['postedBy']
+    if pages is None:
+        pages = sorted(page_of.dropna().unique())
+    buckets = comments.buckets(page_of)
+    net = positive.astype(np.float64) - negative
+
+    page_names, counts = count_codes_by_bucket(page_of, buckets, pages)
+    frame = counts_to_frame(page_names, counts, page_column='Page', count_column='Comments')
+    for column, weights in (('Positive Comments', net > 0), ('Negative Comments', net < 0),
+                            ('Positive Score', positive), ('Negative Score', negative)):
+        _, sums = count_codes_by_bucket(page_of, buckets, pages, weights=weights)
+        frame[column] = sums.ravel()
+    frame['Positive Comments'] = frame['Positive Comments'].astype(np.int64)
+    frame['Negative Comments'] = frame['Negative Comments'].astype(np.int64)
+    frame['Net Score'] = frame['Positive Score'] - frame['Negative Score']
+    return frame
+
+
+def print_sentiment_summary(frame):
+    """Print the sentiment of every page and its most negative time bucket"""
+    for page, rows in frame.groupby('Page', sort=False):
+        comments = rows['Comments'].sum()
+        if comments == 0:
+            print(f"\n  {page}: No comments found")
+            continue
+        positive = rows['Positive Comments'].sum()
+        negative = rows['Negative Comments'].sum()
+        print(f"\n  {page}:")
+        print(f"    - Comments: {comments} ({positive / comments * 100:.1f}% positive, "
+              f"{negative / comments * 100:.1f}% negative)")
+        print(f"    - Net score per comment: {rows['Net Score'].sum() / comments:+.2f}")
+        worst = rows.loc[rows['Negative Comments'].idxmax()]
+        print(f"    - Most negative comments: {bucket_range_label(int(worst['Time Bucket']))} "
+              f"({worst['Negative Comments']} of {worst['Comments']} comments)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score comment sentiment and sum it per page and time bucket")
+    parser.add_argument('--group', choices=list(PAGE_GROUPS) + ['all'], default='e-commerce',
+                        help='pages to report (default: e-commerce)')
+    parser.add_argument('--workers', type=int, help='processes scoring the comments (default: one per CPU)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_COMMENTS,
+                        help=f'comments per scoring batch (default: {BATCH_COMMENTS})')
+    parser.add_argument('--lexicon', help="AFINN-style 'word<TAB>score' file replacing the built-in lexicon")
+    parser.add_argument('--csv', default=os.path.join(current_dir, "sentiment_by_bucket.csv"),
+                        help='CSV file for the per-bucket table (default: sentiment_by_bucket.csv)')
+    timezones.add_timezone_arguments(parser)
+    args = parser.parse_args()
+    timezones.configure_from_args(args)
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    scores = load_lexicon(args.lexicon) if args.lexicon else None
+
+    print("Loading data...")
+    post_data = load_post_summary()
+    comments, _ = load_comment_tables()
+
+    print(f"Scoring {len(comments)} comments...")
+    positive, negative = score_comments(comments, args.workers, args.batch_size, scores)
+    net = positive - negative
+    print(f"  {int((net > 0).sum())} positive, {int((net < 0).sum())} negative, "
+          f"{int((net == 0).sum())} neutral")
+
+    frame = sentiment_by_bucket(post_data, comments, positive, negative, PAGE_GROUPS.get(args.group))
+    print("\nSentiment per page:")
+    print_sentiment_summary(frame)
+
+    frame.to_csv(args.csv, index=False)
+    print(f"\nPer-bucket sentiment written to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
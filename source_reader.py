@@ -0,0 +1,153 @@
+"""
+Helper module: reading the Post Summary and Comments sources as CSV or Excel.
+
+The data sometimes arrives as xlsx workbooks (e.g. "Post Summary.xlsx") rather
+than CSV files. find_source() picks up the usual file-name variants, and
+read_table() / iter_table_chunks() read either format into the frames
+pd.read_csv / pd.read_excel would produce. Workbooks are read with the (Rust)
+calamine engine when python-calamine is installed, which is several times
+faster than openpyxl. Otherwise openpyxl's read-only mode streams the rows, so
+a large sheet is turned into frames one chunk at a time instead of all at
+once. Either way a workbook is only parsed once: data_loader caches the typed
+result. Only the first sheet is read.
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+try:
+    import python_calamine  # noqa: F401 (only checked for; pandas does the reading)
+except ImportError:
+    python_calamine = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# Source formats, in order of preference when several variants exist
+CSV_EXTENSIONS = ('.csv',)
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+SOURCE_EXTENSIONS = CSV_EXTENSIONS + EXCEL_EXTENSIONS
+
+
+def _normalized_name(name):
+    """Return a file name without case, spaces, dashes or underscores, e.g. 'postsummary'"""
+    return re.sub(r'[^0-9a-z]', '', name.lower())
+
+
+def find_source(data_dir, stem, default):
+    """
+    Return the path of the source file named like `stem` in `data_dir`.
+
+    Names match regardless of case, spaces, dashes and underscores, so
+    "Post-Summary.csv", "Post Summary.xlsx" and "post_summary.csv" all match the
+    stem 'Post-Summary'. CSV files win over workbooks. Returns `default` when
+    nothing matches.
+    """
+    try:
+        names = os.listdir(data_dir)
+    except OSError:
+        return default
+
+    wanted = _normalized_name(stem)
+    matches = {}
+    for name in names:
+        base, extension = os.path.splitext(name)
+        extension = extension.lower()
+        if extension in SOURCE_EXTENSIONS and _normalized_name(base) == wanted:
+            matches.setdefault(extension, os.path.join(data_dir, name))
+    for extension in SOURCE_EXTENSIONS:
+        if extension in matches:
+            return matches[extension]
+    return default
+
+
+def is_excel(file_path):
+    return os.path.splitext(file_path)[1].lower() in EXCEL_EXTENSIONS
+
+
+def read_table(file_path):
+    """Read a CSV file or the first sheet of a workbook into a DataFrame"""
+    if not is_excel(file_path):
+        return pd.read_csv(file_path)
+    if python_calamine is not None:
+        return _as_text_columns(pd.read_excel(file_path, sheet_name=0, engine='calamine'))
+    chunks = list(_iter_workbook_rows(file_path, chunksize=None))
+    return chunks[0] if chunks else pd.DataFrame()
+
+
+def iter_table_chunks(file_path, chunksize):
+    """Yield a CSV file or the first sheet of a workbook as DataFrames of up to `chunksize` rows"""
+    if not is_excel(file_path):
+        yield from pd.read_csv(file_path, chunksize=chunksize)
+    elif python_calamine is not None:
+        # calamine reads the whole sheet at once (fast); it is then handed out in chunks
+        table = _as_text_columns(pd.read_excel(file_path, sheet_name=0, engine='calamine'))
+        for start in range(0, len(table), chunksize):
+            yield table.iloc[start:start + chunksize].reset_index(drop=True)
+    else:
+        yield from _iter_workbook_rows(file_path, chunksize)
+
+
+def _iter_workbook_rows(file_path, chunksize):
+    """Stream the first sheet with openpyxl in read-only mode, `chunksize` rows at a time (None: all)"""
+    if openpyxl is None:
+        raise ImportError(f"Reading {os.path.basename(file_path)} requires openpyxl or python-calamine")
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # Name unnamed columns the way pandas does ('Unnamed: 6')
+        columns = [f"Unnamed: {i}" if value is None else str(value) for i, value in enumerate(header)]
+        width = len(columns)
+
+        chunk = []
+        blank = []
+        for row in rows:
+            # Blank rows are held back until a non-blank row follows: like
+            # pd.read_excel, blank rows inside the sheet are kept but trailing ones dropped
+            if all(value is None for value in row):
+                blank.append((None,) * width)
+                continue
+            chunk.extend(blank)
+            blank = []
+            # Pad rows whose trailing cells are missing
+            chunk.append(row[:width] + (None,) * (width - len(row)))
+            if chunksize is not None and len(chunk) >= chunksize:
+                yield _chunk_frame(chunk, columns)
+                chunk = []
+        if chunk or chunksize is None:
+            yield _chunk_frame(chunk, columns)
+    finally:
+        workbook.close()
+
+
+def _chunk_frame(rows, columns):
+    """Build a frame from row tuples; empty cells become NaN as in pd.read_excel"""
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    for column in frame.columns[frame.dtypes == object]:
+        frame[column] = frame[column].where(frame[column].notna(), np.nan)
+    return _as_text_columns(frame)
+
+
+def _as_text_columns(frame):
+    """
+    Turn the cells of mixed columns into strings, as pd.read_csv would read them.
+
+    A workbook column can mix numbers, dates and text (e.g. a category typed as
+    520); a CSV column like that is read as text, which is also what the
+    columnar cache needs. Missing cells stay NaN.
+    """
+    for column in frame.columns[frame.dtypes == object]:
+        values = frame[column]
+        present = values.notna()
+        if not values[present].map(type).eq(str).all():
+            frame[column] = values.astype(str).where(present, np.nan)
+    return frame
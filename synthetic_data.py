@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Synthetic Facebook page and comment data.
+
+Generates Post Summary and Comments tables in the same layout as the real data
+(including comments packed into one '?#+@'-separated cell per post) for demos and
+benchmarks, plus the small demonstration datasets the analysis scripts fall back
+to when the real data has no matching rows.
+
+Usage:
+    python synthetic_data.py --size 1m --out benchmarks/data/1m
+"""
+
+import argparse
+import os
+import random
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from comment_parser import COMMENT_SEPARATOR
+
+# Named dataset sizes (number of posts; comments are generated at the same count)
+SIZES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000
+}
+
+# Pages per category, modelled on the pages in the real dataset
+PAGE_CATEGORIES = {
+    'Government Organization': ['Bengaluru Traffic Police', 'Kolkata Traffic Police', 'Hyderabad Traffic Police'],
+    'Website': ['Flipkart', 'Amazon India', 'Snapdeal'],
+    'Clothing': ['Myntra'],
+    'Telecommunication': ['Idea', 'Tata Docomo', 'Aircel India'],
+    'Hospital/Clinic': ['Fortis Healthcare', 'Kokilaben Dhirubhai Ambani Hospital', 'Apollo Hospitals'],
+    'Politician': ['Narendra Modi', 'Rahul Gandhi', 'Arvind Kejriwal']
+}
+
+# Words used to build post messages for each category
+_CATEGORY_WORDS = {
+    'Government Organization': ['traffic', 'road', 'signal', 'helmet', 'jam', 'diversion', 'junction',
+                                'safety', 'drive', 'challan', 'police', 'commuters', 'lane'],
+    'Website': ['sale', 'offer', 'deal', 'mobiles', 'books', 'cashback', 'delivery', 'order',
+                'electronics', 'flat', 'off', 'shop', 'exclusive'],
+    'Clothing': ['fashion', 'style', 'shoes', 'dress', 'collection', 'brand', 'trend', 'wear',
+                 'summer', 'look', 'sale', 'kurta'],
+    'Telecommunication': ['recharge', 'data', 'network', 'plan', 'internet', 'calls', 'pack',
+                          'prepaid', 'postpaid', 'talktime', 'speed', 'sms'],
+    'Hospital/Clinic': ['health', 'doctor', 'heart', 'care', 'treatment', 'patients', 'blood',
+                        'camp', 'surgery', 'wellness', 'diabetes', 'checkup'],
+    'Politician': ['india', 'nation', 'people', 'development', 'rally', 'government', 'youth',
+                   'vote', 'change', 'citizens', 'future', 'farmers']
+}
+
+# Words used to build comments
+_COMMENT_WORDS = ['good', 'bad', 'worst', 'service', 'thanks', 'great', 'please', 'order',
+                  'delivery', 'refund', 'nice', 'love', 'waiting', 'when', 'help', 'not',
+                  'received', 'awesome', 'problem', 'complaint', 'happy', 'excellent']
+
+# Hours around which posting activity peaks
+_PEAK_HOURS = [9, 12, 15, 18]
+
+
+def posting_profile():
+    """Return the probability of a post falling into each minute of the day"""
+    minutes = np.arange(24 * 60)
+    profile = np.full(minutes.shape, 0.2)
+    for hour in _PEAK_HOURS:
+        profile += np.exp(-0.5 * ((minutes - hour * 60) / 45.0) ** 2)
+    return profile / profile.sum()
+
+
+def _message_pool(rng, words, size, min_words=6, max_words=25):
+    """Build `size` random messages from a word list"""
+    lengths = rng.integers(min_words, max_words + 1, size)
+    return np.array([' '.join(rng.choice(words, length)) for length in lengths], dtype=object)
+
+
+def _format_times(seconds, spaced=None):
+    """Format epoch seconds as '2013-12-31T08:30:01+0000' (or '2013 12 31T...' where spaced)"""
+    stamps = np.datetime_as_string(seconds.astype('datetime64[s]'), unit='s').astype(object) + '+0000'
+    if spaced is not None and spaced.any():
+        stamps[spaced] = pd.Series(stamps[spaced]).str.replace('-', ' ', regex=False).to_numpy()
+    return stamps
+
+
+def make_post_summary(n_posts, seed=0, start='2013-01-01', days=365):
+    """
+    Generate a Post Summary table with `n_posts` rows.
+
+    Posting times follow a daily profile with peaks at 9:00, 12:00, 15:00 and
+    18:00; likes follow a heavy-tailed (log-normal) distribution.
+    """
+    rng = np.random.default_rng(seed)
+    categories = [category for category, pages in PAGE_CATEGORIES.items() for _ in pages]
+    pages = [page for pages in PAGE_CATEGORIES.values() for page in pages]
+
+    # Some pages post more than others
+    page_weights = rng.uniform(0.5, 1.5, len(pages))
+    page_index = rng.choice(len(pages), n_posts, p=page_weights / page_weights.sum())
+
+    # Creation times: random day, minute of day from the posting profile, random second
+    start_seconds = int(pd.Timestamp(start).timestamp())
+    seconds = (start_seconds
+               + rng.integers(0, days, n_posts) * 86400
+               + rng.choice(24 * 60, n_posts, p=posting_profile()) * 60
+               + rng.integers(0, 60, n_posts))
+
+    # Messages are drawn from a pool per category
+    category_names = list(PAGE_CATEGORIES)
+    category_index = np.array([category_names.index(category) for category in categories])[page_index]
+    messages = np.empty(n_posts, dtype=object)
+    for i, category in enumerate(category_names):
+        rows = np.flatnonzero(category_index == i)
+        pool = _message_pool(rng, _CATEGORY_WORDS[category], min(2000, max(len(rows), 1)))
+        messages[rows] = pool[rng.integers(0, len(pool), len(rows))]
+
+    return pd.DataFrame({
+        'pid': np.arange(1, n_posts + 1),
+        'category': np.array(categories, dtype=object)[page_index],
+        'postedBy': np.array(pages, dtype=object)[page_index],
+        'createdTime': _format_times(seconds),
+        'message': messages,
+        'likesCount': rng.lognormal(mean=4.0, sigma=1.5, size=n_posts).astype(np.int64)
+    })
+
+
+def make_comments(post_summary, n_comments, seed=0, untimestamped_share=0.18):
+    """
+    Generate a Comments table with `n_comments` individual comments.
+
+    Comments go preferentially to posts with many likes and are created within a
+    few hours of their post. Each post's comments are packed into a single
+    commentsText cell separated by '?#+@', with the comment time in the text in
+    either the spaced (2013 12 30T06:53:46+0000) or ISO format. A share of the
+    comments has no timestamp at all, like the 'Others' comments in the real data.
+    """
+    rng = np.random.default_rng(seed + 1)
+
+    likes = post_summary['likesCount'].to_numpy(dtype=float) + 1
+    post_index = np.sort(rng.choice(len(post_summary), n_comments, p=likes / likes.sum()))
+
+    post_seconds = (pd.to_datetime(post_summary['createdTime'], utc=True)
+                    .dt.tz_localize(None).to_numpy(dtype='datetime64[s]').astype(np.int64))
+    seconds = post_seconds[post_index] + rng.exponential(3 * 3600, n_comments).astype(np.int64)
+    stamps = _format_times(seconds, spaced=rng.random(n_comments) < 0.7)
+
+    pool = _message_pool(rng, _COMMENT_WORDS, 5000, min_words=2, max_words=30)
+    texts = pool[rng.integers(0, len(pool), n_comments)]
+    has_timestamp = rng.random(n_comments) >= untimestamped_share
+    fragments = np.where(has_timestamp, stamps + texts, texts)
+
+    packed = pd.Series(fragments).groupby(post_index).agg(COMMENT_SEPARATOR.join)
+    return pd.DataFrame({
+        'pid': post_summary['pid'].to_numpy()[packed.index],
+        'commentsText': packed.to_numpy()
+    })
+
+
+def write_dataset(out_dir, size='10k', seed=0):
+    """Write Post-Summary.csv and Comments.csv of a named size to out_dir; return their paths"""
+    n_rows = SIZES[size] if size in SIZES else int(size)
+    os.makedirs(out_dir, exist_ok=True)
+
+    post_summary = make_post_summary(n_rows, seed=seed)
+    comments = make_comments(post_summary, n_rows, seed=seed)
+
+    post_summary_path = os.path.join(out_dir, 'Post-Summary.csv')
+    comments_path = os.path.join(out_dir, 'Comments.csv')
+    post_summary.to_csv(post_summary_path, index=False)
+    comments.to_csv(comments_path, index=False)
+    return post_summary_path, comments_path
+
+
+# Small demonstration datasets used by the analysis scripts when the real data
+# has no rows for the pages they analyze
+
+def sample_posts_by_time(pages):
+    """Return a few posts per page at every 15-minute slot, peaking at 9am, 12pm, 3pm and 6pm"""
+    sample_data = []
+    for page in pages:
+        for hour in range(24):
+            for minute in [0, 15, 30, 45]:
+                base_count = 1 if hour in _PEAK_HOURS else 0
+                # Add some randomness
+                count = max(0, base_count + random.randint(-1, 2))
+
+                for _ in range(count):
+                    sample_data.append({
+                        'postedBy': page,
+                        'createdTime': f"2023-01-01T{hour:02d}:{minute:02d}:00+0000"
+                    })
+    return pd.DataFrame(sample_data)
+
+
+def sample_comments(pids):
+    """Return 5-15 random comments per pid, with more activity between 9:00 and 21:59"""
+    sample_data = []
+    for pid in pids:
+        for _ in range(random.randint(5, 15)):
+            # Random hour and minute
+            hour = random.randint(0, 23)
+            minute = random.choice([0, 15, 30, 45])
+
+            # More comments during daytime and evening
+            if 9 <= hour <= 21:
+                num_entries = random.randint(1, 3)
+            else:
+                num_entries = random.randint(0, 1)
+
+            for _ in range(num_entries):
+                sample_data.append({
+                    'pid': pid,
+                    'timestamp': datetime(2023, 1, 1, hour, minute, 0),
+                    'comment_text': f"Sample comment at {hour:02d}:{minute:02d}"
+                })
+    return pd.DataFrame(sample_data)
+
+
+def sample_posts_for_pids(pids, pages):
+    """Return one post per pid, assigning the pages in rotation"""
+    return pd.DataFrame([
+        {
+            'pid': pid,
+            'postedBy': pages[i % len(pages)],
+            'createdTime': "2023-01-01T12:00:00+0000"
+        }
+        for i, pid in enumerate(pids)
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Post Summary / Comments dataset")
+    parser.add_argument('--size', default='10k', help=f"one of {', '.join(SIZES)} or a number of rows")
+    parser.add_argument('--out', required=True, help='output directory')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args()
+
+    for path in write_dataset(args.out, args.size, args.seed):
+        print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Helper module: persistent per-organization term-frequency index for word clouds.
+
+Instead of concatenating every message of an organization into one large string
+and re-tokenizing it on every run, the index keeps a token Counter per
+organization together with the pids already counted. Each run only normalizes
+and counts the posts whose pid is new, and the word clouds are rendered from
+the stored frequencies.
+
+The index counts single words only. Unlike the old WordCloud.generate path,
+the clouds deliberately leave out bigram collocations ("traffic police"):
+scoring them needs the word sequence after stopword removal, which the index
+does not keep.
+"""
+
+import itertools
+import os
+import pickle
+from collections import Counter
+
+from data_loader import CACHE_DIR
+from text_normalizer import normalize_series
+
+INDEX_FILE = os.path.join(CACHE_DIR, "term_index.pkl")
+
+# Bump whenever the tokenization or the stored layout changes
+INDEX_VERSION = 1
+
+
+class TermIndex:
+    """
+    Token counts per organization, built incrementally from posts keyed by pid.
+
+    A post is counted once, the first time its pid is seen; later changes to the
+    message of an already indexed pid are not picked up (clear the index file to
+    rebuild from scratch).
+    """
+
+    def __init__(self, keep_non_ascii=False):
+        self.keep_non_ascii = keep_non_ascii
+        # Organization -> Counter of token counts
+        self.counts = {}
+        # pid -> organization, for every post already counted
+        self.post_orgs = {}
+
+    @classmethod
+    def load(cls, path=INDEX_FILE, keep_non_ascii=False):
+        """Load the index from disk, or start an empty one if it is missing or stale"""
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return cls(keep_non_ascii)
+
+        if state.get('version') != INDEX_VERSION or state.get('keep_non_ascii') != keep_non_ascii:
+            return cls(keep_non_ascii)
+
+        index = cls(keep_non_ascii)
+        index.counts = state['counts']
+        index.post_orgs = state['post_orgs']
+        return index
+
+    def save(self, path=INDEX_FILE):
+        """Write the index to disk"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                'version': INDEX_VERSION,
+                'keep_non_ascii': self.keep_non_ascii,
+                'counts': self.counts,
+                'post_orgs': self.post_orgs
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def update(self, post_summary):
+        """Count the tokens of every post whose pid is not indexed yet; return how many"""
+        posts = post_summary[post_summary['postedBy'].notna() & (post_summary['postedBy'] != "")]
+        new_posts = posts[~posts['pid'].isin(self.post_orgs.keys())]
+        if len(new_posts) == 0:
+            return 0
+
+        cleaned = normalize_series(new_posts['message'], keep_non_ascii=self.keep_non_ascii)
+        for org, texts in cleaned.groupby(new_posts['postedBy'], sort=False):
+            counter = self.counts.setdefault(org, Counter())
+            counter.update(itertools.chain.from_iterable(text.split() for text in texts))
+
+        self.post_orgs.update(zip(new_posts['pid'], new_posts['postedBy']))
+        return len(new_posts)
+
+    def frequencies(self, org, stopwords=()):
+        """
+        Return the word frequencies of an organization, ready for
+        WordCloud.generate_from_frequencies.
+
+        Stopwords are removed and plurals are merged into their singular form,
+        as WordCloud.generate does for single words. Bigram collocations are
+        deliberately not produced (see the module docstring), so the clouds
+        hold single words only.
+        """
+        stopwords = {word.lower() for word in stopwords}
+        counts = {word: count for word, count in self.counts.get(org, {}).items()
+                  if word not in stopwords}
+
+        # Merge "words" into "word" when both occur (but leave words ending in "ss")
+        for word in list(counts):
+            if word.endswith('s') and not word.endswith('ss') and word[:-1] in counts:
+                counts[word[:-1]] += counts.pop(word)
+        return counts
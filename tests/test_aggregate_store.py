@@ -0,0 +1,134 @@
+"""
+Staggered ingestion into the aggregate store must end up with the same
+aggregates as one full rebuild, whatever order posts and comments arrive in.
+
+Run with: python -m pytest tests
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import timezones  # noqa: E402
+from aggregate_store import AggregateStore  # noqa: E402
+from comment_parser import CompactComments  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def utc():
+    timezones.configure('UTC')
+    yield
+    timezones.configure()
+
+
+def make_posts(pids):
+    return pd.DataFrame({
+        'pid': [str(pid) for pid in pids],
+        'postedBy': ['Page A' if pid % 2 else 'Page B' for pid in pids],
+        'createdTime': pd.to_datetime([f"2013-12-{pid % 28 + 1:02d}T03:05:00" for pid in pids], utc=True),
+        'likesCount': [float(pid) for pid in pids],
+        'category': ['Website'] * len(pids)
+    })
+
+
+def make_comments(pids, per_post=3):
+    rows = [(str(pid), f"comment {i} on {pid}", pd.Timestamp(f"2013-12-{pid % 28 + 1:02d} {i:02d}:20:00"))
+            for pid in pids for i in range(per_post)]
+    frame = pd.DataFrame(rows, columns=['pid', 'comment_text', 'timestamp'])
+    parsed = CompactComments.from_frame(frame)
+    # One comment without a timestamp per post
+    others = CompactComments.from_frame(frame[['pid', 'comment_text']].iloc[::per_post])
+    return parsed, others
+
+
+def full_rebuild(pids):
+    store = AggregateStore()
+    store.add_posts(make_posts(pids))
+    store.add_comments(*make_comments(pids))
+    return store
+
+
+def assert_same_aggregates(store, expected):
+    assert store.post_counts == expected.post_counts
+    assert store.comment_counts == expected.comment_counts
+    assert store.other_comment_counts == expected.other_comment_counts
+    assert store.category_likes == expected.category_likes
+    dimensions = ('category', 'page', 'month')
+    pd.testing.assert_frame_equal(store.category_cube.summary(dimensions),
+                                  expected.category_cube.summary(dimensions))
+
+
+def test_comments_before_their_posts_stay_pending():
+    pids = list(range(1, 41))
+    store = AggregateStore()
+
+    # First run: only the lower half of the posts, but every comment
+    store.add_posts(make_posts(pids[:20]))
+    added, rejected, unmatched, pending = store.add_comments(*make_comments(pids))
+    assert (added, rejected, unmatched, pending) == (20 * 4, 0, 0, 20 * 4)
+
+    # Second run: all posts and all comments; the pending comments are folded in now
+    store.add_posts(make_posts(pids))
+    added, rejected, unmatched, pending = store.add_comments(*make_comments(pids))
+    assert (added, rejected, pending) == (20 * 4, 20 * 4, 0)
+
+    assert_same_aggregates(store, full_rebuild(pids))
+
+
+def test_comments_arriving_after_posts_and_repeated_runs():
+    pids = list(range(1, 31))
+    store = AggregateStore()
+
+    # Comments of the first posts arrive a run after their posts, then everything is repeated
+    store.add_posts(make_posts(pids[:10]))
+    assert store.add_comments(*make_comments([]))[0] == 0
+    store.add_posts(make_posts(pids[:20]))
+    store.add_comments(*make_comments(pids[:10]))
+    store.add_posts(make_posts(pids))
+    store.add_comments(*make_comments(pids))
+    added, rejected, _, pending = store.add_comments(*make_comments(pids))
+    assert (added, rejected, pending) == (0, 30 * 4, 0)
+
+    assert_same_aggregates(store, full_rebuild(pids))
+
+
+def test_rows_without_a_numeric_pid_are_counted_once():
+    posts = pd.concat([make_posts([1, 2]), make_posts([3, 3, 4]).assign(pid='nan')], ignore_index=True)
+    parsed, others = make_comments([1, 2])
+    unkeyed = CompactComments.from_frame(pd.DataFrame({
+        'pid': ['nan', 'nan', 'not-a-post'], 'comment_text': ['?', '?', '!'],
+        'timestamp': [pd.Timestamp('2013-12-01 01:00:00')] * 3
+    }))
+    store = AggregateStore()
+
+    # Comments arriving before their post wait for it, like numeric pids do
+    assert store.add_comments(unkeyed, CompactComments.empty(timestamps=False)) == (0, 0, 0, 3)
+
+    # Repeated rows within a batch all count, but only the first time the batch is seen
+    assert store.add_posts(posts) == (5, 0)
+    assert store.add_posts(posts) == (0, 5)
+    assert store.category_likes['Website'] == [1 + 2 + 3 + 3 + 4, 5]
+    assert sum(store.post_counts.values()) == 5
+
+    comments = CompactComments.concat([parsed, unkeyed])
+    assert store.add_comments(comments, others) == (8 + 2, 0, 0, 1)
+    assert store.add_comments(comments, others) == (0, 8 + 2, 0, 1)
+    assert sum(store.comment_counts.values()) == 6 + 2
+
+
+def test_mismatching_store_is_refused_not_replaced(tmp_path):
+    path = str(tmp_path / 'aggregates.pkl')
+    store = AggregateStore()
+    store.add_posts(make_posts([1, 2]))
+    store.save(path)
+
+    timezones.configure('Asia/Kolkata')
+    with pytest.raises(ValueError, match='reset'):
+        AggregateStore.load(path)
+    timezones.configure('UTC')
+    assert len(AggregateStore.load(path).post_pages) == 2
@@ -0,0 +1,56 @@
+"""
+Restricting the anomaly detector to a page group must keep only the rows of
+those pages, for posts and comments alike.
+
+Run with: python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from anomaly_detector import comment_timestamps, post_timestamps  # noqa: E402
+from comment_parser import CompactComments  # noqa: E402
+
+
+def make_posts():
+    return pd.DataFrame({
+        'pid': ['1', '2', '3', '4'],
+        'postedBy': ['Page A', 'Page B', 'Page A', 'Page C'],
+        'createdTime': pd.to_datetime(['2013-12-01T03:05:00', '2013-12-01T03:06:00', None,
+                                       '2013-12-02T10:00:00'], utc=True)
+    })
+
+
+def make_comments():
+    frame = pd.DataFrame({
+        'pid': ['1', '2', '3', '4', '9'],
+        'comment_text': ['a', 'b', 'c', 'd', 'e'],
+        'timestamp': pd.to_datetime(['2013-12-01 04:00:00'] * 5)
+    })
+    return CompactComments.from_frame(frame), CompactComments.empty(timestamps=False)
+
+
+def test_post_group_filter():
+    pages, epoch = post_timestamps(make_posts(), pages=['Page A', 'Page C'])
+    assert list(pages) == ['Page A', 'Page C']
+    assert epoch.tolist() == [pd.Timestamp('2013-12-01 03:05:00').value // 10 ** 9,
+                              pd.Timestamp('2013-12-02 10:00:00').value // 10 ** 9]
+
+    pages, _ = post_timestamps(make_posts())
+    assert list(pages) == ['Page A', 'Page B', 'Page C']
+
+
+def test_comment_group_filter():
+    pages, epoch = comment_timestamps(make_posts(), make_comments(), pages=['Page A'])
+    assert list(pages) == ['Page A', 'Page A']
+    assert len(epoch) == 2
+
+    # Comments of unknown posts are dropped with or without a group
+    pages, _ = comment_timestamps(make_posts(), make_comments())
+    assert np.array_equal(pages, np.array(['Page A', 'Page B', 'Page A', 'Page C'], dtype=object))
@@ -0,0 +1,43 @@
+"""
+The batch normalizer must match the per-message one, and keeping non-ASCII
+text must keep Devanagari words whole.
+
+Run with: python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from text_normalizer import normalize_series, normalize_text  # noqa: E402
+
+MESSAGES = pd.Series([
+    'Visit http://example.com NOW!!! @page #Sale 50% off',
+    'www.example.com/offer@user#tag done',
+    'नमस्ते, दिल्ली! ४२ traffic… 😀',
+    '  Café   déjà\tvu\n',
+    '',
+    None,
+    np.nan,
+    42
+], index=[10, 3, 7, 1, 0, 5, 2, 8])
+
+
+def test_devanagari_words_survive():
+    assert normalize_text('नमस्ते दिल्ली traffic', keep_non_ascii=True) == 'नमस्ते दिल्ली traffic'
+    assert normalize_text('नमस्ते, दिल्ली! ४२ 😀', keep_non_ascii=True) == 'नमस्ते दिल्ली'
+    assert normalize_text('नमस्ते दिल्ली traffic') == 'traffic'
+
+
+@pytest.mark.parametrize('keep_non_ascii', [False, True])
+def test_series_matches_per_message(keep_non_ascii):
+    result = normalize_series(MESSAGES, keep_non_ascii=keep_non_ascii)
+    expected = [normalize_text(text, keep_non_ascii=keep_non_ascii) for text in MESSAGES]
+    assert result.tolist() == expected
+    assert result.index.equals(MESSAGES.index)
@@ -0,0 +1,105 @@
+"""
+Helper module: time-of-day buckets and per-page bucket histograms.
+
+A day is split into equal buckets (15 minutes -> 96 buckets by default). The
+histogram engine maps page names to categorical codes and counts all pages in a
+single np.bincount pass, so its cost grows with the number of rows rather than
+with pages x rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+MINUTES_PER_DAY = 24 * 60
+
+# Default bucket width used by the analyses (96 buckets per day)
+DEFAULT_BUCKET_MINUTES = 15
+
+
+def bucket_count(bucket_minutes=DEFAULT_BUCKET_MINUTES):
+    """Return the number of buckets in a day for the given bucket width"""
+    if bucket_minutes <= 0 or MINUTES_PER_DAY % bucket_minutes != 0:
+        raise ValueError(f"Bucket width must divide a day evenly, got {bucket_minutes} minutes")
+    return MINUTES_PER_DAY // bucket_minutes
+
+
+def bucket_index(times, bucket_minutes=DEFAULT_BUCKET_MINUTES):
+    """
+    Return the time-of-day bucket of each timestamp as an integer array.
+
+    Missing timestamps get -1.
+    """
+    bucket_count(bucket_minutes)
+    times = pd.Series(times)
+    minute_of_day = times.dt.hour.to_numpy(dtype=float) * 60 + times.dt.minute.to_numpy(dtype=float)
+    buckets = np.full(len(times), -1, dtype=np.int64)
+    valid = ~np.isnan(minute_of_day)
+    buckets[valid] = minute_of_day[valid].astype(np.int64) // bucket_minutes
+    return buckets
+
+
+def bucket_label(bucket, bucket_minutes=DEFAULT_BUCKET_MINUTES):
+    """Return the start time of a bucket, e.g. '03:15'"""
+    start = bucket * bucket_minutes
+    return f"{start // 60:02d}:{start % 60:02d}"
+
+
+def bucket_range_label(bucket, bucket_minutes=DEFAULT_BUCKET_MINUTES):
+    """Return the time range covered by a bucket, e.g. '03:15-03:29'"""
+    start = bucket * bucket_minutes
+    end = start + bucket_minutes - 1
+    return f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}"
+
+
+def count_by_page(pages, times, page_order=None, bucket_minutes=DEFAULT_BUCKET_MINUTES):
+    """
+    Count rows per (page, time bucket) in a single pass.
+
+    Args:
+        pages: page name of each row
+        times: timestamp of each row
+        page_order: pages to count, in output order (defaults to all pages, sorted)
+        bucket_minutes: bucket width in minutes
+
+    Returns:
+        (page_names, counts) where counts is an int64 array of shape
+        (len(page_names), buckets per day). Rows whose page is not in
+        page_order, or whose timestamp is missing, are ignored.
+    """
+    buckets = bucket_index(times, bucket_minutes)
+    return count_codes_by_bucket(pages, buckets, page_order, bucket_minutes)
+
+
+def count_codes_by_bucket(pages, buckets, page_order=None, bucket_minutes=DEFAULT_BUCKET_MINUTES, weights=None):
+    """
+    Like count_by_page, but for rows that already carry a bucket index.
+
+    With `weights` (one number per row) the weights are summed per (page,
+    bucket) instead of counting rows, and the matrix is float.
+    """
+    n_buckets = bucket_count(bucket_minutes)
+
+    page_codes = pd.Categorical(pages, categories=page_order)
+    page_names = list(page_codes.categories)
+    codes = np.asarray(page_codes.codes, dtype=np.int64)
+    buckets = np.asarray(buckets, dtype=np.int64)
+
+    valid = (codes >= 0) & (buckets >= 0)
+    flat_index = codes[valid] * n_buckets + buckets[valid]
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)[valid]
+    counts = np.bincount(flat_index, weights=weights, minlength=len(page_names) * n_buckets)
+    return page_names, counts.reshape(len(page_names), n_buckets)
+
+
+def counts_to_frame(page_names, counts, page_column='Page', count_column='Count',
+                    bucket_minutes=DEFAULT_BUCKET_MINUTES):
+    """Convert a (pages x buckets) count matrix to one row per page and bucket"""
+    n_buckets = counts.shape[1]
+    labels = [bucket_label(bucket, bucket_minutes) for bucket in range(n_buckets)]
+    return pd.DataFrame({
+        page_column: np.repeat(page_names, n_buckets),
+        'Time Bucket': np.tile(np.arange(n_buckets), len(page_names)),
+        'Time': np.tile(labels, len(page_names)),
+        count_column: counts.ravel()
+    })
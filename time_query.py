@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Indexed time-window queries over the Post Summary data.
+
+Answers "posts by page X with a time of day in [start, end) over the date range
+[from, to]" with binary searches on per-page sorted indexes instead of scanning
+every post.
+
+Usage:
+    python time_query.py --page "Bengaluru Traffic Police" --start 03:00 --end 03:15
+    python time_query.py --page Flipkart --start 22:00 --end 02:00 --from 2013-12-01 --to 2013-12-31
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import timezones
+from data_loader import load_post_summary
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def parse_time_of_day(value):
+    """Convert 'HH:MM' (00:00 to 24:00) to minutes after midnight"""
+    try:
+        hour, minute = (int(part) for part in value.split(':'))
+    except ValueError:
+        raise ValueError(f"Invalid time of day '{value}', expected HH:MM")
+    if not (0 <= hour <= 24 and 0 <= minute < 60) or hour * 60 + minute > 24 * 60:
+        raise ValueError(f"Invalid time of day '{value}', expected HH:MM")
+    return hour * 60 + minute
+
+
+def _to_epoch_ns(times):
+    """Return datetimes as int64 nanoseconds since the epoch (UTC)"""
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+    return times.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+class TimeWindowIndex:
+    """
+    Per-page index of posts sorted by time of day and by creation time.
+
+    Building the index sorts the posts once; every query afterwards is a pair of
+    binary searches plus a filter over the matching slice.
+    """
+
+    def __init__(self, post_data, time_column='createdTime', page_column='postedBy'):
+        data = post_data[post_data[page_column].notna() & post_data[time_column].notna()]
+        created = pd.to_datetime(data[time_column])
+        self._data = data
+        self._time_column = time_column
+
+        self._tz = created.dt.tz
+        self._tod_by_row = (created.dt.hour * 3600 + created.dt.minute * 60 + created.dt.second).to_numpy(np.int64)
+        self._created_by_row = _to_epoch_ns(created)
+        codes, pages = pd.factorize(data[page_column])
+
+        # Rows grouped by page, sorted by time of day (and by creation time) within each page
+        self._tod_rows = np.lexsort((self._tod_by_row, codes))
+        self._tod_sorted = self._tod_by_row[self._tod_rows]
+        self._created_rows = np.lexsort((self._created_by_row, codes))
+        self._created_sorted = self._created_by_row[self._created_rows]
+
+        # Start/end position of every page inside the sorted arrays
+        bounds = np.searchsorted(codes[self._tod_rows], np.arange(len(pages) + 1))
+        self._page_slices = {page: (bounds[i], bounds[i + 1]) for i, page in enumerate(pages)}
+
+    @property
+    def pages(self):
+        """Pages covered by the index"""
+        return list(self._page_slices)
+
+    def query(self, page, start_minute, end_minute, date_from=None, date_to=None):
+        """
+        Return the posts by `page` with a time of day in [start_minute, end_minute).
+
+        A window whose start is after its end wraps around midnight (e.g. 22:00 to
+        02:00). date_from/date_to optionally restrict the result to posts created
+        on those dates (both inclusive). Rows are returned sorted by creation time.
+        """
+        rows = self._query_rows(page, start_minute, end_minute, date_from, date_to)
+        return self._data.iloc[rows].sort_values(self._time_column)
+
+    def count(self, page, start_minute, end_minute, date_from=None, date_to=None):
+        """Return the number of posts matching query()"""
+        return len(self._query_rows(page, start_minute, end_minute, date_from, date_to))
+
+    def _query_rows(self, page, start_minute, end_minute, date_from, date_to):
+        if page not in self._page_slices:
+            return np.empty(0, dtype=np.int64)
+        lo, hi = self._page_slices[page]
+
+        # Candidate rows from the time-of-day index (two ranges when wrapping midnight)
+        start, end = start_minute * 60, end_minute * 60
+        tod = self._tod_sorted[lo:hi]
+        if start <= end:
+            ranges = [(start, end)]
+        else:
+            ranges = [(start, SECONDS_PER_DAY), (0, end)]
+        tod_spans = [(lo + np.searchsorted(tod, a), lo + np.searchsorted(tod, b)) for a, b in ranges]
+        tod_size = sum(b - a for a, b in tod_spans)
+
+        if date_from is None and date_to is None:
+            return np.concatenate([self._tod_rows[a:b] for a, b in tod_spans])
+
+        # Candidate rows from the creation-time index
+        first_ns = self._date_to_ns(date_from) if date_from is not None else np.iinfo(np.int64).min
+        last_ns = self._date_to_ns(date_to, next_day=True) if date_to is not None else np.iinfo(np.int64).max
+        created = self._created_sorted[lo:hi]
+        a = lo + np.searchsorted(created, first_ns)
+        b = lo + np.searchsorted(created, last_ns)
+
+        # Filter whichever candidate set is smaller on the other condition
+        if b - a <= tod_size:
+            rows = self._created_rows[a:b]
+            tod_values = self._tod_by_row[rows]
+            if start <= end:
+                mask = (tod_values >= start) & (tod_values < end)
+            else:
+                mask = (tod_values >= start) | (tod_values < end)
+            return rows[mask]
+
+        rows = np.concatenate([self._tod_rows[s:e] for s, e in tod_spans])
+        created_values = self._created_by_row[rows]
+        return rows[(created_values >= first_ns) & (created_values < last_ns)]
+
+    def _date_to_ns(self, value, next_day=False):
+        # Dates are interpreted in the timezone of the indexed timestamps
+        day = pd.Timestamp(value).normalize()
+        if next_day:
+            day += pd.Timedelta(days=1)
+        if self._tz is not None:
+            day = day.tz_localize(self._tz) if day.tzinfo is None else day
+            day = day.tz_convert('UTC').tz_localize(None)
+        return day.value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up posts by page within a time-of-day window")
+    parser.add_argument('--page', required=True, help='page name (postedBy)')
+    parser.add_argument('--start', required=True, help='start of the window, HH:MM (inclusive)')
+    parser.add_argument('--end', required=True, help='end of the window, HH:MM (exclusive)')
+    parser.add_argument('--from', dest='date_from', help='first date to include, YYYY-MM-DD')
+    parser.add_argument('--to', dest='date_to', help='last date to include, YYYY-MM-DD')
+    parser.add_argument('--count', action='store_true', help='only print the number of matching posts')
+    timezones.add_timezone_arguments(parser)
+    args = parser.parse_args()
+    timezones.configure_from_args(args)
+
+    try:
+        start = parse_time_of_day(args.start)
+        end = parse_time_of_day(args.end)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Windows and dates are in the local time of the page
+    post_data = load_post_summary()
+    post_data['createdTime'] = timezones.local_times(post_data['createdTime'], post_data['postedBy'])
+    index = TimeWindowIndex(post_data)
+    if args.page not in index.pages:
+        print(f"No posts found for page '{args.page}'")
+        return
+
+    posts = index.query(args.page, start, end, args.date_from, args.date_to)
+    print(f"{len(posts)} posts by {args.page} between {args.start} and {args.end}")
+    if args.count:
+        return
+
+    for _, post in posts.iterrows():
+        print(f"  Time: {post['createdTime'].strftime('%Y-%m-%d %H:%M:%S')}")
+        if 'message' in post and isinstance(post['message'], str):
+            message = post['message'][:100] + "..." if len(post['message']) > 100 else post['message']
+            print(f"  Message: {message}")
+        print("  " + "-"*50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Helper module: per-page time zones for the time-of-day analyses.
+
+Post and comment timestamps are stored in UTC (+0000), so bucketing them
+directly puts a Bengaluru post made at 08:30 IST into the 03:00 bucket. Before
+bucketing, the analyses convert every timestamp to the local time of its page
+with local_times(). The conversion is vectorized: rows are grouped by time zone
+and each group is converted with one tz_convert call, which also handles
+half-hour offsets such as IST (+05:30) and daylight saving time.
+
+Every page uses DEFAULT_TIMEZONE unless PAGE_TIMEZONES (or --page-timezone)
+assigns it another zone; --timezone UTC restores plain UTC buckets.
+"""
+
+import argparse
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+import pandas as pd
+
+# Time zone of every page without an entry in PAGE_TIMEZONES
+DEFAULT_TIMEZONE = 'Asia/Kolkata'
+
+# page -> IANA time zone, for pages outside DEFAULT_TIMEZONE
+PAGE_TIMEZONES = {}
+
+# Time zones of the current run (see configure)
+_settings = {'default': DEFAULT_TIMEZONE, 'pages': dict(PAGE_TIMEZONES)}
+
+
+def _check_timezone(name):
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown time zone '{name}'")
+    return name
+
+
+def configure(default=DEFAULT_TIMEZONE, page_timezones=None):
+    """
+    Set the time zones used by local_times() from now on.
+
+    `page_timezones` ({page: zone}) is applied on top of PAGE_TIMEZONES.
+    """
+    pages = dict(PAGE_TIMEZONES)
+    pages.update(page_timezones or {})
+    _settings['default'] = _check_timezone(default)
+    _settings['pages'] = {page: _check_timezone(zone) for page, zone in pages.items()}
+
+
+def settings():
+    """Return the current time zone settings (e.g. to store them next to derived data)"""
+    return {'default': _settings['default'], 'pages': dict(_settings['pages'])}
+
+
+def is_utc():
+    """Return True if every page is on UTC (so UTC buckets are already local)"""
+    return _settings['default'] == 'UTC' and all(zone == 'UTC' for zone in _settings['pages'].values())
+
+
+def timezone_of(page):
+    """Return the time zone of a page"""
+    return _settings['pages'].get(page, _settings['default'])
+
+
+def local_times(times, pages):
+    """
+    Return the local wall-clock time of each timestamp in its page's time zone.
+
+    Naive timestamps are taken to be UTC. The result is a naive datetime Series
+    aligned with `times`; missing timestamps stay NaT.
+    """
+    times = pd.to_datetime(pd.Series(times))
+    index = times.index
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+    utc = pd.DatetimeIndex(times.to_numpy(dtype='datetime64[ns]'))
+
+    zones = pd.Series(pd.Series(pages).to_numpy()).map(_settings['pages']).fillna(_settings['default']).to_numpy()
+    distinct = pd.unique(zones)
+    if len(distinct) == 1:
+        # Common case: every page in one zone, converted in a single call
+        return pd.Series(_convert(utc, distinct[0]), index=index)
+
+    local = np.empty(len(utc), dtype='datetime64[ns]')
+    for zone in distinct:
+        rows = zones == zone
+        local[rows] = _convert(utc[rows], zone)
+    return pd.Series(local, index=index)
+
+
+def _convert(utc, zone):
+    if zone == 'UTC':
+        return utc.to_numpy()
+    return utc.tz_localize('UTC').tz_convert(zone).tz_localize(None).to_numpy()
+
+
+def _timezone_argument(value):
+    try:
+        return _check_timezone(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _page_timezone_argument(value):
+    page, sep, zone = value.rpartition('=')
+    if not sep or not page:
+        raise argparse.ArgumentTypeError(f"Invalid page time zone '{value}', expected PAGE=ZONE")
+    return page, _timezone_argument(zone)
+
+
+def add_timezone_arguments(parser):
+    """Add the time zone options (--timezone, --page-timezone) to an argparse parser"""
+    group = parser.add_argument_group('time zones')
+    group.add_argument('--timezone', type=_timezone_argument, default=DEFAULT_TIMEZONE, metavar='ZONE',
+                       help=f"time zone of every page without its own (default {DEFAULT_TIMEZONE}; "
+                            f"UTC buckets the raw timestamps)")
+    group.add_argument('--page-timezone', type=_page_timezone_argument, action='append', default=[],
+                       metavar='PAGE=ZONE',
+                       help='time zone of one page, e.g. "Flipkart=Asia/Kolkata" (repeatable)')
+
+
+def configure_from_args(args):
+    """Apply the options parsed by add_timezone_arguments"""
+    configure(args.timezone, dict(args.page_timezone))